@@ -0,0 +1,72 @@
+"""
+Benchmark the throughput of reading ACT depth-1 map metadata (file
+existence checks and _info.hdf parsing) with different numbers of jobs,
+on a synthetic directory tree.
+
+    python benchmarks/bench_act_ingest.py --maps 2000 --jobs 1 4 8
+
+Pass --root to benchmark an existing tree (e.g. on a networked
+filesystem) instead of a temporary one.
+"""
+
+import argparse as ap
+import tempfile
+import time
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from mapcat.toolkit.act import iter_glob
+
+
+def make_act_tree(root: Path, n_maps: int):
+    """
+    Write n_maps fake ACT depth-1 maps below root: empty FITS files and
+    _info.hdf files in the ACT format, 100 maps per directory.
+    """
+    for i in range(n_maps):
+        ctime = 1505603190 + 1000 * i
+        subdir = root / f"{i // 100:05d}"
+        subdir.mkdir(parents=True, exist_ok=True)
+        base = subdir / f"depth1_{ctime}_pa5_f090"
+
+        for suffix in ["map", "ivar", "time", "rho", "kappa"]:
+            Path(f"{base}_{suffix}.fits").touch()
+
+        with h5py.File(f"{base}_info.hdf", "w") as f:
+            f["array"] = np.bytes_("pa5_f090")
+            f["ids"] = np.array(
+                [f"{ctime + j}.{ctime + j + 600}.ar5:f090".encode() for j in range(20)]
+            )
+            f["period"] = np.array([ctime - 300.0, ctime + 300.0])
+            f["t"] = float(ctime)
+            f["box"] = np.zeros((2, 2))
+
+
+def main():
+    parser = ap.ArgumentParser(description=__doc__)
+    parser.add_argument("--maps", type=int, default=2000, help="Synthetic maps")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--root", type=Path, default=None, help="Existing tree")
+    parser.add_argument("--glob", type=str, default="*/*_map.fits")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.root
+        if root is None:
+            root = Path(tmp)
+            make_act_tree(root, args.maps)
+
+        for jobs in args.jobs:
+            start = time.perf_counter()
+            n_maps = sum(1 for _ in iter_glob(args.glob, root, "act", jobs=jobs))
+            elapsed = time.perf_counter() - start
+            print(
+                f"jobs={jobs:3d}: {n_maps} maps in {elapsed:7.2f} s"
+                f"  ({n_maps / elapsed:8.1f} maps/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark PolynomialPointingModel prediction against the original
+implementation, which extracted the coefficients and built the design
+matrix twice on every call.
+
+    python benchmarks/bench_pointing.py --sources 100000 --order 3
+"""
+
+import argparse as ap
+import time
+
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+
+from mapcat.pointing.poly import PolynomialPointingModel
+
+
+def original_predict(model: PolynomialPointingModel, pos: SkyCoord) -> SkyCoord:
+    """
+    The original implementation: dictionary walks and a Python loop with
+    np.vstack for each axis.
+    """
+
+    def poly_terms(x, y):
+        terms = []
+        for i in range(model.poly_order + 1):
+            for j in range(model.poly_order + 1 - i):
+                terms.append((x**i) * (y**j))
+        return np.vstack(terms).T
+
+    def coefficients(poly):
+        array = np.zeros(len(poly.coeffs))
+        for i, key in enumerate(model._poly_keys()):
+            array[i] = poly.coeffs.get(key, 0)
+        return array
+
+    def model_fn(x, y, coeffs):
+        x = np.atleast_1d(x.to_value(u.deg))
+        y = np.atleast_1d(y.to_value(u.deg))
+        return (poly_terms(x, y) @ coeffs) * u.deg
+
+    racoeffs = coefficients(model.ra_model_coefficients)
+    deccoeffs = coefficients(model.dec_model_coefficients)
+    ra = pos.ra - model_fn(pos.ra, pos.dec, racoeffs)
+    dec = pos.dec - model_fn(pos.ra, pos.dec, deccoeffs)
+
+    return SkyCoord(ra=ra, dec=dec, frame=pos.frame)
+
+
+def timed(name: str, n: int, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:40s}: {elapsed:8.4f} s  ({n / elapsed:12.1f} sources/s)")
+
+
+def main():
+    parser = ap.ArgumentParser(description=__doc__)
+    parser.add_argument("--sources", type=int, default=100_000)
+    parser.add_argument("--loop", type=int, default=2_000, help="one-by-one calls")
+    parser.add_argument("--order", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    ra = rng.uniform(0, 20, args.sources)
+    dec = rng.uniform(-10, 10, args.sources)
+
+    model = PolynomialPointingModel(poly_order=args.order)
+    expected = SkyCoord(ra=ra[:200] * u.deg, dec=dec[:200] * u.deg)
+    measured = SkyCoord(
+        ra=(ra[:200] + 1e-3 * ra[:200]) * u.deg,
+        dec=(dec[:200] + 1e-3 * dec[:200] ** 2 / 10) * u.deg,
+    )
+    model.build_model(measured_positions=measured, expected_positions=expected)
+
+    positions = SkyCoord(ra=ra * u.deg, dec=dec * u.deg)
+    singles = [positions[i] for i in range(args.loop)]
+
+    print(f"{args.sources} sources, order {args.order}\n")
+    timed(
+        "original predict, one at a time",
+        args.loop,
+        lambda: [original_predict(model, p) for p in singles],
+    )
+    timed(
+        "predict, one at a time",
+        args.loop,
+        lambda: [model.predict(p) for p in singles],
+    )
+    timed(
+        "predict_arrays, one at a time",
+        args.loop,
+        lambda: [model.predict_arrays(ra[i], dec[i]) for i in range(args.loop)],
+    )
+    print()
+    timed(
+        "original predict, all at once",
+        args.sources,
+        lambda: original_predict(model, positions),
+    )
+    timed("predict, all at once", args.sources, lambda: model.predict(positions))
+    timed(
+        "predict_arrays, all at once",
+        args.sources,
+        lambda: model.predict_arrays(ra, dec),
+    )
+
+    new = model.predict_arrays(ra, dec)
+    old = original_predict(model, positions)
+    assert np.allclose(new[0], old.ra.to_value(u.deg))
+    assert np.allclose(new[1], old.dec.to_value(u.deg))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Add atomic map indices
+
+Revision ID: 0f277718b121
+Revises: 105617b84f1e
+Create Date: 2026-10-18 13:32:51.204817
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0f277718b121"
+down_revision: str | None = "105617b84f1e"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_atomic_maps_obs_id", "atomic_maps", ["obs_id"])
+    op.create_index("ix_atomic_maps_wafer", "atomic_maps", ["wafer"])
+    op.create_index("ix_atomic_maps_freq_channel", "atomic_maps", ["freq_channel"])
+    op.create_index("ix_atomic_maps_split_label", "atomic_maps", ["split_label"])
+    op.create_index("ix_atomic_maps_valid", "atomic_maps", ["valid"])
+    op.create_index(
+        "ix_atomic_maps_ctime", "atomic_maps", ["ctime"], postgresql_using="brin"
+    )
+
+    op.create_index(
+        "ix_atomic_maps_freq_channel_split_label_ctime",
+        "atomic_maps",
+        ["freq_channel", "split_label", "ctime"],
+    )
+    op.create_index(
+        "ix_atomic_maps_wafer_freq_channel_ctime",
+        "atomic_maps",
+        ["wafer", "freq_channel", "ctime"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_atomic_maps_wafer_freq_channel_ctime", table_name="atomic_maps")
+    op.drop_index(
+        "ix_atomic_maps_freq_channel_split_label_ctime", table_name="atomic_maps"
+    )
+
+    op.drop_index("ix_atomic_maps_ctime", table_name="atomic_maps")
+    op.drop_index("ix_atomic_maps_valid", table_name="atomic_maps")
+    op.drop_index("ix_atomic_maps_split_label", table_name="atomic_maps")
+    op.drop_index("ix_atomic_maps_freq_channel", table_name="atomic_maps")
+    op.drop_index("ix_atomic_maps_wafer", table_name="atomic_maps")
+    op.drop_index("ix_atomic_maps_obs_id", table_name="atomic_maps")
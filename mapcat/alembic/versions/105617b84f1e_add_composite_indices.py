@@ -0,0 +1,55 @@
+"""Add composite indices for common depth-1 queries
+
+Revision ID: 105617b84f1e
+Revises: b3d9e1f04a72
+Create Date: 2026-10-18 12:48:09.613520
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "105617b84f1e"
+down_revision: str | None = "b3d9e1f04a72"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Band and tube selections over a time range; map_id is included so
+    # that joins from this selection need not read the table on PostgreSQL.
+    op.create_index(
+        "ix_depth_one_maps_frequency_tube_slot_ctime",
+        "depth_one_maps",
+        ["frequency", "tube_slot", "ctime"],
+        postgresql_include=["map_id"],
+    )
+
+    # Tile lookups followed by a join to the maps.
+    op.create_index(
+        "ix_depth_one_sky_coverage_x_y_map_id",
+        "depth_one_sky_coverage",
+        ["x", "y", "map_id"],
+    )
+
+    # Range overlap lookups on the hierarchical sky cells.
+    op.create_index(
+        "ix_depth_one_sky_cell_ranges_cell_start_cell_end_map_id",
+        "depth_one_sky_cell_ranges",
+        ["cell_start", "cell_end", "map_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_depth_one_sky_cell_ranges_cell_start_cell_end_map_id",
+        table_name="depth_one_sky_cell_ranges",
+    )
+    op.drop_index(
+        "ix_depth_one_sky_coverage_x_y_map_id", table_name="depth_one_sky_coverage"
+    )
+    op.drop_index(
+        "ix_depth_one_maps_frequency_tube_slot_ctime", table_name="depth_one_maps"
+    )
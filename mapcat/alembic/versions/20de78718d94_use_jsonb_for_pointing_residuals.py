@@ -0,0 +1,50 @@
+"""Use JSONB for the pointing residual models and stats on PostgreSQL
+
+Revision ID: 20de78718d94
+Revises: e99ad5fb808d
+Create Date: 2026-10-18 16:02:41.318207
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "20de78718d94"
+down_revision: str | None = "e99ad5fb808d"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+COLUMNS = ("residual_model", "residual_stats")
+
+
+def upgrade() -> None:
+    # JSON and JSONB are the same type everywhere else.
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for column in COLUMNS:
+        op.alter_column(
+            "depth_one_pointing_residuals",
+            column,
+            type_=postgresql.JSONB(),
+            existing_type=sa.JSON(),
+            postgresql_using=f"{column}::jsonb",
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for column in COLUMNS:
+        op.alter_column(
+            "depth_one_pointing_residuals",
+            column,
+            type_=sa.JSON(),
+            existing_type=postgresql.JSONB(),
+            postgresql_using=f"{column}::json",
+        )
@@ -0,0 +1,28 @@
+"""Add footprint to sky coverage
+
+Revision ID: 21e48f271f76
+Revises: 46575bc0d660
+Create Date: 2026-10-18 09:12:41.530912
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "21e48f271f76"
+down_revision: str | None = "46575bc0d660"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("depth_one_sky_coverage") as batch_op:
+        batch_op.add_column(sa.Column("footprint", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("depth_one_sky_coverage") as batch_op:
+        batch_op.drop_column("footprint")
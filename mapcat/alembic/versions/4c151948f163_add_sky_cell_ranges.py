@@ -0,0 +1,56 @@
+"""Add hierarchical sky cell ranges
+
+Revision ID: 4c151948f163
+Revises: 21e48f271f76
+Create Date: 2026-10-18 10:03:27.118245
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4c151948f163"
+down_revision: str | None = "21e48f271f76"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "depth_one_sky_cell_ranges",
+        sa.Column(
+            "map_id",
+            sa.Integer,
+            sa.ForeignKey("depth_one_maps.map_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("cell_start", sa.BigInteger, nullable=False),
+        sa.Column("cell_end", sa.BigInteger, nullable=False),
+        sa.PrimaryKeyConstraint("map_id", "cell_start", name="sky_cell_range_id"),
+    )
+
+    op.create_index(
+        "ix_depth_one_sky_cell_ranges_cell_start",
+        "depth_one_sky_cell_ranges",
+        ["cell_start"],
+    )
+    op.create_index(
+        "ix_depth_one_sky_cell_ranges_cell_end",
+        "depth_one_sky_cell_ranges",
+        ["cell_end"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_depth_one_sky_cell_ranges_cell_end",
+        table_name="depth_one_sky_cell_ranges",
+    )
+    op.drop_index(
+        "ix_depth_one_sky_cell_ranges_cell_start",
+        table_name="depth_one_sky_cell_ranges",
+    )
+    op.drop_table("depth_one_sky_cell_ranges")
@@ -0,0 +1,83 @@
+"""Merge duplicate TODs and make (obs_id, tube_slot, frequency) unique
+
+Revision ID: 8e05c2a7d913
+Revises: 4c151948f163
+Create Date: 2026-10-18 11:12:40.561823
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8e05c2a7d913"
+down_revision: str | None = "4c151948f163"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Every TOD that has a lower tod_id with the same key, along with the
+# tod_id of the copy that is kept.
+DUPLICATES = """
+    SELECT tod.tod_id AS tod_id, keep.tod_id AS keep_id
+    FROM tod_depth_one AS tod
+    JOIN (
+        SELECT MIN(tod_id) AS tod_id, obs_id, tube_slot, frequency
+        FROM tod_depth_one
+        GROUP BY obs_id, tube_slot, frequency
+    ) AS keep
+    ON tod.obs_id = keep.obs_id
+    AND tod.tube_slot = keep.tube_slot
+    AND tod.frequency = keep.frequency
+    WHERE tod.tod_id <> keep.tod_id
+"""
+
+
+def upgrade() -> None:
+    # Re-point the maps of the duplicates at the kept TOD, then drop them.
+    op.execute(
+        sa.text(
+            f"""
+            INSERT INTO link_tod_to_depth_one_map (tod_id, map_id)
+            SELECT DISTINCT dup.keep_id, link.map_id
+            FROM link_tod_to_depth_one_map AS link
+            JOIN ({DUPLICATES}) AS dup ON link.tod_id = dup.tod_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM link_tod_to_depth_one_map AS existing
+                WHERE existing.tod_id = dup.keep_id
+                AND existing.map_id = link.map_id
+            )
+            """
+        )
+    )
+    op.execute(
+        sa.text(
+            f"""
+            DELETE FROM link_tod_to_depth_one_map
+            WHERE tod_id IN (SELECT tod_id FROM ({DUPLICATES}) AS dup)
+            """
+        )
+    )
+    op.execute(
+        sa.text(
+            f"""
+            DELETE FROM tod_depth_one
+            WHERE tod_id IN (SELECT tod_id FROM ({DUPLICATES}) AS dup)
+            """
+        )
+    )
+
+    op.create_index(
+        "ix_tod_depth_one_obs_id_tube_slot_frequency",
+        "tod_depth_one",
+        ["obs_id", "tube_slot", "frequency"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    # The merged duplicates are not restored.
+    op.drop_index(
+        "ix_tod_depth_one_obs_id_tube_slot_frequency", table_name="tod_depth_one"
+    )
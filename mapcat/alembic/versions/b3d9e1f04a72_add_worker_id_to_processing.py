@@ -0,0 +1,28 @@
+"""Add worker ID to time domain processing
+
+Revision ID: b3d9e1f04a72
+Revises: 8e05c2a7d913
+Create Date: 2026-10-18 12:02:15.274301
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b3d9e1f04a72"
+down_revision: str | None = "8e05c2a7d913"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("time_domain_processing") as batch_op:
+        batch_op.add_column(sa.Column("worker_id", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("time_domain_processing") as batch_op:
+        batch_op.drop_column("worker_id")
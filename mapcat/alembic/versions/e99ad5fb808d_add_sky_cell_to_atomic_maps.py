@@ -0,0 +1,89 @@
+"""Add sky cell to atomic maps
+
+Revision ID: e99ad5fb808d
+Revises: 0f277718b121
+Create Date: 2026-10-18 14:21:07.835102
+
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e99ad5fb808d"
+down_revision: str | None = "0f277718b121"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BACKFILL_CHUNK_SIZE = 10000
+
+# The sky cells as defined when this revision was written (mapcat.sky), copied
+# here so that re-running the migration always backfills the same cell ids.
+TILE_SIZE = 10
+CELL_ORDER = 6
+
+
+def sky_to_nested_cell(ra: np.ndarray, dec: np.ndarray) -> np.ndarray:
+    """
+    Nested sky cell ids at CELL_ORDER of positions in degrees.
+    """
+    side = 2**CELL_ORDER
+    resolution = TILE_SIZE / side
+    ny, nx = round(180 / resolution), round(360 / resolution)
+    x_idx = np.floor(np.mod(ra, 360) / resolution).astype(np.int64) % nx
+    y_idx = np.clip(
+        np.floor((np.asarray(dec) + 90) / resolution).astype(np.int64), 0, ny - 1
+    )
+
+    base = (y_idx // side) * (360 // TILE_SIZE) + x_idx // side
+    cell = np.zeros(np.broadcast(x_idx, y_idx).shape, dtype=np.int64)
+    for bit in range(CELL_ORDER):
+        cell |= (((x_idx % side) >> bit) & 1) << (2 * bit)
+        cell |= (((y_idx % side) >> bit) & 1) << (2 * bit + 1)
+
+    return base * 4**CELL_ORDER + cell
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("atomic_maps") as batch_op:
+        batch_op.add_column(sa.Column("sky_cell", sa.BigInteger(), nullable=True))
+
+    # Backfill in chunks of atomic_map_id, so that the table is never read
+    # into memory at once.
+    connection = op.get_bind()
+    last_id = -1
+    while rows := connection.execute(
+        sa.text(
+            "SELECT atomic_map_id, ra_center, dec_center FROM atomic_maps "
+            "WHERE atomic_map_id > :last_id AND ra_center IS NOT NULL "
+            "AND dec_center IS NOT NULL ORDER BY atomic_map_id LIMIT :limit"
+        ),
+        {"last_id": last_id, "limit": BACKFILL_CHUNK_SIZE},
+    ).all():
+        atomic_map_ids, ra, dec = zip(*rows)
+        cells = sky_to_nested_cell(
+            np.asarray(ra, dtype=float), np.asarray(dec, dtype=float)
+        )
+        connection.execute(
+            sa.text(
+                "UPDATE atomic_maps SET sky_cell = :sky_cell "
+                "WHERE atomic_map_id = :atomic_map_id"
+            ),
+            [
+                {"sky_cell": int(cell), "atomic_map_id": atomic_map_id}
+                for cell, atomic_map_id in zip(cells, atomic_map_ids)
+            ],
+        )
+        last_id = atomic_map_ids[-1]
+
+    op.create_index("ix_atomic_maps_sky_cell", "atomic_maps", ["sky_cell"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_atomic_maps_sky_cell", table_name="atomic_maps")
+
+    with op.batch_alter_table("atomic_maps") as batch_op:
+        batch_op.drop_column("sky_cell")
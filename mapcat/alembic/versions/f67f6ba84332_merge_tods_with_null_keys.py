@@ -0,0 +1,96 @@
+"""Merge duplicate TODs with NULL keys and index NULL keys as equal
+
+Revision ID: f67f6ba84332
+Revises: 20de78718d94
+Create Date: 2026-10-18 18:40:12.204517
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f67f6ba84332"
+down_revision: str | None = "20de78718d94"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDEX_NAME = "ix_tod_depth_one_obs_id_tube_slot_frequency"
+
+# tube_slot and frequency are nullable, and NULLs are distinct in unique
+# indexes and equality joins; a missing value is compared as ''.
+DUPLICATES = """
+    SELECT tod.tod_id AS tod_id, keep.tod_id AS keep_id
+    FROM tod_depth_one AS tod
+    JOIN (
+        SELECT MIN(tod_id) AS tod_id, obs_id,
+            COALESCE(tube_slot, '') AS tube_slot,
+            COALESCE(frequency, '') AS frequency
+        FROM tod_depth_one
+        GROUP BY obs_id, COALESCE(tube_slot, ''), COALESCE(frequency, '')
+    ) AS keep
+    ON tod.obs_id = keep.obs_id
+    AND COALESCE(tod.tube_slot, '') = keep.tube_slot
+    AND COALESCE(tod.frequency, '') = keep.frequency
+    WHERE tod.tod_id <> keep.tod_id
+"""
+
+
+def upgrade() -> None:
+    # Re-point the maps of the duplicates at the kept TOD, then drop them.
+    op.execute(
+        sa.text(
+            f"""
+            INSERT INTO link_tod_to_depth_one_map (tod_id, map_id)
+            SELECT DISTINCT dup.keep_id, link.map_id
+            FROM link_tod_to_depth_one_map AS link
+            JOIN ({DUPLICATES}) AS dup ON link.tod_id = dup.tod_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM link_tod_to_depth_one_map AS existing
+                WHERE existing.tod_id = dup.keep_id
+                AND existing.map_id = link.map_id
+            )
+            """
+        )
+    )
+    op.execute(
+        sa.text(
+            f"""
+            DELETE FROM link_tod_to_depth_one_map
+            WHERE tod_id IN (SELECT tod_id FROM ({DUPLICATES}) AS dup)
+            """
+        )
+    )
+    op.execute(
+        sa.text(
+            f"""
+            DELETE FROM tod_depth_one
+            WHERE tod_id IN (SELECT tod_id FROM ({DUPLICATES}) AS dup)
+            """
+        )
+    )
+
+    op.drop_index(INDEX_NAME, table_name="tod_depth_one")
+    op.create_index(
+        INDEX_NAME,
+        "tod_depth_one",
+        [
+            "obs_id",
+            sa.text("COALESCE(tube_slot, '')"),
+            sa.text("COALESCE(frequency, '')"),
+        ],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    # The merged duplicates are not restored.
+    op.drop_index(INDEX_NAME, table_name="tod_depth_one")
+    op.create_index(
+        INDEX_NAME,
+        "tod_depth_one",
+        ["obs_id", "tube_slot", "frequency"],
+        unique=True,
+    )
@@ -0,0 +1,21 @@
+"""
+Client for interacting with the Depth-1 map database.
+"""
+
+from .core import (
+    get_maps_by_coverage,
+    get_maps_by_processing_status,
+    get_maps_by_sky_cells,
+    get_unprocessed_maps,
+    maps_containing_obs_ids,
+    set_processing_status,
+)
+
+__all__ = [
+    "get_maps_by_coverage",
+    "get_maps_by_processing_status",
+    "get_maps_by_sky_cells",
+    "get_unprocessed_maps",
+    "maps_containing_obs_ids",
+    "set_processing_status",
+]
@@ -1,3 +1,217 @@
 """
-Client for interacting with the Depth-1 map database.
+Asynchronous client functions. Each takes an AsyncSession (e.g. from
+settings.async_session), so many catalog queries can run concurrently in
+one event loop.
+
+Coverage and observation lookups run the same code as their synchronous
+counterparts through AsyncSession.run_sync, so the results are identical.
 """
+
+import time
+
+from astropy.coordinates import ICRS
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from mapcat.core import core
+from mapcat.database import DepthOneMapTable, TimeDomainProcessingTable
+from mapcat.sky import MAX_CELL_ORDER
+from mapcat.toolkit import mapmaking
+
+
+async def get_maps_by_coverage(
+    position: list[ICRS] | ICRS,
+    session: AsyncSession,
+    precise: bool = False,
+) -> list[list[DepthOneMapTable]] | list[DepthOneMapTable]:
+    """
+    Get the depth one maps that cover a given position. See
+    `mapcat.core.get_maps_by_coverage`.
+
+    Parameters
+    ----------
+    position : list[ICRS] | ICRS
+        The position to query for coverage. Should be in ICRS coordinates.
+    session : AsyncSession
+        The database session to use for the query.
+    precise : bool, optional
+        Whether to refine the tile matches using the stored footprints.
+
+    Returns
+    -------
+    list[list[DepthOneMapTable]] | list[DepthOneMapTable]
+        A list of depth one maps that cover the given position.
+    """
+    return await session.run_sync(
+        lambda sync_session: core.get_maps_by_coverage(
+            position, sync_session, precise=precise
+        )
+    )
+
+
+async def get_maps_by_sky_cells(
+    position: list[ICRS] | ICRS,
+    session: AsyncSession,
+    order: int = MAX_CELL_ORDER,
+) -> list[list[DepthOneMapTable]] | list[DepthOneMapTable]:
+    """
+    Get the depth one maps that cover a given position, using the
+    hierarchical sky cell index. See `mapcat.core.get_maps_by_sky_cells`.
+
+    Parameters
+    ----------
+    position : list[ICRS] | ICRS
+        The position to query for coverage. Should be in ICRS coordinates.
+    session : AsyncSession
+        The database session to use for the query.
+    order : int, optional
+        The order of the cells to match positions at, by default MAX_CELL_ORDER.
+
+    Returns
+    -------
+    list[list[DepthOneMapTable]] | list[DepthOneMapTable]
+        A list of depth one maps that cover the given position, or a list of
+        such lists if multiple positions are given.
+    """
+    return await session.run_sync(
+        lambda sync_session: core.get_maps_by_sky_cells(
+            position, sync_session, order=order
+        )
+    )
+
+
+async def maps_containing_obs_ids(
+    obs_ids: list[str], session: AsyncSession
+) -> dict[str, list[DepthOneMapTable]]:
+    """
+    Find the maps that each of many obs_ids is in. See
+    `mapcat.toolkit.mapmaking.maps_containing_obs_ids`.
+
+    Parameters
+    ----------
+    obs_ids : list[str]
+        Obs ids to get the maps for
+    session : AsyncSession
+        Session to use
+
+    Returns
+    -------
+    depth_one_maps : dict[str, list[DepthOneMapTable]]
+        For every obs_id that has at least one TOD, the depth one maps of
+        its TODs ordered by map_id (possibly empty).
+    """
+    return await session.run_sync(
+        lambda sync_session: mapmaking.maps_containing_obs_ids(obs_ids, sync_session)
+    )
+
+
+async def get_unprocessed_maps(
+    session: AsyncSession, limit: int | None = None
+) -> list[DepthOneMapTable]:
+    """
+    Get the depth one maps that have no processing status yet, oldest
+    map_id first.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        Session to use
+    limit : int | None, optional
+        Maximum number of maps to return, by default all of them.
+
+    Returns
+    -------
+    depth_one_maps : list[DepthOneMapTable]
+        The maps waiting to be processed.
+    """
+    stmt = (
+        select(DepthOneMapTable)
+        .where(~DepthOneMapTable.processing_status.any())
+        .order_by(DepthOneMapTable.map_id)
+        .limit(limit)
+    )
+
+    return list((await session.execute(stmt)).scalars())
+
+
+async def get_maps_by_processing_status(
+    status: str, session: AsyncSession
+) -> list[DepthOneMapTable]:
+    """
+    Get the depth one maps with a given processing status.
+
+    Parameters
+    ----------
+    status : str
+        The processing status, e.g. 'running' or 'failed'.
+    session : AsyncSession
+        Session to use
+
+    Returns
+    -------
+    depth_one_maps : list[DepthOneMapTable]
+        The maps with that status, ordered by map_id.
+    """
+    stmt = (
+        select(DepthOneMapTable)
+        .join(TimeDomainProcessingTable)
+        .where(TimeDomainProcessingTable.processing_status == status)
+        .order_by(DepthOneMapTable.map_id)
+        .distinct()
+    )
+
+    return list((await session.execute(stmt)).scalars())
+
+
+async def set_processing_status(
+    map_id: int,
+    status: str,
+    session: AsyncSession,
+    finished: bool = False,
+) -> TimeDomainProcessingTable:
+    """
+    Set the processing status of a depth one map and commit it, creating
+    the status entry (with the current time as its start) if the map has
+    none.
+
+    Parameters
+    ----------
+    map_id : int
+        ID of the depth one map.
+    status : str
+        The new processing status.
+    session : AsyncSession
+        Session to use
+    finished : bool, optional
+        Whether processing has ended, in which case the end time is set to
+        the current time.
+
+    Returns
+    -------
+    processing_status : TimeDomainProcessingTable
+        The updated status entry.
+    """
+    now = time.time()
+
+    entry = (
+        await session.execute(
+            select(TimeDomainProcessingTable)
+            .where(TimeDomainProcessingTable.map_id == map_id)
+            .order_by(TimeDomainProcessingTable.processing_status_id.desc())
+            .limit(1)
+        )
+    ).scalar_one_or_none()
+
+    if entry is None:
+        entry = TimeDomainProcessingTable(
+            map_id=map_id, processing_start=now, processing_status=status
+        )
+        session.add(entry)
+
+    entry.processing_status = status
+    if finished:
+        entry.processing_end = now
+
+    await session.commit()
+
+    return entry
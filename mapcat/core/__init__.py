@@ -1,5 +1,25 @@
-from .core import get_maps_by_coverage
+from .atomic import get_atomic_maps, get_atomic_maps_by_cone
+from .coadd import (
+    get_atomic_maps_in_coadd,
+    get_coadds_of_atomic_map,
+    get_descendant_coadds,
+)
+from .core import get_maps_by_coverage, get_maps_by_sky_cells
+from .pointing import (
+    correct_positions,
+    fit_time_dependent_model,
+    get_pointing_models,
+)
 
 __all__ = [
+    "correct_positions",
+    "fit_time_dependent_model",
+    "get_atomic_maps",
+    "get_atomic_maps_by_cone",
+    "get_atomic_maps_in_coadd",
+    "get_coadds_of_atomic_map",
+    "get_descendant_coadds",
     "get_maps_by_coverage",
+    "get_maps_by_sky_cells",
+    "get_pointing_models",
 ]
@@ -0,0 +1,289 @@
+"""
+Lookups of atomic maps, returning lightweight rows rather than ORM objects.
+"""
+
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import ICRS
+from sqlalchemy import Row, and_, or_, select
+from sqlalchemy.orm import Session
+
+from mapcat.database import AtomicMapTable
+from mapcat.sky import (
+    MAX_CELL_ORDER,
+    TILE_SIZE,
+    _grid_shape,
+    _nested_cell,
+    cells_to_ranges,
+    sky_to_nested_cell,
+)
+
+ATOMIC_MAP_COLUMNS = [
+    "atomic_map_id",
+    "obs_id",
+    "telescope",
+    "freq_channel",
+    "wafer",
+    "ctime",
+    "split_label",
+    "prefix_path",
+    "map_path",
+    "ivar_path",
+    "valid",
+]
+"Columns returned by `get_atomic_maps` unless others are requested."
+
+CONE_RANGE_CHUNK_SIZE = 400
+"Maximum number of sky cell ranges matched in a single cone search query."
+
+
+def _match(column, value: str | list[str] | None):
+    """
+    Condition that column equals value, or is one of value if it is a list;
+    None if value is None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, set)):
+        return column.in_(list(value))
+    return column == value
+
+
+def get_atomic_maps(
+    session: Session,
+    obs_id: str | list[str] | None = None,
+    wafer: str | list[str] | None = None,
+    freq_channel: str | list[str] | None = None,
+    split_label: str | list[str] | None = None,
+    start_time: float | None = None,
+    stop_time: float | None = None,
+    valid: bool | None = None,
+    columns: list[str] | None = None,
+) -> list[Row]:
+    """
+    Select atomic maps by observation, wafer, band, split and time window.
+
+    Every filter is optional and filters left as None are not applied.
+    String filters match one value, or any of a list of values. Rows are
+    ordered by ctime and then atomic_map_id.
+
+    Parameters
+    ----------
+    session : Session
+        The database session to use for the query.
+    obs_id : str | list[str] | None, optional
+        Observation ID(s) of the maps.
+    wafer : str | list[str] | None, optional
+        Wafer(s) of the maps, e.g. 'ws0'.
+    freq_channel : str | list[str] | None, optional
+        Frequency band(s) of the maps, e.g. 'f090'.
+    split_label : str | list[str] | None, optional
+        Split label(s) of the maps, e.g. 'full'.
+    start_time : float | None, optional
+        Earliest ctime of the maps (inclusive).
+    stop_time : float | None, optional
+        Latest ctime of the maps (exclusive).
+    valid : bool | None, optional
+        Whether to select only valid (True) or invalid (False) maps.
+    columns : list[str] | None, optional
+        Columns of AtomicMapTable to return, by default ATOMIC_MAP_COLUMNS.
+
+    Returns
+    -------
+    atomic_maps : list[Row]
+        Named rows with the requested columns, e.g. `row.map_path`.
+
+    Raises
+    ------
+    ValueError
+        If one of columns is not a column of AtomicMapTable.
+    """
+    columns = ATOMIC_MAP_COLUMNS if columns is None else columns
+
+    table_columns = AtomicMapTable.__table__.columns
+    unknown = set(columns) - set(table_columns.keys())
+    if unknown:
+        raise ValueError(f"Unknown columns for atomic_maps: {unknown}")
+
+    conditions = [
+        _match(AtomicMapTable.obs_id, obs_id),
+        _match(AtomicMapTable.wafer, wafer),
+        _match(AtomicMapTable.freq_channel, freq_channel),
+        _match(AtomicMapTable.split_label, split_label),
+    ]
+    if start_time is not None:
+        conditions.append(AtomicMapTable.ctime >= start_time)
+    if stop_time is not None:
+        conditions.append(AtomicMapTable.ctime < stop_time)
+    if valid is not None:
+        conditions.append(AtomicMapTable.valid == valid)
+
+    stmt = (
+        select(*(table_columns[name] for name in columns))
+        .where(*(c for c in conditions if c is not None))
+        .order_by(AtomicMapTable.ctime, AtomicMapTable.atomic_map_id)
+    )
+
+    return list(session.execute(stmt).all())
+
+
+def _cone_cells(
+    ra: np.ndarray, dec: np.ndarray, radius: float, order: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sky cells of the given order that may overlap cones of radius (in
+    degrees) around each position, as (position index, nested cell id).
+    """
+    resolution = TILE_SIZE / 2**order
+    ny, nx = _grid_shape(resolution)
+
+    y_lo = np.clip(np.floor((dec - radius + 90) / resolution), 0, ny - 1).astype(int)
+    y_hi = np.clip(np.floor((dec + radius + 90) / resolution), 0, ny - 1).astype(int)
+
+    # Half-width in RA of the cone; cones that reach a pole span all RAs.
+    sin_ratio = np.sin(np.deg2rad(radius)) / np.cos(np.deg2rad(dec))
+    full = (np.abs(dec) + radius >= 90) | (sin_ratio >= 1)
+    half_width = np.rad2deg(np.arcsin(np.where(full, 0, sin_ratio)))
+    x_lo = np.where(full, 0, np.floor((ra - half_width) / resolution)).astype(int)
+    x_hi = np.where(full, nx - 1, np.floor((ra + half_width) / resolution))
+    n_x = np.minimum(x_hi.astype(int) - x_lo + 1, nx)
+
+    n_y = y_hi - y_lo + 1
+    counts = n_y * n_x
+    position = np.repeat(np.arange(len(ra)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    y_idx = y_lo[position] + local // n_x[position]
+    x_idx = (x_lo[position] + local % n_x[position]) % nx
+
+    return position, _nested_cell(y_idx, x_idx, order)
+
+
+def _angular_separation(
+    ra1: np.ndarray, dec1: np.ndarray, ra2: np.ndarray, dec2: np.ndarray
+) -> np.ndarray:
+    """
+    Great-circle distance in degrees between positions in degrees, with the
+    haversine formula.
+    """
+    ra1, dec1, ra2, dec2 = (np.deg2rad(a) for a in (ra1, dec1, ra2, dec2))
+    hav = (
+        np.sin((dec2 - dec1) / 2) ** 2
+        + np.cos(dec1) * np.cos(dec2) * np.sin((ra2 - ra1) / 2) ** 2
+    )
+    return np.rad2deg(2 * np.arcsin(np.sqrt(np.clip(hav, 0, 1))))
+
+
+def get_atomic_maps_by_cone(
+    position: list[ICRS] | ICRS,
+    radius: u.Quantity,
+    session: Session,
+    columns: list[str] | None = None,
+) -> list[list[Row]] | list[Row]:
+    """
+    Get the atomic maps whose centers lie within radius of a position.
+
+    Candidates are selected with the indexed sky_cell of the map centers,
+    using cells about as large as the radius, in a single query for all
+    positions. They are then checked against the exact angular distance
+    between the map center and the position.
+
+    Parameters
+    ----------
+    position : list[ICRS] | ICRS
+        The position(s) to search around. Lists and array-valued coordinates
+        are searched together.
+    radius : u.Quantity
+        The radius of the cone, as an angle.
+    session : Session
+        The database session to use for the query.
+    columns : list[str] | None, optional
+        Columns of AtomicMapTable to return, by default ATOMIC_MAP_COLUMNS.
+        The ra_center and dec_center columns are always included.
+
+    Returns
+    -------
+    list[list[Row]] | list[Row]
+        Named rows of the maps within the cone, nearest first, or a list of
+        such lists (one per position) if multiple positions are given.
+
+    Raises
+    ------
+    ValueError
+        If one of columns is not a column of AtomicMapTable, or the radius
+        is negative.
+    """
+    columns = ATOMIC_MAP_COLUMNS if columns is None else columns
+    columns = list(dict.fromkeys([*columns, "ra_center", "dec_center"]))
+
+    table_columns = AtomicMapTable.__table__.columns
+    unknown = set(columns) - set(table_columns.keys())
+    if unknown:
+        raise ValueError(f"Unknown columns for atomic_maps: {unknown}")
+
+    radius = radius.to_value(u.deg)
+    if radius < 0:
+        raise ValueError("Radius must not be negative")
+
+    scalar = not isinstance(position, list) and position.isscalar
+    if isinstance(position, list):
+        ra = np.array([p.ra.deg for p in position], dtype=float)
+        dec = np.array([p.dec.deg for p in position], dtype=float)
+    else:
+        ra = np.atleast_1d(np.asarray(position.ra.deg, dtype=float)).ravel()
+        dec = np.atleast_1d(np.asarray(position.dec.deg, dtype=float)).ravel()
+
+    if len(ra) == 0:
+        return []
+
+    # The finest cells that are still at least as large as the radius, so
+    # that each cone touches only a few of them.
+    order = np.floor(np.log2(TILE_SIZE / max(radius, 1e-9)))
+    order = int(np.clip(order, 0, MAX_CELL_ORDER))
+    scale = 4 ** (MAX_CELL_ORDER - order)
+
+    cone_position, cone_cell = _cone_cells(ra, dec, radius, order)
+    ranges = cells_to_ranges(cone_cell) * scale
+
+    rows = []
+    for start in range(0, len(ranges), CONE_RANGE_CHUNK_SIZE):
+        chunk = ranges[start : start + CONE_RANGE_CHUNK_SIZE]
+        stmt = select(*(table_columns[c] for c in columns)).where(
+            or_(
+                *[
+                    and_(
+                        AtomicMapTable.sky_cell >= int(low),
+                        AtomicMapTable.sky_cell < int(high),
+                    )
+                    for low, high in chunk
+                ]
+            )
+        )
+        rows += session.execute(stmt).all()
+
+    row_ra = np.array([row.ra_center for row in rows], dtype=float)
+    row_dec = np.array([row.dec_center for row in rows], dtype=float)
+    cells = sky_to_nested_cell(row_ra, row_dec)
+    by_cell = np.argsort(cells, kind="stable")
+    cells = cells[by_cell]
+
+    # Pair every position with the candidates in each of its cells.
+    first = np.searchsorted(cells, cone_cell * scale, side="left")
+    last = np.searchsorted(cells, (cone_cell + 1) * scale, side="left")
+    counts = last - first
+    pair_position = np.repeat(cone_position, counts)
+    pair_row = by_cell[
+        np.repeat(first, counts)
+        + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    ]
+
+    distance = _angular_separation(
+        ra[pair_position], dec[pair_position], row_ra[pair_row], row_dec[pair_row]
+    )
+    inside = distance <= radius
+
+    matches = [[] for _ in range(len(ra))]
+    order_by = np.lexsort((distance[inside], pair_position[inside]))
+    for i, j in zip(pair_position[inside][order_by], pair_row[inside][order_by]):
+        matches[i].append(rows[j])
+
+    return matches[0] if scalar else matches
@@ -0,0 +1,243 @@
+"""
+Traversal of the atomic map coadd hierarchy with recursive CTEs, so that a
+whole subtree is fetched in one query instead of one lazy load per coadd.
+
+Coadds and their child coadds form a DAG through CoaddMapToCoaddTable. The
+rows of the recursive CTEs carry the path of coadd ids they were reached
+along, as a '/id/id/' string, and a link to a coadd already on the path is
+not followed, so that malformed hierarchies that contain cycles are not
+walked around again. Coadds reached along several paths are deduplicated
+when the CTEs are read.
+"""
+
+from sqlalchemy import Integer, Row, Text, cast, func, literal, select
+from sqlalchemy.orm import Session
+
+from mapcat.database import AtomicMapCoaddTable, AtomicMapTable
+from mapcat.database.links import AtomicMapToCoaddTable, CoaddMapToCoaddTable
+
+from .atomic import ATOMIC_MAP_COLUMNS
+
+MAX_COADD_DEPTH = 16
+"Default maximum number of levels traversed in the coadd hierarchy."
+
+
+def _check_depth(max_depth: int):
+    """
+    Check that a traversal depth limit is usable.
+
+    Raises
+    ------
+    ValueError
+        If max_depth is negative.
+    """
+    if max_depth < 0:
+        raise ValueError("max_depth must not be negative")
+
+
+def _path_entry(coadd_id):
+    """
+    The 'id/' entry of a coadd in the path column of the CTEs.
+    """
+    return cast(coadd_id, Text) + "/"
+
+
+def _descendants(coadd_id: int, max_depth: int):
+    """
+    Recursive CTE of (coadd_id, depth, path) for the coadd (at depth 0) and
+    every coadd below it, down to max_depth levels.
+    """
+    link = CoaddMapToCoaddTable
+    tree = select(
+        literal(coadd_id, Integer).label("coadd_id"),
+        literal(0, Integer).label("depth"),
+        cast(literal(f"/{coadd_id}/"), Text).label("path"),
+    ).cte("descendant_coadds", recursive=True)
+
+    return tree.union(
+        select(
+            link.child_coadd_id,
+            tree.c.depth + 1,
+            tree.c.path + _path_entry(link.child_coadd_id),
+        )
+        .join(tree, link.parent_coadd_id == tree.c.coadd_id)
+        .where(
+            tree.c.depth < max_depth,
+            ~tree.c.path.contains("/" + _path_entry(link.child_coadd_id)),
+        )
+    )
+
+
+def _ancestors(atomic_map_id: int, max_depth: int):
+    """
+    Recursive CTE of (coadd_id, depth, path) for the coadds an atomic map is in
+    (at depth 1) and every coadd above them, up to max_depth levels.
+    """
+    link = CoaddMapToCoaddTable
+    tree = (
+        select(
+            AtomicMapToCoaddTable.coadd_id.label("coadd_id"),
+            literal(1, Integer).label("depth"),
+            ("/" + _path_entry(AtomicMapToCoaddTable.coadd_id)).label("path"),
+        )
+        .where(AtomicMapToCoaddTable.atomic_map_id == atomic_map_id)
+        .cte("ancestor_coadds", recursive=True)
+    )
+
+    return tree.union(
+        select(
+            link.parent_coadd_id,
+            tree.c.depth + 1,
+            tree.c.path + _path_entry(link.parent_coadd_id),
+        )
+        .join(tree, link.child_coadd_id == tree.c.coadd_id)
+        .where(
+            tree.c.depth < max_depth,
+            ~tree.c.path.contains("/" + _path_entry(link.parent_coadd_id)),
+        )
+    )
+
+
+def _coadds_in(tree, session: Session, min_depth: int) -> list[AtomicMapCoaddTable]:
+    """
+    The coadds of a (coadd_id, depth) CTE from min_depth on, ordered by the
+    shallowest depth they were reached at and then by coadd_id.
+    """
+    nodes = (
+        select(tree.c.coadd_id, func.min(tree.c.depth).label("depth"))
+        .where(tree.c.depth >= min_depth)
+        .group_by(tree.c.coadd_id)
+        .subquery()
+    )
+    stmt = (
+        select(AtomicMapCoaddTable)
+        .join(nodes, AtomicMapCoaddTable.coadd_id == nodes.c.coadd_id)
+        .order_by(nodes.c.depth, AtomicMapCoaddTable.coadd_id)
+    )
+
+    return list(session.execute(stmt).scalars())
+
+
+def get_descendant_coadds(
+    coadd_id: int, session: Session, max_depth: int = MAX_COADD_DEPTH
+) -> list[AtomicMapCoaddTable]:
+    """
+    Get every coadd below a coadd in the hierarchy, e.g. the daily and
+    weekly coadds of a yearly coadd.
+
+    Parameters
+    ----------
+    coadd_id : int
+        ID of the coadd to start from. It is not itself returned.
+    session : Session
+        The database session to use for the query.
+    max_depth : int, optional
+        Number of levels to descend, by default MAX_COADD_DEPTH. 1 returns
+        only the direct child coadds.
+
+    Returns
+    -------
+    coadds : list[AtomicMapCoaddTable]
+        The descendant coadds, each once, nearest level first.
+
+    Raises
+    ------
+    ValueError
+        If max_depth is negative.
+    """
+    _check_depth(max_depth)
+
+    return _coadds_in(_descendants(coadd_id, max_depth), session, min_depth=1)
+
+
+def get_atomic_maps_in_coadd(
+    coadd_id: int,
+    session: Session,
+    max_depth: int = MAX_COADD_DEPTH,
+    columns: list[str] | None = None,
+) -> list[Row]:
+    """
+    Get every atomic map that contributes to a coadd, directly or through
+    any of its descendant coadds.
+
+    Parameters
+    ----------
+    coadd_id : int
+        ID of the coadd.
+    session : Session
+        The database session to use for the query.
+    max_depth : int, optional
+        Number of levels of child coadds to descend, by default
+        MAX_COADD_DEPTH. 0 returns only the atomic maps of the coadd itself.
+    columns : list[str] | None, optional
+        Columns of AtomicMapTable to return, by default ATOMIC_MAP_COLUMNS.
+
+    Returns
+    -------
+    atomic_maps : list[Row]
+        Named rows of the atomic maps, each once, ordered by ctime and then
+        atomic_map_id.
+
+    Raises
+    ------
+    ValueError
+        If max_depth is negative, or one of columns is not a column of
+        AtomicMapTable.
+    """
+    _check_depth(max_depth)
+
+    columns = ATOMIC_MAP_COLUMNS if columns is None else columns
+    table_columns = AtomicMapTable.__table__.columns
+    unknown = set(columns) - set(table_columns.keys())
+    if unknown:
+        raise ValueError(f"Unknown columns for atomic_maps: {unknown}")
+
+    tree = _descendants(coadd_id, max_depth)
+    stmt = (
+        select(*(table_columns[name] for name in columns))
+        .where(
+            AtomicMapTable.atomic_map_id.in_(
+                select(AtomicMapToCoaddTable.atomic_map_id).join(
+                    tree, AtomicMapToCoaddTable.coadd_id == tree.c.coadd_id
+                )
+            )
+        )
+        .order_by(AtomicMapTable.ctime, AtomicMapTable.atomic_map_id)
+    )
+
+    return list(session.execute(stmt).all())
+
+
+def get_coadds_of_atomic_map(
+    atomic_map_id: int, session: Session, max_depth: int = MAX_COADD_DEPTH
+) -> list[AtomicMapCoaddTable]:
+    """
+    Get every coadd that an atomic map contributes to, directly or through
+    the coadds above them.
+
+    Parameters
+    ----------
+    atomic_map_id : int
+        ID of the atomic map.
+    session : Session
+        The database session to use for the query.
+    max_depth : int, optional
+        Number of levels to ascend, by default MAX_COADD_DEPTH. 1 returns
+        only the coadds the atomic map is directly in, and 0 returns none.
+
+    Returns
+    -------
+    coadds : list[AtomicMapCoaddTable]
+        The coadds, each once, nearest level first.
+
+    Raises
+    ------
+    ValueError
+        If max_depth is negative.
+    """
+    _check_depth(max_depth)
+
+    if max_depth == 0:
+        return []
+
+    return _coadds_in(_ancestors(atomic_map_id, max_depth), session, min_depth=1)
@@ -1,9 +1,17 @@
+from collections import defaultdict
+
+import numpy as np
 from astropy.coordinates import ICRS
-from sqlalchemy import select
+from sqlalchemy import and_, or_, select, tuple_
 from sqlalchemy.orm import Session
 
-from mapcat.database import DepthOneMapTable
-from mapcat.toolkit.update_sky_coverage import dec_to_index, ra_to_index
+from mapcat.database import DepthOneMapTable, SkyCellRangeTable, SkyCoverageTable
+from mapcat.sky import MAX_CELL_ORDER, cells_to_ranges, sky_to_nested_cell
+from mapcat.toolkit.update_sky_coverage import (
+    dec_to_index,
+    footprint_contains,
+    ra_to_index,
+)
 
 
 def _get_maps_by_coverage(
@@ -52,19 +60,120 @@ def _get_maps_by_coverage(
     return session.execute(stmt).scalars().all()
 
 
+def _get_maps_by_coverage_batch(
+    ra: np.ndarray,
+    dec: np.ndarray,
+    session: Session,
+    precise: bool = False,
+) -> list[list[DepthOneMapTable]]:
+    """
+    Get the depth one maps that cover each of many positions, using a
+    single query. Positions are binned into sky coverage tiles, all
+    distinct tiles are looked up at once, and the results are fanned
+    back out to the positions in their original order.
+
+    In precise mode, the tiles act as a coarse filter and each candidate
+    is then checked against the footprint stored with its coverage tile,
+    so only maps that observed the cell around the position are kept.
+    Candidates without a stored footprint are always kept.
+
+    Parameters
+    ----------
+    ra : np.ndarray
+        The RAs of the positions to query, in degrees (0 to 360).
+    dec : np.ndarray
+        The Decs of the positions to query, in degrees (-90 to 90).
+    session : Session
+        The database session to use for the query.
+    precise : bool, optional
+        Whether to refine the tile matches using the stored footprints.
+
+    Returns
+    -------
+    maps : list[list[DepthOneMapTable]]
+        For each position, a list of depth one maps that cover it.
+
+    Raises
+    ------
+    ValueError
+        If the RA or Dec of any position is out of bounds.
+    """
+    if np.any((ra < 0) | (ra > 360)):  # pragma: no cover
+        raise ValueError("RA must be between 0 and 360 degrees")
+    if np.any((dec < -90) | (dec > 90)):  # pragma: no cover
+        raise ValueError("Dec must be between -90 and 90 degrees")
+
+    tiles = list(zip(ra_to_index(ra).tolist(), dec_to_index(dec).tolist()))
+
+    if len(tiles) == 0:
+        return []
+
+    # There are at most 36 x 18 distinct tiles, so the IN clause stays
+    # small no matter how many positions are requested.
+    stmt = (
+        select(
+            SkyCoverageTable.x,
+            SkyCoverageTable.y,
+            SkyCoverageTable.footprint,
+            DepthOneMapTable,
+        )
+        .select_from(DepthOneMapTable)
+        .join(DepthOneMapTable.depth_one_sky_coverage)
+        .where(tuple_(SkyCoverageTable.x, SkyCoverageTable.y).in_(sorted(set(tiles))))
+        .order_by(DepthOneMapTable.map_id)
+    )
+
+    rows_by_tile = defaultdict(list)
+    for x, y, footprint, d1map in session.execute(stmt):
+        # Tile indices come back as strings on SQLite.
+        rows_by_tile[(int(x), int(y))].append((footprint, d1map))
+
+    if not precise:
+        return [[d1map for _, d1map in rows_by_tile.get(tile, [])] for tile in tiles]
+
+    positions_by_tile = defaultdict(list)
+    for i, tile in enumerate(tiles):
+        positions_by_tile[tile].append(i)
+
+    maps = [[] for _ in tiles]
+    for tile, rows in rows_by_tile.items():
+        idx = np.array(positions_by_tile[tile])
+        for footprint, d1map in rows:
+            if footprint is not None:
+                idx_in_map = idx[footprint_contains(footprint, ra[idx], dec[idx])]
+            else:
+                idx_in_map = idx
+            for i in idx_in_map:
+                maps[i].append(d1map)
+
+    return maps
+
+
 def get_maps_by_coverage(
     position: list[ICRS] | ICRS,
     session: Session,
+    precise: bool = False,
 ) -> list[list[DepthOneMapTable]] | list[DepthOneMapTable]:
     """
     Get the depth one maps that cover a given position.
 
+    Lists of positions and array-valued coordinates are looked up
+    together in a single query, with one list of maps returned per
+    position in the same order as the input.
+
+    By default, every map that touches the 10x10 degree sky coverage tile
+    containing the position is returned. With `precise`, the maps are
+    additionally checked against the footprints stored at coverage
+    computation time, removing most maps that do not observe the position.
+
     Parameters
     ----------
     position : list[ICRS] | ICRS
         The position to query for coverage. Should be in ICRS coordinates.
     session : Session
         The database session to use for the query.
+    precise : bool, optional
+        Whether to refine the tile matches using the stored footprints.
 
     Returns
     -------
@@ -77,6 +186,119 @@ def get_maps_by_coverage(
         If the RA or Dec of the position is out of bounds.
     """
     if isinstance(position, list):
-        return [_get_maps_by_coverage(p, session) for p in position]
+        ra = np.array([p.ra.deg for p in position], dtype=float)
+        dec = np.array([p.dec.deg for p in position], dtype=float)
+        return _get_maps_by_coverage_batch(ra, dec, session, precise=precise)
+    elif not position.isscalar:
+        ra = np.asarray(position.ra.deg, dtype=float).ravel()
+        dec = np.asarray(position.dec.deg, dtype=float).ravel()
+        return _get_maps_by_coverage_batch(ra, dec, session, precise=precise)
+    elif precise:
+        ra = np.array([position.ra.deg], dtype=float)
+        dec = np.array([position.dec.deg], dtype=float)
+        return _get_maps_by_coverage_batch(ra, dec, session, precise=True)[0]
     else:
         return _get_maps_by_coverage(position, session)
+
+
+def get_maps_by_sky_cells(
+    position: list[ICRS] | ICRS,
+    session: Session,
+    order: int = MAX_CELL_ORDER,
+) -> list[list[DepthOneMapTable]] | list[DepthOneMapTable]:
+    """
+    Get the depth one maps that cover a given position, using the
+    hierarchical sky cell index at the requested resolution. Order 0
+    corresponds to the 10x10 degree sky coverage tiles, and each
+    additional order halves the cell size, up to MAX_CELL_ORDER.
+
+    The stored cell ranges overlapping the requested 10x10 degree tiles are
+    fetched in one query, matched against the cell of each position, and
+    the matching maps are loaded in a second query.
+
+    Parameters
+    ----------
+    position : list[ICRS] | ICRS
+        The position to query for coverage. Should be in ICRS coordinates.
+    session : Session
+        The database session to use for the query.
+    order : int, optional
+        The order of the cells to match positions at, by default MAX_CELL_ORDER.
+
+    Returns
+    -------
+    list[list[DepthOneMapTable]] | list[DepthOneMapTable]
+        A list of depth one maps that cover the given position, or a list of
+        such lists if multiple positions are given.
+
+    Raises
+    ------
+    ValueError
+        If the order is not between 0 and MAX_CELL_ORDER.
+    """
+    if order < 0 or order > MAX_CELL_ORDER:
+        raise ValueError(f"Order must be between 0 and {MAX_CELL_ORDER}")
+
+    scalar = not isinstance(position, list) and position.isscalar
+    if isinstance(position, list):
+        ra = np.array([p.ra.deg for p in position], dtype=float)
+        dec = np.array([p.dec.deg for p in position], dtype=float)
+    else:
+        ra = np.atleast_1d(np.asarray(position.ra.deg, dtype=float)).ravel()
+        dec = np.atleast_1d(np.asarray(position.dec.deg, dtype=float)).ravel()
+
+    if len(ra) == 0:
+        return []
+
+    # Cells of the requested order, as ranges of cells at the stored order.
+    scale = 4 ** (MAX_CELL_ORDER - order)
+    low = sky_to_nested_cell(ra, dec, order=order) * scale
+    high = low + scale
+
+    tile_scale = 4**MAX_CELL_ORDER
+    tile_ranges = cells_to_ranges(low // tile_scale) * tile_scale
+    stmt = (
+        select(
+            SkyCellRangeTable.map_id,
+            SkyCellRangeTable.cell_start,
+            SkyCellRangeTable.cell_end,
+        )
+        .where(
+            or_(
+                *[
+                    and_(
+                        SkyCellRangeTable.cell_start < int(end),
+                        SkyCellRangeTable.cell_end > int(start),
+                    )
+                    for start, end in tile_ranges
+                ]
+            )
+        )
+        .order_by(SkyCellRangeTable.map_id, SkyCellRangeTable.cell_start)
+    )
+    rows = np.array(session.execute(stmt).all(), dtype=np.int64).reshape(-1, 3)
+
+    hits = {}
+    map_ids, first = np.unique(rows[:, 0], return_index=True)
+    for map_id, start, stop in zip(map_ids, first, np.r_[first[1:], len(rows)]):
+        starts = rows[start:stop, 1]
+        ends = rows[start:stop, 2]
+        # Ranges of a map are disjoint and sorted, so the first range
+        # ending after `low` is the only one that can overlap the cell.
+        idx = np.searchsorted(ends, low, side="right")
+        covered = idx < len(ends)
+        covered[covered] = starts[idx[covered]] < high[covered]
+        if np.any(covered):
+            hits[int(map_id)] = covered
+
+    d1maps = {}
+    if hits:
+        stmt = select(DepthOneMapTable).where(DepthOneMapTable.map_id.in_(list(hits)))
+        d1maps = {d1map.map_id: d1map for d1map in session.execute(stmt).scalars()}
+
+    maps = [[] for _ in range(len(ra))]
+    for map_id, covered in hits.items():
+        for i in np.flatnonzero(covered):
+            maps[i].append(d1maps[map_id])
+
+    return maps[0] if scalar else maps
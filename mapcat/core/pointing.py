@@ -0,0 +1,236 @@
+"""
+Pointing corrections for positions spread over many depth-1 maps.
+"""
+
+import numpy as np
+from astropy import units as u
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from mapcat.database import DepthOneMapTable, PointingResidualTable
+from mapcat.database.json import json_decode_mode
+from mapcat.database.pointing_residual import PointingModel
+from mapcat.pointing.time_dependent import TimeDependentPointingModel
+
+MAP_ID_CHUNK_SIZE = 900
+"Maximum number of map_ids bound into a single residual lookup query."
+
+
+def get_pointing_models(
+    map_ids: list[int], session: Session
+) -> dict[int, PointingModel]:
+    """
+    Get the latest pointing residual model of each of many depth-1 maps.
+
+    Parameters
+    ----------
+    map_ids : list[int]
+        IDs of the depth-1 maps.
+    session : Session
+        The database session to use for the query.
+
+    Returns
+    -------
+    models : dict[int, PointingModel]
+        The most recently added residual model of every map that has one.
+        Time-dependent models stored without a ctime are fixed to the ctime
+        of the map.
+    """
+    map_ids = [int(map_id) for map_id in dict.fromkeys(map_ids)]
+
+    models = {}
+    for start in range(0, len(map_ids), MAP_ID_CHUNK_SIZE):
+        chunk = map_ids[start : start + MAP_ID_CHUNK_SIZE]
+        latest = (
+            select(func.max(PointingResidualTable.pointing_residual_id))
+            .where(PointingResidualTable.map_id.in_(chunk))
+            .group_by(PointingResidualTable.map_id)
+        )
+        stmt = (
+            select(
+                PointingResidualTable.map_id,
+                PointingResidualTable.residual_model,
+                DepthOneMapTable.ctime,
+            )
+            .join(DepthOneMapTable)
+            .where(PointingResidualTable.pointing_residual_id.in_(latest))
+        )
+        # Models are used right away, so are validated whatever the decode
+        # mode of the caller.
+        with json_decode_mode("validate"):
+            rows = session.execute(stmt).all()
+        for map_id, model, ctime in rows:
+            if isinstance(model, TimeDependentPointingModel) and model.ctime is None:
+                model = model.at(ctime)
+            models[map_id] = model
+
+    return models
+
+
+def correct_positions(
+    map_ids: np.ndarray,
+    ra: np.ndarray,
+    dec: np.ndarray,
+    session: Session,
+    strict: bool = False,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Apply the pointing corrections of the maps that positions were measured
+    in, loading every residual model needed in one query and correcting the
+    positions of each map with one vectorized model evaluation.
+
+    Parameters
+    ----------
+    map_ids : np.ndarray
+        The ID of the depth-1 map each position was measured in.
+    ra : np.ndarray
+        The measured RAs, in degrees.
+    dec : np.ndarray
+        The measured Decs, in degrees.
+    session : Session
+        The database session to use for the query.
+    strict : bool, optional
+        Whether to raise if a map has no pointing residual model. By default
+        the positions of such maps are returned unchanged.
+
+    Returns
+    -------
+    ra, dec : tuple[np.ndarray, np.ndarray]
+        The corrected RAs and Decs, in degrees.
+
+    Raises
+    ------
+    ValueError
+        If the arrays have different lengths, or if strict is set and a map
+        has no pointing residual model.
+    """
+    map_ids = np.asarray(map_ids, dtype=np.int64).ravel()
+    ra = np.array(ra, dtype=float).ravel()
+    dec = np.array(dec, dtype=float).ravel()
+    if not len(map_ids) == len(ra) == len(dec):
+        raise ValueError("map_ids, ra and dec must have the same length")
+
+    unique_ids, inverse = np.unique(map_ids, return_inverse=True)
+    models = get_pointing_models(unique_ids.tolist(), session)
+
+    if strict:
+        missing = set(unique_ids.tolist()) - set(models)
+        if missing:
+            raise ValueError(f"No pointing residual model for maps {missing}")
+
+    # Indices of the positions of each map, as contiguous runs.
+    by_map = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[by_map], np.arange(len(unique_ids) + 1))
+
+    for k, map_id in enumerate(unique_ids.tolist()):
+        model = models.get(map_id)
+        if model is None:
+            continue
+        idx = by_map[bounds[k] : bounds[k + 1]]
+        ra[idx], dec[idx] = model.predict_arrays(ra[idx], dec[idx])
+
+    return ra, dec
+
+
+def fit_time_dependent_model(
+    session: Session,
+    poly_order: int,
+    start_time: float | None = None,
+    stop_time: float | None = None,
+    tube_slot: str | None = None,
+    frequency: str | None = None,
+) -> TimeDependentPointingModel:
+    """
+    Fit a time-dependent pointing model to the residual stats stored for
+    many depth-1 maps. The stats hold the mean correction applied to the
+    sources of each map (corrected minus measured position, as computed by
+    `calculate_statistics`), so the pointing offset (measured minus true
+    position) fitted at the ctime of each map is minus that mean.
+
+    Each map's latest residual with mean offsets is used. When every one of
+    them also has offset standard deviations and source counts, the maps
+    are weighted by the inverse uncertainty of their mean offsets;
+    otherwise, they are weighted equally.
+
+    Parameters
+    ----------
+    session : Session
+        The database session to use for the query.
+    poly_order : int
+        Order of the polynomial in time.
+    start_time : float | None, optional
+        Earliest ctime of the maps to fit to.
+    stop_time : float | None, optional
+        Latest ctime of the maps to fit to.
+    tube_slot : str | None, optional
+        Only fit to maps from this tube slot.
+    frequency : str | None, optional
+        Only fit to maps in this frequency band.
+
+    Returns
+    -------
+    model : TimeDependentPointingModel
+        The fitted model.
+
+    Raises
+    ------
+    ValueError
+        If no maps in the selection have residual stats with mean offsets.
+    """
+    latest = select(func.max(PointingResidualTable.pointing_residual_id)).group_by(
+        PointingResidualTable.map_id
+    )
+    stmt = (
+        select(DepthOneMapTable.ctime, PointingResidualTable.residual_stats)
+        .join(DepthOneMapTable)
+        .where(
+            PointingResidualTable.pointing_residual_id.in_(latest),
+            PointingResidualTable.residual_stats.is_not(None),
+        )
+        .order_by(DepthOneMapTable.ctime)
+    )
+    if start_time is not None:
+        stmt = stmt.where(DepthOneMapTable.ctime >= start_time)
+    if stop_time is not None:
+        stmt = stmt.where(DepthOneMapTable.ctime <= stop_time)
+    if tube_slot is not None:
+        stmt = stmt.where(DepthOneMapTable.tube_slot == tube_slot)
+    if frequency is not None:
+        stmt = stmt.where(DepthOneMapTable.frequency == frequency)
+
+    with json_decode_mode("validate"):
+        selected = session.execute(stmt).all()
+
+    rows = [
+        (ctime, stats)
+        for ctime, stats in selected
+        if stats is not None
+        and stats.mean_ra_offset is not None
+        and stats.mean_dec_offset is not None
+    ]
+    if not rows:
+        raise ValueError("No residual stats with mean offsets in the selection.")
+
+    ctimes = np.array([ctime for ctime, _ in rows])
+    ra_offsets = -u.Quantity([stats.mean_ra_offset for _, stats in rows])
+    dec_offsets = -u.Quantity([stats.mean_dec_offset for _, stats in rows])
+
+    weights = None
+    if all(
+        stats.n_sources
+        and stats.stddev_ra_offset is not None
+        and stats.stddev_dec_offset is not None
+        and stats.stddev_ra_offset > 0
+        and stats.stddev_dec_offset > 0
+        for _, stats in rows
+    ):
+        root_n = np.sqrt([stats.n_sources for _, stats in rows])
+        weights = (
+            root_n / u.Quantity([s.stddev_ra_offset for _, s in rows]).to_value(u.deg),
+            root_n / u.Quantity([s.stddev_dec_offset for _, s in rows]).to_value(u.deg),
+        )
+
+    model = TimeDependentPointingModel(poly_order=poly_order)
+    model.build_model(ctimes, ra_offsets, dec_offsets, weights=weights)
+
+    return model
@@ -8,6 +8,7 @@ from .depth_one_coadd import DepthOneCoaddTable
 from .depth_one_map import DepthOneMapTable
 from .pipeline_information import PipelineInformationTable
 from .pointing_residual import PointingResidualTable
+from .sky_cells import SkyCellRangeTable
 from .sky_coverage import SkyCoverageTable
 from .time_domain_processing import TimeDomainProcessingTable
 from .tod import TODDepthOneTable
@@ -18,6 +19,7 @@ __all__ = [
     "DepthOneMapTable",
     "PipelineInformationTable",
     "PointingResidualTable",
+    "SkyCellRangeTable",
     "SkyCoverageTable",
     "TODDepthOneTable",
     "TimeDomainProcessingTable",
@@ -33,4 +35,5 @@ ALL_TABLES = [
     TODDepthOneTable,
     PipelineInformationTable,
     SkyCoverageTable,
+    SkyCellRangeTable,
 ]
@@ -4,30 +4,66 @@ Table for atomic maps.
 
 from typing import TYPE_CHECKING
 
+from sqlalchemy import BigInteger, Index, event
 from sqlmodel import Field, Relationship, SQLModel
 
+from mapcat.sky import sky_to_nested_cell
+
 from .links import AtomicMapToCoaddTable
 
 if TYPE_CHECKING:
     from .atomic_coadd import AtomicMapCoaddTable  # pragma: no cover
 
 
+def _sky_cell(ra_center: float | None, dec_center: float | None) -> int | None:
+    """
+    The nested sky cell id (see `mapcat.sky.sky_to_nested_cell`) at
+    MAX_CELL_ORDER of a map center, or None without one.
+    """
+    if ra_center is None or dec_center is None:
+        return None
+    return int(sky_to_nested_cell(ra_center, dec_center))
+
+
+def _default_sky_cell(context) -> int | None:
+    """
+    Column default of sky_cell, for rows inserted without the ORM (Core
+    inserts and mapcat.toolkit.bulk) that do not give it.
+    """
+    parameters = context.get_current_parameters()
+    return _sky_cell(parameters.get("ra_center"), parameters.get("dec_center"))
+
+
 class AtomicMapTable(SQLModel, table=True):
     __tablename__ = "atomic_maps"
+    __table_args__ = (
+        # Atomic maps are ingested roughly in time order, so a BRIN index
+        # serves time windows on PostgreSQL at a fraction of the size.
+        Index("ix_atomic_maps_ctime", "ctime", postgresql_using="brin"),
+        Index(
+            "ix_atomic_maps_freq_channel_split_label_ctime",
+            "freq_channel",
+            "split_label",
+            "ctime",
+        ),
+        Index(
+            "ix_atomic_maps_wafer_freq_channel_ctime", "wafer", "freq_channel", "ctime"
+        ),
+    )
 
     atomic_map_id: int = Field(primary_key=True)
 
-    obs_id: str = Field()
+    obs_id: str = Field(index=True)
     telescope: str = Field()
-    freq_channel: str = Field()
-    wafer: str = Field()
+    freq_channel: str = Field(index=True)
+    wafer: str = Field(index=True)
     ctime: int = Field()
-    split_label: str = Field()
+    split_label: str = Field(index=True)
 
     map_path: str | None = Field()
     ivar_path: str | None = Field()
 
-    valid: bool | None = Field()
+    valid: bool | None = Field(index=True)
     split_detail: str | None = Field()
     prefix_path: str | None = Field()
     elevation: float | None = Field()
@@ -51,6 +87,12 @@ class AtomicMapTable(SQLModel, table=True):
     uv: float | None = Field()
     ra_center: float | None = Field()
     dec_center: float | None = Field()
+    sky_cell: int | None = Field(
+        default=None,
+        sa_type=BigInteger,
+        index=True,
+        sa_column_kwargs={"default": _default_sky_cell},
+    )
     number_dets: int | None = Field()
     moon_distance: float | None = Field()
     wind_speed: float | None = Field()
@@ -61,3 +103,13 @@ class AtomicMapTable(SQLModel, table=True):
         back_populates="atomic_maps",
         link_model=AtomicMapToCoaddTable,
     )
+
+
+@event.listens_for(AtomicMapTable, "before_insert")
+@event.listens_for(AtomicMapTable, "before_update")
+def _set_sky_cell(mapper, connection, target: AtomicMapTable):
+    """
+    Keep sky_cell in step with ra_center and dec_center on ORM flushes,
+    which always write sky_cell and so bypass its column default.
+    """
+    target.sky_cell = _sky_cell(target.ra_center, target.dec_center)
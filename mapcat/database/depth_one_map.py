@@ -4,12 +4,14 @@ Depth one map table.
 
 from typing import TYPE_CHECKING, Any
 
+from sqlalchemy import Index
 from sqlmodel import JSON, Field, Relationship, SQLModel
 
 if TYPE_CHECKING:  # pragma: no cover
     from .depth_one_coadd import DepthOneCoaddTable
     from .pipeline_information import PipelineInformationTable
     from .pointing_residual import PointingResidualTable
+    from .sky_cells import SkyCellRangeTable
     from .sky_coverage import SkyCoverageTable
     from .time_domain_processing import TimeDomainProcessingTable
     from .tod import TODDepthOneTable
@@ -70,12 +72,23 @@ class DepthOneMapTable(SQLModel, table=True):
         List of pipeline info associed with d1 map
     depth_one_sky_coverage : list[SkyCoverageTable]
         List of sky coverage patches for d1 map.
+    depth_one_sky_cell_ranges : list[SkyCellRangeTable]
+        List of hierarchical sky cell ranges for d1 map.
 
     notes: dict[str, Any]
         JSON entry that holds additional information about the d1 maps
     """
 
     __tablename__ = "depth_one_maps"
+    __table_args__ = (
+        Index(
+            "ix_depth_one_maps_frequency_tube_slot_ctime",
+            "frequency",
+            "tube_slot",
+            "ctime",
+            postgresql_include=["map_id"],
+        ),
+    )
 
     map_id: int = Field(primary_key=True)
     map_name: str = Field(index=True, unique=True, nullable=False)
@@ -117,6 +130,10 @@ class DepthOneMapTable(SQLModel, table=True):
         back_populates="map",
         cascade_delete=True,
     )
+    depth_one_sky_cell_ranges: list["SkyCellRangeTable"] = Relationship(
+        back_populates="map",
+        cascade_delete=True,
+    )
     coadds: list["DepthOneCoaddTable"] = Relationship(
         back_populates="maps",
         link_model=DepthOneToCoaddTable,
@@ -2,27 +2,139 @@
 A custom SQLAlchemy type to (de)serialize pydantic models to JSONB.
 
 See: https://github.com/fastapi/sqlmodel/pull/1324 - this can be removed at some point.
+
+Validating every row can dominate scans over many rows, so values can also
+be decoded lazily (a `LazyPydanticModel` proxy that validates on first
+attribute access) or as the raw JSON dictionaries. The mode is set per
+column with the `mode` argument, and can be overridden for a block of code
+with `json_decode_mode`.
 """
 
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Literal
+
 from pydantic import TypeAdapter
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.types import JSON, TypeDecorator
 
+DecodeMode = Literal["validate", "lazy", "raw"]
+
+_decode_mode: ContextVar[DecodeMode | None] = ContextVar(
+    "json_decode_mode", default=None
+)
+
+
+@contextmanager
+def json_decode_mode(mode: DecodeMode) -> Generator[None, None, None]:
+    """
+    Decode JSONEncodedPydantic columns loaded within the block with mode
+    ('validate', 'lazy' or 'raw'), whatever the mode of the column.
+
+    The mode applies when values are loaded from the database. ORM objects
+    already in the identity map of a session are not loaded again, and keep
+    the values decoded in the mode they were first loaded with.
+
+    Raises
+    ------
+    ValueError
+        If mode is not a known decode mode.
+    """
+    if mode not in ("validate", "lazy", "raw"):
+        raise ValueError(f"Unknown JSON decode mode {mode!r}")
+
+    token = _decode_mode.set(mode)
+    try:
+        yield
+    finally:
+        _decode_mode.reset(token)
+
+
+class LazyPydanticModel:
+    """
+    Stand-in for a pydantic model loaded from the database, which validates
+    the stored JSON only when one of its attributes is first used.
+    """
+
+    __slots__ = ("_adapter", "_model", "raw")
+
+    def __init__(self, raw: dict[str, Any], adapter: TypeAdapter):
+        self.raw = raw
+        self._adapter = adapter
+        self._model = None
+
+    @property
+    def model(self):
+        """The validated pydantic model."""
+        if self._model is None:
+            self._model = self._adapter.validate_python(self.raw)
+        return self._model
+
+    def __getattr__(self, name: str):
+        # Only called for attributes missing from the proxy itself; private
+        # names are not delegated, so half-initialized copies fail cleanly.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LazyPydanticModel):
+            return self.raw == other.raw
+        return self.model == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        state = "validated" if self._model is not None else "unvalidated"
+        return f"LazyPydanticModel({self.raw!r}, {state})"
+
+
+@lru_cache
+def _type_adapter(pydantic_class) -> TypeAdapter:
+    """
+    The TypeAdapter of a pydantic class, shared by every column of that type.
+    """
+    return TypeAdapter(pydantic_class)
+
 
 class JSONEncodedPydantic(TypeDecorator):
     impl = JSON
     cache_ok = True
 
-    def __init__(self, pydantic_class, *args, **kwargs):
+    def __init__(self, pydantic_class, *args, mode: DecodeMode = "validate", **kwargs):
         super().__init__(*args, **kwargs)
         self.pydantic_class = pydantic_class
-        self._adapter = TypeAdapter(pydantic_class)
+        self.mode = mode
+        self._adapter = _type_adapter(pydantic_class)
+
+    def load_dialect_impl(self, dialect):
+        # JSONB on PostgreSQL, so that fields can be filtered on server-side.
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(JSON())
 
     def process_bind_param(self, value, dialect):
         if value is None:
             return None
+        if isinstance(value, LazyPydanticModel):
+            # An unvalidated proxy loaded from a column of this type holds
+            # JSON that was valid when written, and is stored as it is.
+            if value._model is None and value._adapter is self._adapter:
+                return value.raw
+            value = value.model
+        if isinstance(value, dict):
+            value = self._adapter.validate_python(value)
         return value.model_dump(mode="json")
 
     def process_result_value(self, value, dialect):
         if value is None:
             return None
+
+        mode = _decode_mode.get() or self.mode
+        if mode == "raw":
+            return value
+        if mode == "lazy":
+            return LazyPydanticModel(value, self._adapter)
         return self._adapter.validate_python(value)
@@ -7,11 +7,14 @@ from sqlmodel import Field, Relationship, SQLModel
 from mapcat.pointing.base import PointingModelStats
 from mapcat.pointing.const import ConstantPointingModel
 from mapcat.pointing.poly import PolynomialPointingModel
+from mapcat.pointing.time_dependent import TimeDependentPointingModel
 
 from .depth_one_map import DepthOneMapTable
 from .json import JSONEncodedPydantic
 
-PointingModel = ConstantPointingModel | PolynomialPointingModel
+PointingModel = (
+    ConstantPointingModel | PolynomialPointingModel | TimeDependentPointingModel
+)
 
 
 class PointingResidualTable(SQLModel, table=True):
@@ -24,7 +27,7 @@ class PointingResidualTable(SQLModel, table=True):
     ----------
     map_id : int
         Internal ID of the depth one map
-    residual_model: ConstantPointingModel | PolynomialPointingModel
+    residual_model: PointingModel
         The pointing model to actually store in the database.
     residual_stats: PointingModelStats
         Statistics about the pointing residuals, such as mean and stddev of RA and Dec offsets
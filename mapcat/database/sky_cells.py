@@ -0,0 +1,54 @@
+"""
+Hierarchical sky cell coverage table.
+"""
+
+from sqlalchemy import BigInteger, Index, PrimaryKeyConstraint
+from sqlmodel import Field, Relationship, SQLModel
+
+from .depth_one_map import DepthOneMapTable
+
+
+class SkyCellRangeTable(SQLModel, table=True):
+    """
+    Table for tracking the hierarchical sky cells observed by a given depth one map,
+    stored as ranges of nested cell ids. Each 10x10 degree sky coverage patch is the
+    base cell of a quadtree; a cell of order k has id `base * 4**k + morton(ix, iy)`,
+    so all descendants of a cell form a contiguous range of ids at any higher order.
+    Ranges are stored at `mapcat.sky.MAX_CELL_ORDER`.
+
+    Attributes
+    ----------
+    sky_cell_range_id : PrimaryKeyConstraint
+        Composite ID from map_id and cell_start
+    map : DepthOneMapTable
+       Depth 1 map being tracked. Foreign into DepthOneMap
+    map_id : int
+       ID of depth 1 map being tracked
+    cell_start : int
+        First nested cell id of the range.
+    cell_end : int
+        One past the last nested cell id of the range.
+    """
+
+    __tablename__ = "depth_one_sky_cell_ranges"
+
+    map_id: int = Field(
+        foreign_key="depth_one_maps.map_id",
+        nullable=False,
+        ondelete="CASCADE",
+        primary_key=True,
+    )
+    cell_start: int = Field(sa_type=BigInteger, index=True, primary_key=True)
+    cell_end: int = Field(sa_type=BigInteger, index=True, nullable=False)
+
+    map: DepthOneMapTable = Relationship(back_populates="depth_one_sky_cell_ranges")
+
+    __table_args__ = (
+        PrimaryKeyConstraint("map_id", "cell_start", name="sky_cell_range_id"),
+        Index(
+            "ix_depth_one_sky_cell_ranges_cell_start_cell_end_map_id",
+            "cell_start",
+            "cell_end",
+            "map_id",
+        ),
+    )
@@ -2,7 +2,7 @@
 Sky coverage table.
 """
 
-from sqlalchemy import PrimaryKeyConstraint
+from sqlalchemy import Index, LargeBinary, PrimaryKeyConstraint
 from sqlmodel import Field, Relationship, SQLModel
 
 from .depth_one_map import DepthOneMapTable
@@ -25,6 +25,10 @@ class SkyCoverageTable(SQLModel, table=True):
         x-index of coverage patch. x=0 runs from RA 0 to 10,, etc.
     y : in
         y-index of coverage patch. y=0 runs from dec = -90 to -80, etc.
+    footprint : bytes | None
+        Packed boolean mask of the observed 0.5x0.5 degree cells within the
+        patch, see `mapcat.toolkit.update_sky_coverage.get_sky_footprints`.
+        None for coverage computed before footprints were stored.
     """
 
     __tablename__ = "depth_one_sky_coverage"
@@ -39,6 +43,11 @@ class SkyCoverageTable(SQLModel, table=True):
         primary_key=True,
     )
 
+    footprint: bytes | None = Field(default=None, sa_type=LargeBinary)
+
     map: DepthOneMapTable = Relationship(back_populates="depth_one_sky_coverage")
 
-    __table_args__ = (PrimaryKeyConstraint("map_id", "x", "y", name="sky_cov_id"),)
+    __table_args__ = (
+        PrimaryKeyConstraint("map_id", "x", "y", name="sky_cov_id"),
+        Index("ix_depth_one_sky_coverage_x_y_map_id", "x", "y", "map_id"),
+    )
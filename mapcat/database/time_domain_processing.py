@@ -26,6 +26,8 @@ class TimeDomainProcessingTable(SQLModel, table=True):
         Time processing ended. None if not ended.
     processing_status : str
         Status of processing
+    worker_id : str | None
+        Identifier of the worker that claimed the map for processing.
     """
 
     __tablename__ = "time_domain_processing"
@@ -43,3 +45,4 @@ class TimeDomainProcessingTable(SQLModel, table=True):
     processing_start: float = Field(nullable=True)
     processing_end: float = Field(nullable=True)
     processing_status: str = Field(index=True, nullable=False)
+    worker_id: str | None = Field(default=None, nullable=True)
@@ -2,6 +2,7 @@
 Table for TODs
 """
 
+from sqlalchemy import Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
 from .depth_one_map import DepthOneMapTable
@@ -10,7 +11,8 @@ from .links import TODToMapTable
 
 class TODDepthOneTable(SQLModel, table=True):
     """
-    Table of TODs used in making depth 1 maps.
+    Table of TODs used in making depth 1 maps. A TOD is identified by its
+    obs_id, tube_slot and frequency, and is shared by all the maps it went into.
 
     Attributes
     ----------
@@ -67,6 +69,17 @@ class TODDepthOneTable(SQLModel, table=True):
     """
 
     __tablename__ = "tod_depth_one"
+    __table_args__ = (
+        # tube_slot and frequency are nullable in the database, and NULLs
+        # are distinct in unique indexes, so missing values index as ''.
+        Index(
+            "ix_tod_depth_one_obs_id_tube_slot_frequency",
+            "obs_id",
+            text("COALESCE(tube_slot, '')"),
+            text("COALESCE(frequency, '')"),
+            unique=True,
+        ),
+    )
     tod_id: int = Field(primary_key=True)
     obs_id: str = Field(nullable=False)
     pwv: float | None = Field(index=True, nullable=True)
@@ -8,7 +8,8 @@ from typing import Literal
 
 from pydantic import PrivateAttr
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from sqlalchemy import Engine
+from sqlalchemy import Engine, NullPool, event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import create_engine
 
@@ -24,33 +25,124 @@ class Settings(BaseSettings):  # pragma: no cover
 
     echo: bool = False
 
+    pool_size: int = 5
+    "Number of connections kept open in the pool (PostgreSQL)."
+    max_overflow: int = 10
+    "Number of connections allowed beyond pool_size under load (PostgreSQL)."
+    pool_timeout: float = 30.0
+    "Seconds to wait for a connection from the pool (PostgreSQL)."
+    pool_recycle: int = -1
+    "Replace connections older than this many seconds; -1 never replaces them."
+    pool_pre_ping: bool = False
+    "Test connections when they are taken from the pool, replacing stale ones."
+    statement_timeout: float | None = None
+    "Seconds after which PostgreSQL cancels a statement; None for no limit."
+    null_pool: bool = False
+    "Open a new connection for every checkout, e.g. when behind pgbouncer."
+
+    read_only: bool = False
+    "Open SQLite catalogs as immutable and read-only, for lock-free parallel reads."
+    sqlite_journal_mode: str = "wal"
+    "SQLite journal mode; use 'delete' on filesystems without shared memory (e.g. NFS)."
+    sqlite_synchronous: str = "normal"
+    "SQLite synchronous setting; 'normal' is safe with WAL journaling."
+    sqlite_mmap_size: int = 256 * 1024**2
+    "Bytes of the SQLite file to memory-map."
+    sqlite_cache_size: int = -64 * 1024
+    "SQLite page cache size; negative values are in KiB."
+    sqlite_busy_timeout: int = 30_000
+    "Milliseconds SQLite waits for a lock held by another process."
+
     model_config: SettingsConfigDict = {
         "env_prefix": "mapcat_",
     }
 
     _engine: Engine | None = PrivateAttr(default=None)
     _sessionmaker: sessionmaker | None = PrivateAttr(default=None)
+    _async_engine: AsyncEngine | None = PrivateAttr(default=None)
+    _async_sessionmaker: async_sessionmaker | None = PrivateAttr(default=None)
+
+    @property
+    def _sqlite_database(self) -> str:
+        if self.read_only:
+            return f"file:{self.database_name}?mode=ro&immutable=1&uri=true"
+        return self.database_name
 
     @property
     def async_database_url(self) -> str:
         if self.database_type == "sqlite":
-            return f"sqlite+aiosqlite:///{self.database_name}"
+            return f"sqlite+aiosqlite:///{self._sqlite_database}"
         if self.database_type == "postgresql":
             return f"postgresql+asyncpg://{self.database_name}"
 
     @property
     def sync_database_url(self) -> str:
         if self.database_type == "sqlite":
-            return f"sqlite:///{self.database_name}"
+            return f"sqlite:///{self._sqlite_database}"
         if self.database_type == "postgresql":
             return f"postgresql://{self.database_name}"
 
+    def _set_sqlite_pragmas(self, dbapi_connection, connection_record):
+        """Connect event listener applying the SQLite profile."""
+        pragmas = {
+            "mmap_size": self.sqlite_mmap_size,
+            "cache_size": self.sqlite_cache_size,
+        }
+        if not self.read_only:
+            pragmas["busy_timeout"] = self.sqlite_busy_timeout
+            pragmas["journal_mode"] = self.sqlite_journal_mode
+            pragmas["synchronous"] = self.sqlite_synchronous
+
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    def _configure_engine(self, engine: Engine) -> Engine:
+        if self.database_type == "sqlite":
+            event.listen(engine, "connect", self._set_sqlite_pragmas)
+        return engine
+
+    def _engine_kwargs(self, asynchronous: bool = False) -> dict:
+        """Keyword arguments for create_engine or create_async_engine."""
+        kwargs = {
+            "echo": self.echo,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+
+        if self.null_pool:
+            kwargs["poolclass"] = NullPool
+        elif self.database_type == "postgresql":
+            # SQLite uses pools that do not take these (e.g. for :memory:).
+            kwargs["pool_size"] = self.pool_size
+            kwargs["max_overflow"] = self.max_overflow
+            kwargs["pool_timeout"] = self.pool_timeout
+
+        if self.database_type == "postgresql":
+            connect_args = {}
+            if self.statement_timeout is not None:
+                timeout = str(int(self.statement_timeout * 1000))
+                if asynchronous:
+                    connect_args["server_settings"] = {"statement_timeout": timeout}
+                else:
+                    connect_args["options"] = f"-c statement_timeout={timeout}"
+            if asynchronous and self.null_pool:
+                # pgbouncer in transaction mode cannot keep prepared statements.
+                connect_args["statement_cache_size"] = 0
+            if connect_args:
+                kwargs["connect_args"] = connect_args
+
+        return kwargs
+
     @property
     def engine(self) -> Engine:
         """Create a synchronous engine."""
         if self._engine is not None:
             return self._engine
-        self._engine = create_engine(self.sync_database_url, echo=self.echo)
+        self._engine = self._configure_engine(
+            create_engine(self.sync_database_url, **self._engine_kwargs())
+        )
         return self._engine
 
     @property
@@ -62,9 +154,54 @@ class Settings(BaseSettings):  # pragma: no cover
         self._sessionmaker = sessionmaker(self.engine, expire_on_commit=False)
         return self._sessionmaker
 
+    @property
+    def async_engine(self) -> AsyncEngine:
+        """Create an asynchronous engine."""
+        if self._async_engine is not None:
+            return self._async_engine
+        self._async_engine = create_async_engine(
+            self.async_database_url, **self._engine_kwargs(asynchronous=True)
+        )
+        self._configure_engine(self._async_engine.sync_engine)
+        return self._async_engine
+
+    @property
+    def async_session(self) -> async_sessionmaker:
+        """Create an asynchronous session maker."""
+        if self._async_sessionmaker is not None:
+            return self._async_sessionmaker
+
+        self._async_sessionmaker = async_sessionmaker(
+            self.async_engine, expire_on_commit=False
+        )
+        return self._async_sessionmaker
+
+    def dispose_engines(self, close: bool = False):
+        """
+        Drop the connection pools of the engines, so new connections are
+        opened on next use. The engines and session makers stay valid.
+
+        Call this in a process created with fork() (this is done
+        automatically for `settings`), where the connections inherited
+        from the parent must not be used. With close=False these are
+        left alone for the parent to keep using.
+
+        Parameters
+        ----------
+        close : bool, optional
+            Whether to also close the pooled connections, by default False.
+        """
+        if self._engine is not None:
+            self._engine.dispose(close=close)
+        if self._async_engine is not None:
+            self._async_engine.sync_engine.dispose(close=close)
+
 
 settings = Settings()
 
+if hasattr(os, "register_at_fork"):  # pragma: no cover
+    os.register_at_fork(after_in_child=settings.dispose_engines)
+
 
 def migrate():  # pragma: no cover
     """
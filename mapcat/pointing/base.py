@@ -5,6 +5,7 @@ Base pointing model.
 from abc import ABC, abstractmethod
 from typing import Literal
 
+import numpy as np
 from astropy import units as u
 from astropy.coordinates import SkyCoord
 from astropydantic import AstroPydanticQuantity
@@ -29,3 +30,14 @@ class PointingModelProtocol(ABC, BaseModel):
         from the one initially predicted in the map.
         """
         ...
+
+    def predict_arrays(
+        self, ra: np.ndarray, dec: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Like `predict`, but for plain arrays of RA and Dec in degrees, which
+        avoids constructing SkyCoord objects when correcting many sources.
+        Models override this with a vectorized implementation.
+        """
+        pos = self.predict(SkyCoord(ra=ra * u.deg, dec=dec * u.deg))
+        return pos.ra.to_value(u.deg), pos.dec.to_value(u.deg)
@@ -4,6 +4,7 @@ Constant pointing model.
 
 from typing import Literal
 
+import numpy as np
 from astropy import units as u
 from astropy.coordinates import SkyCoord
 from astropydantic import AstroPydanticQuantity
@@ -22,3 +23,11 @@ class ConstantPointingModel(PointingModelProtocol):
         dec = pos.dec - self.dec_offset
 
         return SkyCoord(ra=ra, dec=dec, frame=pos.frame)
+
+    def predict_arrays(
+        self, ra: np.ndarray, dec: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        ra = np.mod(np.asarray(ra, dtype=float) - self.ra_offset.to_value(u.deg), 360)
+        dec = np.asarray(dec, dtype=float) - self.dec_offset.to_value(u.deg)
+
+        return ra, dec
@@ -2,17 +2,66 @@
 Polynomial pointing model.
 """
 
+from functools import lru_cache
 from typing import Literal
 
 import numpy as np
 from astropy import units as u
 from astropy.coordinates import SkyCoord
 from astropydantic import AstroPydanticUnit
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 from mapcat.pointing.base import PointingModelProtocol, PointingModelStats
 
 
+@lru_cache
+def _exponents(poly_order: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Powers of x and y of each basis term of a 2D polynomial, in the order of
+    `PolynomialPointingModel._poly_keys`.
+    """
+    i = np.array([i for i in range(poly_order + 1) for _ in range(poly_order + 1 - i)])
+    j = np.array([j for i in range(poly_order + 1) for j in range(poly_order + 1 - i)])
+    return i, j
+
+
+def _solve(design: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Least-squares solution for every column of targets, from a single QR
+    factorization of the design matrix. Rank-deficient systems fall back to
+    the minimum-norm solution of np.linalg.lstsq.
+    """
+    q, r = np.linalg.qr(design)
+    diag = np.abs(np.diag(r))
+    if r.shape[0] == r.shape[1] and diag.min() > (
+        max(design.shape) * np.finfo(float).eps * diag.max()
+    ):
+        return np.linalg.solve(r, q.T @ targets)
+
+    coeffs, *_ = np.linalg.lstsq(design, targets, rcond=None)
+    return coeffs
+
+
+def _solve_weighted(
+    design: np.ndarray, targets: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    """
+    Weighted least-squares solution for every column of targets, given the
+    weights of each row for each column. Columns with the same weights
+    share one factorization.
+    """
+    if np.all(weights == weights[:, :1]):
+        return _solve(design * weights[:, :1], targets * weights[:, :1])
+
+    return np.stack(
+        [
+            _solve(design * weights[:, [c]], targets[:, c] * weights[:, c])
+            for c in range(targets.shape[1])
+        ],
+        axis=1,
+    )
+
+
 class PolynomialCoefficients(BaseModel):
     """
     Coefficients for a polynomial pointing model.
@@ -40,13 +89,24 @@ class PolynomialPointingModel(PointingModelProtocol):
     ra_model_coefficients: PolynomialCoefficients | None = None
     dec_model_coefficients: PolynomialCoefficients | None = None
 
+    # Coefficient arrays for the current coefficient objects, as
+    # (ra_coefficients, dec_coefficients, ra_array, dec_array).
+    _coefficient_cache: tuple | None = PrivateAttr(default=None)
+    # Number of sources given full weight by the last build_model.
+    _n_inliers: int | None = PrivateAttr(default=None)
+
     ## Basis terms for 2D polynomial fit
     def _poly_terms(self, x, y):
-        terms = []
-        for i in range(self.poly_order + 1):
-            for j in range(self.poly_order + 1 - i):
-                terms.append((x**i) * (y**j))
-        return np.vstack(terms).T
+        """
+        Design matrix of the basis terms x^i y^j, of shape (n, n_terms),
+        from one Vandermonde matrix per coordinate.
+        """
+        x = np.asarray(x, dtype=float).ravel()
+        y = np.asarray(y, dtype=float).ravel()
+        x_powers = np.vander(x, self.poly_order + 1, increasing=True)
+        y_powers = np.vander(y, self.poly_order + 1, increasing=True)
+        i, j = _exponents(self.poly_order)
+        return x_powers[:, i] * y_powers[:, j]
 
     def _poly_keys(self):
         keys = []
@@ -60,6 +120,10 @@ class PolynomialPointingModel(PointingModelProtocol):
         measured_positions: SkyCoord,
         expected_positions: SkyCoord,
         weights: tuple[list[float], list[float]] | list[float] | None = None,
+        robust: Literal["sigma_clip", "huber"] | None = None,
+        clip_sigma: float = 3.0,
+        huber_threshold: float = 1.345,
+        max_iterations: int = 10,
     ):
         """
         Calculate and set the polynomial coefficients for the pointing model
@@ -68,6 +132,13 @@ class PolynomialPointingModel(PointingModelProtocol):
         weights can be provided as a tuple of (ra_weights, dec_weights)
         or a single list that applies to both.
 
+        With robust, the fit is repeated with iteratively reweighted least
+        squares, down-weighting sources by their combined RA and Dec
+        residual in units of its robust (MAD) scale: 'sigma_clip' drops
+        sources beyond clip_sigma, and 'huber' scales the weight of sources
+        beyond huber_threshold by huber_threshold / residual. The number of
+        sources kept at full weight is reported as n_sources by
+        calculate_statistics.
 
         Raises
         ------
@@ -75,9 +146,16 @@ class PolynomialPointingModel(PointingModelProtocol):
             If no positions are provided for model calculation.
         ValueError
             If the lengths of weights do not match the number of positions.
+        ValueError
+            If robust is not one of None, 'sigma_clip' or 'huber'.
         ValueError
             If model coefficients have not been calculated yet when extracting coefficients.
         """
+        if robust not in (None, "sigma_clip", "huber"):
+            raise ValueError(f"Unknown robust fitting mode {robust!r}.")
+
+        self._coefficient_cache = None
+
         # Calculate offsets
         ra_offsets = measured_positions.ra - expected_positions.ra
         dec_offsets = measured_positions.dec - expected_positions.dec
@@ -112,24 +190,51 @@ class PolynomialPointingModel(PointingModelProtocol):
 
         ras = measured_positions.ra.to_value(u.deg)
         decs = measured_positions.dec.to_value(u.deg)
-        ## RA polynomial fit
-        A_ra = self._poly_terms(ras, decs)
-        y_ra = ra_offsets.to_value(u.deg)
-        w_ra = ra_weights
-
-        ## Apply weights
-        Aw = A_ra * w_ra[:, None]
-        yw = y_ra * w_ra
-        coeffs_ra, *_ = np.linalg.lstsq(Aw, yw, rcond=None)
-
-        ## Dec polynomial fit
-        A_dec = self._poly_terms(ras, decs)
-        y_dec = dec_offsets.to_value(u.deg)
-        w_dec = dec_weights
-
-        Aw = A_dec * w_dec[:, None]
-        yw = y_dec * w_dec
-        coeffs_dec, *_ = np.linalg.lstsq(Aw, yw, rcond=None)
+        A = self._poly_terms(ras, decs)
+
+        ## Fit both axes at once, with one column per axis
+        y = np.stack([ra_offsets.to_value(u.deg), dec_offsets.to_value(u.deg)], axis=1)
+        w = np.stack([ra_weights, dec_weights], axis=1).astype(float)
+        coeffs = _solve_weighted(A, y, w)
+
+        ## Iteratively reweighted least squares
+        robust_weights = np.ones(n)
+        for _ in range(max_iterations if robust is not None else 0):
+            # Residuals about their median, so that a fit still pulled by
+            # the outliers does not reject every source.
+            residuals = (y - A @ coeffs) * w
+            residuals -= np.median(residuals, axis=0)
+            scale = 1.4826 * np.median(np.abs(residuals), axis=0)
+            if not np.any(scale > 0):
+                break
+            z = np.sqrt(
+                np.mean(
+                    np.divide(
+                        residuals,
+                        scale,
+                        out=np.zeros_like(residuals),
+                        where=scale > 0,
+                    )
+                    ** 2,
+                    axis=1,
+                )
+            )
+
+            if robust == "sigma_clip":
+                new_weights = (z <= clip_sigma).astype(float)
+            else:
+                new_weights = np.minimum(1, huber_threshold / np.maximum(z, 1e-12))
+
+            if (
+                np.allclose(new_weights, robust_weights)
+                or np.count_nonzero(new_weights) < A.shape[1]
+            ):
+                break
+            robust_weights = new_weights
+            coeffs = _solve_weighted(A, y, w * np.sqrt(robust_weights)[:, None])
+
+        self._n_inliers = int(np.count_nonzero(robust_weights >= 1))
+        coeffs_ra, coeffs_dec = coeffs[:, 0], coeffs[:, 1]
 
         ra_coeff_dict = {key: coeff for key, coeff in zip(self._poly_keys(), coeffs_ra)}
         dec_coeff_dict = {
@@ -160,6 +265,9 @@ class PolynomialPointingModel(PointingModelProtocol):
         Extract the coefficients from the PolynomialCoefficients dataclasss and
         return them as arrays in the correct order for the model function.
 
+        The arrays are cached until the coefficients are rebuilt or replaced,
+        so they must not be modified.
+
         Raises
         ------
         ValueError
@@ -168,24 +276,57 @@ class PolynomialPointingModel(PointingModelProtocol):
         if self.ra_model_coefficients is None or self.dec_model_coefficients is None:
             raise ValueError("Model coefficients have not been calculated yet.")
 
-        ra_coeff_array = np.zeros(len(self.ra_model_coefficients.coeffs))
-        for i, key in enumerate(self._poly_keys()):
-            ra_coeff_array[i] = self.ra_model_coefficients.coeffs.get(key, 0)
+        cache = self._coefficient_cache
+        if (
+            cache is not None
+            and cache[0] is self.ra_model_coefficients
+            and cache[1] is self.dec_model_coefficients
+        ):
+            return cache[2], cache[3]
+
+        keys = self._poly_keys()
+        ra_coeff_array = np.array(
+            [self.ra_model_coefficients.coeffs.get(key, 0) for key in keys],
+            dtype=float,
+        )
+        dec_coeff_array = np.array(
+            [self.dec_model_coefficients.coeffs.get(key, 0) for key in keys],
+            dtype=float,
+        )
 
-        dec_coeff_array = np.zeros(len(self.dec_model_coefficients.coeffs))
-        for i, key in enumerate(self._poly_keys()):
-            dec_coeff_array[i] = self.dec_model_coefficients.coeffs.get(key, 0)
+        self._coefficient_cache = (
+            self.ra_model_coefficients,
+            self.dec_model_coefficients,
+            ra_coeff_array,
+            dec_coeff_array,
+        )
 
         return ra_coeff_array, dec_coeff_array
 
-    def predict(self, pos: SkyCoord) -> SkyCoord:
+    def predict_arrays(
+        self, ra: np.ndarray, dec: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the underlying positions for arrays of RA and Dec in degrees,
+        evaluating the design matrix once for both axes.
+        """
+        ra = np.asarray(ra, dtype=float)
+        dec = np.asarray(dec, dtype=float)
+        shape = np.broadcast_shapes(ra.shape, dec.shape)
+        ra, dec = np.broadcast_to(ra, shape), np.broadcast_to(dec, shape)
+
         racoeffs, deccoeffs = self.extract_coefficients()
-        ra_offset = self.model_fn(pos.ra, pos.dec, racoeffs)
-        dec_offset = self.model_fn(pos.ra, pos.dec, deccoeffs)
-        ra = pos.ra - ra_offset
-        dec = pos.dec - dec_offset
+        offsets = self._poly_terms(ra, dec) @ np.stack([racoeffs, deccoeffs], axis=1)
+
+        return (
+            np.mod(ra - offsets[:, 0].reshape(shape), 360),
+            dec - offsets[:, 1].reshape(shape),
+        )
+
+    def predict(self, pos: SkyCoord) -> SkyCoord:
+        ra, dec = self.predict_arrays(pos.ra.to_value(u.deg), pos.dec.to_value(u.deg))
 
-        return SkyCoord(ra=ra, dec=dec, frame=pos.frame)
+        return SkyCoord(ra=ra * u.deg, dec=dec * u.deg, frame=pos.frame)
 
     def calculate_statistics(self, positions: SkyCoord):
         new_positions = self.predict(positions)
@@ -200,4 +341,7 @@ class PolynomialPointingModel(PointingModelProtocol):
             mean_dec_offset=mean_dec,
             stddev_ra_offset=std_ra,
             stddev_dec_offset=std_dec,
+            n_sources=self._n_inliers
+            if self._n_inliers is not None
+            else len(positions),
         )
@@ -0,0 +1,157 @@
+"""
+Time-dependent pointing model.
+"""
+
+from typing import Literal
+
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from numpy.polynomial import legendre
+
+from mapcat.pointing.base import PointingModelProtocol
+from mapcat.pointing.poly import _solve_weighted
+
+
+class TimeDependentPointingModel(PointingModelProtocol):
+    """
+    Pointing offsets that vary smoothly with time, fitted across many maps
+    at once. The RA and Dec offsets (measured minus true position) are
+    Legendre series in ctime normalized to [-1, 1] over the fitted time
+    range; outside of it, the offsets at the nearest end are used.
+
+    One model can be shared by many maps: `at` gives a copy fixed to the
+    ctime of a map, which `predict` then uses.
+    """
+
+    model_type: Literal["time_dependent"] = "time_dependent"
+
+    poly_order: int
+    ctime_start: float | None = None
+    ctime_stop: float | None = None
+    ra_coefficients: list[float] | None = None
+    dec_coefficients: list[float] | None = None
+    ctime: float | None = None
+
+    def _normalize(self, ctime: np.ndarray) -> np.ndarray:
+        ctime = np.clip(
+            np.asarray(ctime, dtype=float), self.ctime_start, self.ctime_stop
+        )
+        span = self.ctime_stop - self.ctime_start
+        if span == 0:
+            return np.zeros_like(ctime)
+        return 2 * (ctime - self.ctime_start) / span - 1
+
+    def build_model(
+        self,
+        ctimes: np.ndarray,
+        ra_offsets: u.Quantity,
+        dec_offsets: u.Quantity,
+        weights: tuple[list[float], list[float]] | list[float] | None = None,
+    ):
+        """
+        Fit the model to pointing offsets measured at many times, e.g. the
+        mean offsets of the sources in each of many depth-1 maps.
+
+        weights can be provided as a tuple of (ra_weights, dec_weights)
+        or a single list that applies to both, as the inverse uncertainties
+        of the offsets.
+
+        Raises
+        ------
+        ValueError
+            If no offsets are provided, or the lengths of the inputs differ.
+        """
+        ctimes = np.asarray(ctimes, dtype=float).ravel()
+        n = len(ctimes)
+        if n == 0:
+            raise ValueError("No offsets provided for model calculation.")
+
+        y = np.stack(
+            [
+                np.ravel(ra_offsets.to_value(u.deg)),
+                np.ravel(dec_offsets.to_value(u.deg)),
+            ],
+            axis=1,
+        )
+
+        if isinstance(weights, tuple):
+            ra_weights, dec_weights = weights
+        else:
+            ra_weights = dec_weights = weights
+        if ra_weights is None:
+            ra_weights = dec_weights if dec_weights is not None else np.ones(n)
+        if dec_weights is None:
+            dec_weights = ra_weights
+        w = np.stack([ra_weights, dec_weights], axis=1).astype(float)
+
+        if y.shape != (n, 2) or w.shape != (n, 2):
+            raise ValueError("ctimes, offsets and weights must have the same length.")
+
+        self.ctime_start = float(ctimes.min())
+        self.ctime_stop = float(ctimes.max())
+
+        design = legendre.legvander(self._normalize(ctimes), self.poly_order)
+        coeffs = _solve_weighted(design, y, w)
+
+        self.ra_coefficients = coeffs[:, 0].tolist()
+        self.dec_coefficients = coeffs[:, 1].tolist()
+
+    def offsets(self, ctime: float | np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The RA and Dec offsets, in degrees, at one or many times.
+
+        Raises
+        ------
+        ValueError
+            If the model has not been fitted yet.
+        """
+        if self.ra_coefficients is None or self.dec_coefficients is None:
+            raise ValueError("Model coefficients have not been calculated yet.")
+
+        t = self._normalize(ctime)
+        coeffs = np.stack([self.ra_coefficients, self.dec_coefficients], axis=1)
+        offsets = legendre.legvander(t.ravel(), len(coeffs) - 1) @ coeffs
+
+        return offsets[:, 0].reshape(t.shape), offsets[:, 1].reshape(t.shape)
+
+    def at(self, ctime: float) -> "TimeDependentPointingModel":
+        """
+        A copy of the model that predicts positions at ctime.
+        """
+        return self.model_copy(update={"ctime": ctime})
+
+    def predict_arrays(
+        self,
+        ra: np.ndarray,
+        dec: np.ndarray,
+        ctime: float | np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the underlying positions for arrays of RA and Dec in degrees,
+        measured at ctime (one time, or one per position). By default the
+        ctime of the model is used.
+
+        Raises
+        ------
+        ValueError
+            If no ctime is given and the model has none.
+        """
+        ctime = self.ctime if ctime is None else ctime
+        if ctime is None:
+            raise ValueError("No ctime to evaluate the pointing model at.")
+
+        ra_offset, dec_offset = self.offsets(ctime)
+        ra = np.mod(np.asarray(ra, dtype=float) - ra_offset, 360)
+        dec = np.asarray(dec, dtype=float) - dec_offset
+
+        return ra, dec
+
+    def predict(
+        self, pos: SkyCoord, ctime: float | np.ndarray | None = None
+    ) -> SkyCoord:
+        ra, dec = self.predict_arrays(
+            pos.ra.to_value(u.deg), pos.dec.to_value(u.deg), ctime=ctime
+        )
+
+        return SkyCoord(ra=ra * u.deg, dec=dec * u.deg, frame=pos.frame)
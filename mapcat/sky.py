@@ -0,0 +1,130 @@
+"""
+The grid of sky coverage tiles and the nested sky cells within them.
+
+This module only depends on numpy, so that the database models can use it
+without importing the toolkit.
+"""
+
+import numpy as np
+
+TILE_SIZE = 10
+"Size of the sky coverage tiles, in degrees."
+
+MAX_CELL_ORDER = 6
+"Order at which sky cell ranges are stored; cells are TILE_SIZE / 2**order wide."
+
+
+def _grid_shape(resolution: float) -> tuple[int, int]:
+    """
+    Shape of a full-sky grid of square cells, as (n_dec, n_ra).
+    """
+    return round(180 / resolution), round(360 / resolution)
+
+
+def sky_to_cell(
+    ra: float | np.ndarray, dec: float | np.ndarray, resolution: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert positions in degrees to indices on a full-sky grid of square
+    cells. Cell (0, 0) starts at RA 0 and Dec -90, so with a resolution
+    of 10 degrees these are the sky coverage tile indices.
+
+    Parameters
+    ----------
+    ra : float | np.ndarray
+        The ra in degrees to convert. Wrapped into 0 < ra < 360.
+    dec : float | np.ndarray
+        The dec in degrees to convert.
+    resolution : float
+        The size of the cells, in degrees.
+
+    Returns
+    -------
+    y_idx, x_idx : tuple[np.ndarray, np.ndarray]
+        The dec and ra indices of the cells containing the positions.
+    """
+    ny, nx = _grid_shape(resolution)
+    x_idx = np.floor(np.mod(ra, 360) / resolution).astype(int) % nx
+    y_idx = np.clip(
+        np.floor((np.asarray(dec) + 90) / resolution).astype(int), 0, ny - 1
+    )
+    return y_idx, x_idx
+
+
+def _interleave_bits(x_idx: np.ndarray, y_idx: np.ndarray, order: int) -> np.ndarray:
+    """
+    Z-order (Morton) index of cells within a tile, from their ra and dec
+    indices within the tile.
+    """
+    x_idx = np.asarray(x_idx, dtype=np.int64)
+    y_idx = np.asarray(y_idx, dtype=np.int64)
+    cell = np.zeros(np.broadcast(x_idx, y_idx).shape, dtype=np.int64)
+    for bit in range(order):
+        cell |= ((x_idx >> bit) & 1) << (2 * bit)
+        cell |= ((y_idx >> bit) & 1) << (2 * bit + 1)
+    return cell
+
+
+def _nested_cell(y_idx: np.ndarray, x_idx: np.ndarray, order: int) -> np.ndarray:
+    """
+    Nested cell ids from the dec and ra indices of cells on the full-sky
+    grid at the given order.
+    """
+    side = 2**order
+    base = (np.asarray(y_idx) // side) * (360 // TILE_SIZE) + np.asarray(x_idx) // side
+    return base.astype(np.int64) * 4**order + _interleave_bits(
+        np.asarray(x_idx) % side, np.asarray(y_idx) % side, order
+    )
+
+
+def sky_to_nested_cell(
+    ra: float | np.ndarray, dec: float | np.ndarray, order: int = MAX_CELL_ORDER
+) -> np.ndarray:
+    """
+    Convert positions in degrees to hierarchical sky cell ids.
+
+    The sky coverage tiles are the base cells (order 0, id `y * 36 + x`) of
+    a quadtree. Each cell of order k splits into four cells of order k + 1,
+    with id `4 * parent + child`, so a cell of order k contains exactly the
+    cells `[id * 4**(K - k), (id + 1) * 4**(K - k))` of any order K >= k.
+
+    Parameters
+    ----------
+    ra : float | np.ndarray
+        The ra in degrees to convert.
+    dec : float | np.ndarray
+        The dec in degrees to convert.
+    order : int, optional
+        The order of the cells, by default MAX_CELL_ORDER.
+
+    Returns
+    -------
+    cells : np.ndarray
+        The nested ids of the cells containing the positions.
+    """
+    y_idx, x_idx = sky_to_cell(ra, dec, TILE_SIZE / 2**order)
+    return _nested_cell(y_idx, x_idx, order)
+
+
+def cells_to_ranges(cells: np.ndarray) -> np.ndarray:
+    """
+    Compress a set of cell ids into sorted, non-overlapping half-open ranges.
+
+    Parameters
+    ----------
+    cells : np.ndarray
+        The cell ids, in any order and possibly repeated.
+
+    Returns
+    -------
+    ranges : np.ndarray
+        Array of shape (n_ranges, 2) of [start, end) cell ids.
+    """
+    cells = np.unique(np.asarray(cells, dtype=np.int64))
+    if len(cells) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    breaks = np.flatnonzero(np.diff(cells) != 1)
+    starts = cells[np.r_[0, breaks + 1]]
+    ends = cells[np.r_[breaks, len(cells) - 1]] + 1
+    return np.stack([starts, ends], axis=1)
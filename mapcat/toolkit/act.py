@@ -3,13 +3,27 @@ Create objects from an ACT depth 1 map file.
 """
 
 import argparse as ap
+import logging
+from collections import deque
+from collections.abc import Container, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 
 import h5py
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
 
 from mapcat.database import DepthOneMapTable, TODDepthOneTable
 
+READ_CHUNK_SIZE = 8
+"Number of maps read by a worker process per task when ingesting with jobs."
+
+READ_ERRORS = (OSError, KeyError, IndexError, TypeError, ValueError)
+"Errors from reading or parsing the files of one map, which skip that map."
+
+logger = logging.getLogger(__name__)
+
 
 def extract_string(input: bytes) -> str:
     return str(input).replace("b'", "").replace("'", "")
@@ -62,10 +76,44 @@ def parse_filenames(base: str, relative_to: Path) -> dict[str, str]:
     return {x: str(y.relative_to(relative_to)) for x, y in paths.items() if y.exists()}
 
 
-def create_objects(base: str, relative_to: Path, telescope: str) -> DepthOneMapTable:
+def read_metadata(base: str, relative_to: Path) -> tuple[dict[str, str], dict]:
+    """
+    Do all the filesystem and HDF5 access needed to ingest a map: find
+    its files and parse its info file. Returns only plain data, so it can
+    run in worker processes.
+    """
     filenames = parse_filenames(base=base, relative_to=relative_to)
     file_info = parse_info_file(path=relative_to / filenames["info"])
 
+    return filenames, file_info
+
+
+def try_read_metadata(
+    base: str, relative_to: Path
+) -> tuple[str, tuple[dict[str, str], dict] | None, str | None]:
+    """
+    read_metadata, returning (base, metadata, None) or, if the files of the
+    map cannot be read or parsed, (base, None, error message).
+    """
+    try:
+        return base, read_metadata(base=base, relative_to=relative_to), None
+    except READ_ERRORS as e:
+        return base, None, f"{type(e).__name__}: {e}"
+
+
+def read_metadata_chunk(
+    bases: list[str], relative_to: Path
+) -> list[tuple[str, tuple[dict[str, str], dict] | None, str | None]]:
+    """
+    try_read_metadata for several maps, so that worker processes receive
+    paths in chunks rather than one task per map.
+    """
+    return [try_read_metadata(base=base, relative_to=relative_to) for base in bases]
+
+
+def objects_from_metadata(
+    filenames: dict[str, str], file_info: dict, telescope: str
+) -> DepthOneMapTable:
     tods = [
         TODDepthOneTable(
             obs_id=obs_id,
@@ -94,17 +142,101 @@ def create_objects(base: str, relative_to: Path, telescope: str) -> DepthOneMapT
     )
 
 
-def glob(input_glob: str, relative_to: Path, telescope: str) -> list[DepthOneMapTable]:
-    maps = []
+def create_objects(base: str, relative_to: Path, telescope: str) -> DepthOneMapTable:
+    filenames, file_info = read_metadata(base=base, relative_to=relative_to)
+    return objects_from_metadata(filenames, file_info, telescope)
+
+
+def map_name_from_file(map_file: Path, relative_to: Path) -> str:
+    """
+    The map name that a _map.fits file is stored under, without opening it.
+    """
+    return str(map_file.relative_to(relative_to)).replace("_map.fits", "")
+
+
+def iter_glob(
+    input_glob: str,
+    relative_to: Path,
+    telescope: str,
+    skip: Container[str] = (),
+    jobs: int = 1,
+    errors: list[tuple[str, str]] | None = None,
+) -> Iterator[DepthOneMapTable]:
+    """
+    Lazily create DepthOneMapTable objects for the map files matching
+    input_glob.
+
+    Parameters
+    ----------
+    input_glob : str
+        Glob pattern below relative_to that lists the _map.fits files.
+    relative_to : Path
+        Base path that maps are relative to.
+    telescope : str
+        Telescope label to use (e.g. lat, act).
+    skip : Container[str], optional
+        Map names to skip; their info files are never opened.
+    jobs : int, optional
+        Number of worker processes that read the files and info files.
+        With 1 (the default), files are read one at a time in the current
+        process. Otherwise, at most 2 * jobs chunks of READ_CHUNK_SIZE maps
+        are read ahead of the maps yielded.
+
+    errors : list[tuple[str, str]] | None, optional
+        Maps whose files cannot be read or parsed are logged and skipped;
+        if given, (path, error message) of each is appended to this list.
+
+    Yields
+    ------
+    depth_one_map : DepthOneMapTable
+        The map and its TODs, not yet added to any session, in glob order.
+    """
 
-    for map_file in relative_to.glob(input_glob):
-        base = str(map_file).replace("_map.fits", "")
-        depth_one_map = create_objects(
-            base=base, relative_to=relative_to, telescope=telescope
+    def objects(results):
+        for base, metadata, error in results:
+            if error is None:
+                try:
+                    yield objects_from_metadata(*metadata, telescope)
+                    continue
+                except READ_ERRORS as e:
+                    error = f"{type(e).__name__}: {e}"
+
+            logger.warning("Skipping map %s: %s", base, error)
+            if errors is not None:
+                errors.append((base, error))
+
+    bases = (
+        str(map_file).replace("_map.fits", "")
+        for map_file in relative_to.glob(input_glob)
+        if map_name_from_file(map_file, relative_to) not in skip
+    )
+
+    if jobs <= 1:
+        yield from objects(
+            try_read_metadata(base=base, relative_to=relative_to) for base in bases
         )
-        maps.append(depth_one_map)
+        return
+
+    # Keep a bounded window of chunks in flight, refilled as maps are
+    # consumed, so that memory does not grow with the size of the glob.
+    chunks = iter(lambda: list(islice(bases, READ_CHUNK_SIZE)), [])
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        pending = deque(
+            executor.submit(read_metadata_chunk, chunk, relative_to)
+            for chunk in islice(chunks, 2 * jobs)
+        )
+        while pending:
+            metadata = pending.popleft().result()
+            for chunk in islice(chunks, 1):
+                pending.append(executor.submit(read_metadata_chunk, chunk, relative_to))
+            yield from objects(metadata)
+    finally:
+        executor.shutdown(cancel_futures=True)
 
-    return maps
+
+def glob(input_glob: str, relative_to: Path, telescope: str) -> list[DepthOneMapTable]:
+    return list(iter_glob(input_glob, relative_to, telescope))
 
 
 HELP_TEXT = """Use this utility to ingest depth-1 maps created by the ACT mapmaker.
@@ -133,6 +265,42 @@ You should pass '/my/path/to/maps' as 'relative-to', and
 """
 
 
+def deduplicate_tods(session: Session, maps: list[DepthOneMapTable]):
+    """
+    Replace the TODs of maps, in place, by the TODs already in the database
+    with the same obs_id, tube_slot and frequency, using a single lookup.
+    TODs shared by several of the maps are also merged into one object.
+
+    Parameters
+    ----------
+    session : Session
+        The session the maps will be added to.
+    maps : list[DepthOneMapTable]
+        Maps that have not been added to the session yet.
+    """
+    obs_ids = {tod.obs_id for depth_one_map in maps for tod in depth_one_map.tods}
+    if not obs_ids:
+        return
+
+    known = {
+        (tod.obs_id, tod.tube_slot, tod.frequency): tod
+        for tod in session.execute(
+            select(TODDepthOneTable).where(TODDepthOneTable.obs_id.in_(obs_ids))
+        ).scalars()
+    }
+
+    for depth_one_map in maps:
+        keys = [
+            (tod.obs_id, tod.tube_slot, tod.frequency) for tod in depth_one_map.tods
+        ]
+        depth_one_map.tods = list(
+            {
+                key: known.setdefault(key, tod)
+                for key, tod in zip(keys, depth_one_map.tods)
+            }.values()
+        )
+
+
 def core(session: sessionmaker, args: ap.Namespace):
     """
     Driver function for act.py Takes a session and a arg parser
@@ -140,19 +308,59 @@ def core(session: sessionmaker, args: ap.Namespace):
     matching the glob patter in the parser and adds them to the
     database in session.
 
+    Files are read by args.jobs worker processes, while all database
+    writes happen here. Maps are committed every args.batch_size maps,
+    and maps whose name is already in the database are skipped without
+    reading their info files, so an interrupted ingest can be resumed by
+    running it again. TODs that are already in the database are linked
+    to the new maps rather than inserted again. Maps whose files cannot be
+    read or parsed are skipped, and listed at the end.
+
     Parameters
     ----------
     session : sessionmaker
         A SQLAlchemy sessionmaker to use for database access.
     args : argparse.Namespace
        Parsed args with the glob patterns to match.
-    """
 
+    Returns
+    -------
+    errors : list[tuple[str, str]]
+        The path and error message of each map that was skipped.
+    """
     with session() as cur_session:
-        maps = glob(args.glob, args.relative_to, args.telescope)
-        cur_session.add_all(maps)
+        existing = set(cur_session.execute(select(DepthOneMapTable.map_name)).scalars())
+
+        errors = []
+        maps = iter_glob(
+            args.glob,
+            args.relative_to,
+            args.telescope,
+            skip=existing,
+            jobs=args.jobs,
+            errors=errors,
+        )
+
+        batch = []
+        for depth_one_map in maps:
+            batch.append(depth_one_map)
+            if len(batch) == args.batch_size:
+                deduplicate_tods(cur_session, batch)
+                cur_session.add_all(batch)
+                cur_session.commit()
+                batch = []
+
+        deduplicate_tods(cur_session, batch)
+        cur_session.add_all(batch)
         cur_session.commit()
 
+    if errors:
+        print(f"Skipped {len(errors)} maps that could not be read:")
+        for base, error in errors:
+            print(f"  {base}: {error}")
+
+    return errors
+
 
 def main():
     from mapcat.helper import settings
@@ -183,6 +391,22 @@ def main():
         help="Telescope label to use (e.g. lat, act)",
     )
 
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=100,
+        help="Number of maps to ingest between database commits.",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to read the map and info files.",
+    )
+
     args = parser.parse_args()
 
     core(session=settings.session, args=args)
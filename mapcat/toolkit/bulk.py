@@ -0,0 +1,317 @@
+"""
+Bulk loading of depth-1 maps, their TODs and sky coverage.
+
+Rows are given as plain dictionaries keyed by column name rather than ORM
+objects. On PostgreSQL they are written with COPY, after reserving primary
+keys from the table sequences (or moving the sequences past the keys given)
+and filling in the Python-side column defaults that COPY does not apply. On
+other databases (i.e. SQLite) they are written with a single executemany
+INSERT ... RETURNING per table.
+"""
+
+import io
+import json
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.orm import Session
+from sqlmodel import SQLModel
+
+from mapcat.database import DepthOneMapTable, SkyCoverageTable, TODDepthOneTable
+from mapcat.database.links import TODToMapTable
+
+LOOKUP_CHUNK_SIZE = 900
+"Maximum number of obs_ids bound into a single TOD lookup query."
+
+
+def _serial_primary_key(table: type[SQLModel]):
+    """
+    The primary key column of table if it is a single integer key that
+    the database generates, otherwise None.
+    """
+    (primary_key, *others) = table.__table__.primary_key.columns
+    if others or primary_key.autoincrement not in (True, "auto"):
+        return None
+    if primary_key.type.python_type is not int:
+        return None
+    return primary_key
+
+
+def _copy_text(value) -> str:
+    """
+    Encode a value as a field of PostgreSQL's COPY text format.
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, bytes):
+        return "\\\\x" + value.hex()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_rows(session: Session, table: type[SQLModel], columns: list[str], rows):
+    """
+    Write rows (sequences of values in the order of columns) to table with
+    COPY FROM STDIN, on the connection of session.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_text(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    statement = f"COPY {table.__tablename__} ({', '.join(columns)}) FROM STDIN"
+    cursor = session.connection().connection.dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            # psycopg2
+            cursor.copy_expert(statement, buffer)
+        else:  # pragma: no cover
+            # psycopg 3
+            with cursor.copy(statement) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+class _CopyDefaultContext:
+    """
+    Stand-in for the execution context passed to context-sensitive column
+    defaults, for rows written with COPY.
+    """
+
+    def __init__(self, row: dict):
+        self.row = row
+
+    def get_current_parameters(self, isolate_multiinsert_groups: bool = True):
+        return self.row
+
+
+def _fill_defaults(table: type[SQLModel], columns: list[str], rows: list[dict]):
+    """
+    Add the Python-side defaults of the columns that no row gives, as an
+    executemany INSERT would, since COPY does not apply them. Returns the
+    extended columns and rows.
+
+    Raises
+    ------
+    ValueError
+        If such a column has a SQL expression default, which COPY cannot
+        evaluate.
+    """
+    for column in table.__table__.columns:
+        default = column.default
+        if column.name in columns or default is None or default.is_sequence:
+            continue
+        if default.is_clause_element:
+            raise ValueError(
+                f"Cannot COPY {table.__tablename__} without {column.name}, "
+                "which has a SQL expression default"
+            )
+
+        if default.is_scalar:
+            rows = [{**row, column.name: default.arg} for row in rows]
+        else:
+            rows = [
+                {**row, column.name: default.arg(_CopyDefaultContext(row))}
+                for row in rows
+            ]
+        columns = [*columns, column.name]
+
+    return columns, rows
+
+
+def insert_rows(session: Session, table: type[SQLModel], rows: list[dict]) -> list[int]:
+    """
+    Insert rows into table with as few round trips as the database allows,
+    without building ORM objects. The rows are not committed.
+
+    Parameters
+    ----------
+    session : Session
+        Session whose transaction the rows are written in.
+    table : type[SQLModel]
+        The table class, e.g. DepthOneMapTable.
+    rows : list[dict]
+        Column values of each row. Columns missing from a row are NULL.
+
+    Returns
+    -------
+    primary_keys : list[int]
+        The primary keys, in the order of rows, for tables with a single
+        generated integer key (e.g. map_id); otherwise empty.
+
+    Raises
+    ------
+    ValueError
+        If a row has a key that is not a column of table.
+    """
+    if not rows:
+        return []
+
+    primary_key = _serial_primary_key(table)
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+
+    unknown = set(columns) - set(table.__table__.columns.keys())
+    if unknown:
+        raise ValueError(f"Unknown columns for {table.__tablename__}: {unknown}")
+
+    if session.get_bind().dialect.name != "postgresql":
+        stmt = insert(table)
+        if primary_key is None:
+            session.execute(stmt, [{c: row.get(c) for c in columns} for row in rows])
+            return []
+        stmt = stmt.returning(primary_key, sort_by_parameter_order=True)
+        result = session.execute(
+            stmt, [{c: row.get(c) for c in columns} for row in rows]
+        )
+        return list(result.scalars())
+
+    columns, rows = _fill_defaults(table, columns, rows)
+
+    primary_keys = []
+    if primary_key is not None and primary_key.name in columns:
+        primary_keys = [row[primary_key.name] for row in rows]
+        # Move the sequence past the explicit keys, so that later inserts
+        # that take keys from it do not collide with them.
+        session.execute(
+            text(
+                "SELECT setval(s, GREATEST(:key, "
+                "COALESCE(pg_sequence_last_value(s), 0))) "
+                "FROM (SELECT pg_get_serial_sequence(:table, :column)::regclass "
+                "AS s) AS sequence"
+            ),
+            {
+                "table": table.__tablename__,
+                "column": primary_key.name,
+                "key": max(primary_keys),
+            },
+        )
+    elif primary_key is not None:
+        primary_keys = list(
+            session.execute(
+                text(
+                    "SELECT nextval(pg_get_serial_sequence(:table, :column)) "
+                    "FROM generate_series(1, :n)"
+                ),
+                {
+                    "table": table.__tablename__,
+                    "column": primary_key.name,
+                    "n": len(rows),
+                },
+            ).scalars()
+        )
+        rows = [{**row, primary_key.name: key} for row, key in zip(rows, primary_keys)]
+        columns.append(primary_key.name)
+
+    _copy_rows(session, table, columns, ([row.get(c) for c in columns] for row in rows))
+
+    return primary_keys
+
+
+def _resolve_tods(session: Session, tods: list[list[dict]]) -> list[list[int]]:
+    """
+    Find or insert the TODs of every map, sharing TODs with the same
+    obs_id, tube_slot and frequency, and return their tod_ids per map.
+    """
+    key_columns = [
+        TODDepthOneTable.obs_id,
+        TODDepthOneTable.tube_slot,
+        TODDepthOneTable.frequency,
+    ]
+
+    def key(tod: dict) -> tuple:
+        return (tod["obs_id"], tod.get("tube_slot"), tod.get("frequency"))
+
+    tod_ids = {}
+    obs_ids = list({tod["obs_id"] for map_tods in tods for tod in map_tods})
+    for start in range(0, len(obs_ids), LOOKUP_CHUNK_SIZE):
+        chunk = obs_ids[start : start + LOOKUP_CHUNK_SIZE]
+        for tod_id, *tod_key in session.execute(
+            select(TODDepthOneTable.tod_id, *key_columns).where(
+                TODDepthOneTable.obs_id.in_(chunk)
+            )
+        ):
+            tod_ids[tuple(tod_key)] = tod_id
+
+    new_tods = {}
+    for map_tods in tods:
+        for tod in map_tods:
+            if key(tod) not in tod_ids:
+                new_tods.setdefault(key(tod), tod)
+
+    tod_ids.update(
+        zip(new_tods, insert_rows(session, TODDepthOneTable, list(new_tods.values())))
+    )
+
+    return [
+        list(dict.fromkeys(tod_ids[key(tod)] for tod in map_tods)) for map_tods in tods
+    ]
+
+
+def load_depth_one_maps(
+    session: Session,
+    maps: list[dict],
+    tods: list[list[dict]] | None = None,
+    sky_coverage: list[list[dict]] | None = None,
+) -> list[int]:
+    """
+    Bulk load depth-1 maps, along with their TODs and sky coverage tiles,
+    in the current transaction of session. The caller commits.
+
+    TODs already in the database (matched on obs_id, tube_slot and
+    frequency) are linked to rather than inserted again.
+
+    Parameters
+    ----------
+    session : Session
+        The session to write with.
+    maps : list[dict]
+        Column values of each DepthOneMapTable row.
+    tods : list[list[dict]] | None, optional
+        For each map, the column values of the TODDepthOneTable rows of
+        its TODs.
+    sky_coverage : list[list[dict]] | None, optional
+        For each map, the column values (x, y and optionally footprint) of
+        its SkyCoverageTable rows.
+
+    Returns
+    -------
+    map_ids : list[int]
+        The map_id of each map, in order.
+    """
+    map_ids = insert_rows(session, DepthOneMapTable, maps)
+
+    if tods is not None:
+        tod_ids = _resolve_tods(session, tods)
+        insert_rows(
+            session,
+            TODToMapTable,
+            [
+                {"tod_id": tod_id, "map_id": map_id}
+                for map_id, map_tod_ids in zip(map_ids, tod_ids)
+                for tod_id in map_tod_ids
+            ],
+        )
+
+    if sky_coverage is not None:
+        insert_rows(
+            session,
+            SkyCoverageTable,
+            [
+                {**tile, "map_id": map_id}
+                for map_id, tiles in zip(map_ids, sky_coverage)
+                for tile in tiles
+            ],
+        )
+
+    return map_ids
@@ -2,6 +2,10 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from mapcat.database import DepthOneMapTable, TODDepthOneTable
+from mapcat.database.links import TODToMapTable
+
+OBS_ID_CHUNK_SIZE = 900
+"Maximum number of obs_ids bound into a single query, below SQLite's historic limit of 999."
 
 
 def maps_containing_obs(obs_id: str, session: Session) -> list[DepthOneMapTable]:
@@ -37,6 +41,52 @@ def maps_containing_obs(obs_id: str, session: Session) -> list[DepthOneMapTable]
     return tod[0].maps
 
 
+def maps_containing_obs_ids(
+    obs_ids: list[str], session: Session
+) -> dict[str, list[DepthOneMapTable]]:
+    """
+    Find the maps that each of many obs_ids is in, with one joined query
+    per OBS_ID_CHUNK_SIZE obs_ids.
+
+    Parameters
+    ----------
+    obs_ids : list[str]
+        Obs ids to get the maps for
+    session : Session
+        Session to use
+
+    Returns
+    -------
+    depth_one_maps : dict[str, list[DepthOneMapTable]]
+        For every obs_id that has at least one TOD, the depth one maps of
+        its TODs ordered by map_id (possibly empty).
+    """
+    unique_obs_ids = list(dict.fromkeys(obs_ids))
+    map_dict = {}
+
+    for start in range(0, len(unique_obs_ids), OBS_ID_CHUNK_SIZE):
+        chunk = unique_obs_ids[start : start + OBS_ID_CHUNK_SIZE]
+        stmt = (
+            select(TODDepthOneTable.obs_id, DepthOneMapTable)
+            .select_from(TODDepthOneTable)
+            .outerjoin(TODToMapTable, TODToMapTable.tod_id == TODDepthOneTable.tod_id)
+            .outerjoin(
+                DepthOneMapTable, DepthOneMapTable.map_id == TODToMapTable.map_id
+            )
+            .where(TODDepthOneTable.obs_id.in_(chunk))
+            .order_by(TODDepthOneTable.obs_id, DepthOneMapTable.map_id)
+        )
+
+        for obs_id, depth_one_map in session.execute(stmt):
+            maps = map_dict.setdefault(obs_id, [])
+            if depth_one_map is not None and (
+                not maps or maps[-1].map_id != depth_one_map.map_id
+            ):
+                maps.append(depth_one_map)
+
+    return map_dict
+
+
 def build_obslists(
     obs_ids: list[str], session: Session
 ) -> tuple[list[DepthOneMapTable], list[str]]:
@@ -54,16 +104,24 @@ def build_obslists(
     -------
     obs_mapping : tuple[list[DepthOneMapTable], list[str]]
         Tuple containing a list of depth one maps containing obs_id from obs_ids and a list of all obs_id without corresponding maps.
+
+    Raises
+    ------
+    ValueError
+        If no tods with one of the obs_ids are found
     """
 
     map_dict = {}
     no_map_list = []
     with session.begin():
-        for obs_id in obs_ids:
-            map_list = maps_containing_obs(obs_id=obs_id, session=session)
-            if len(map_list) == 0:
-                no_map_list.append(obs_id)
-            else:
-                map_dict[obs_id] = map_list
+        maps = maps_containing_obs_ids(obs_ids=obs_ids, session=session)
+
+    for obs_id in obs_ids:
+        if obs_id not in maps:
+            raise ValueError(f"No TODs with obs ID {obs_id} found.")
+        if len(maps[obs_id]) == 0:
+            no_map_list.append(obs_id)
+        else:
+            map_dict[obs_id] = maps[obs_id]
 
     return (map_dict, no_map_list)
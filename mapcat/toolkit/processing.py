@@ -0,0 +1,226 @@
+"""
+Work queue for time-domain processing of depth-1 maps, backed by the
+TimeDomainProcessingTable.
+
+Workers claim maps with `claim_next_maps`, which marks them as 'running'
+under the worker's ID, and report back with `complete_maps` or `fail_maps`.
+Maps with no processing status, maps that failed, and maps whose claim is
+older than the stale timeout can be claimed. Maps marked as 'completed' or
+'permafail' are never handed out again. A map can have several status
+entries, of which only the latest counts.
+
+On PostgreSQL, candidate rows are locked with SELECT ... FOR UPDATE SKIP
+LOCKED, so concurrent workers claim disjoint sets of maps without waiting
+on each other. On SQLite, the claim takes the database write lock up front
+(BEGIN IMMEDIATE), so claims are serialized instead.
+"""
+
+import time
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from mapcat.database import DepthOneMapTable, TimeDomainProcessingTable
+
+STALE_CLAIM_TIMEOUT = 6 * 3600.0
+"Seconds after which a 'running' claim is assumed to be abandoned."
+
+
+def _begin_claim(cur_session: Session) -> bool:
+    """
+    Start the claim transaction, returning whether row locks are available.
+    """
+    if cur_session.get_bind().dialect.name == "postgresql":
+        return True
+
+    # SQLite has no row locks: take the write lock before reading so that no
+    # other claim can interleave.
+    cur_session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+    return False
+
+
+def claim_next_maps(
+    session: sessionmaker,
+    n: int,
+    worker_id: str,
+    stale_after: float = STALE_CLAIM_TIMEOUT,
+) -> list[DepthOneMapTable]:
+    """
+    Atomically claim up to n depth-1 maps for processing by worker_id.
+
+    Maps without any processing status are claimed first, in map_id order,
+    followed by maps that failed or whose claim has gone stale. The claims
+    are committed before returning.
+
+    Parameters
+    ----------
+    session : sessionmaker
+        A SQLAlchemy sessionmaker to use for database access.
+    n : int
+        Maximum number of maps to claim.
+    worker_id : str
+        Identifier of the claiming worker, e.g. hostname and PID.
+    stale_after : float, optional
+        Seconds after which another worker's 'running' claim can be taken
+        over, by default STALE_CLAIM_TIMEOUT.
+
+    Returns
+    -------
+    depth_one_maps : list[DepthOneMapTable]
+        The claimed maps, possibly fewer than n.
+    """
+    now = time.time()
+
+    with session() as cur_session:
+        row_locks = _begin_claim(cur_session)
+
+        new_maps = (
+            select(DepthOneMapTable)
+            .where(~DepthOneMapTable.processing_status.any())
+            .order_by(DepthOneMapTable.map_id)
+            .limit(n)
+        )
+        if row_locks:
+            new_maps = new_maps.with_for_update(skip_locked=True)
+
+        claimed = list(cur_session.execute(new_maps).scalars())
+
+        if row_locks and claimed:
+            # A claim committed between our scan and taking the lock is not
+            # re-checked by the lock itself, so check again.
+            taken = set(
+                cur_session.execute(
+                    select(TimeDomainProcessingTable.map_id).where(
+                        TimeDomainProcessingTable.map_id.in_(
+                            [m.map_id for m in claimed]
+                        )
+                    )
+                ).scalars()
+            )
+            claimed = [m for m in claimed if m.map_id not in taken]
+
+        cur_session.add_all(
+            TimeDomainProcessingTable(
+                map_id=m.map_id,
+                processing_start=now,
+                processing_status="running",
+                worker_id=worker_id,
+            )
+            for m in claimed
+        )
+
+        if len(claimed) < n:
+            # Only the latest status of each map decides whether it is retried.
+            latest = select(
+                func.max(TimeDomainProcessingTable.processing_status_id)
+            ).group_by(TimeDomainProcessingTable.map_id)
+            retry = (
+                select(TimeDomainProcessingTable)
+                .where(
+                    TimeDomainProcessingTable.processing_status_id.in_(latest),
+                    or_(
+                        TimeDomainProcessingTable.processing_status == "failed",
+                        and_(
+                            TimeDomainProcessingTable.processing_status == "running",
+                            TimeDomainProcessingTable.processing_start
+                            < now - stale_after,
+                        ),
+                    ),
+                )
+                .order_by(TimeDomainProcessingTable.map_id)
+                .limit(n - len(claimed))
+            )
+            if row_locks:
+                retry = retry.with_for_update(skip_locked=True)
+
+            retried = []
+            for entry in cur_session.execute(retry).scalars():
+                entry.processing_status = "running"
+                entry.processing_start = now
+                entry.processing_end = None
+                entry.worker_id = worker_id
+                retried.append(entry.map_id)
+
+            if retried:
+                claimed += cur_session.execute(
+                    select(DepthOneMapTable)
+                    .where(DepthOneMapTable.map_id.in_(retried))
+                    .order_by(DepthOneMapTable.map_id)
+                ).scalars()
+
+        cur_session.commit()
+
+    return claimed
+
+
+def _finish_maps(
+    session: sessionmaker, map_ids: list[int], worker_id: str, status: str
+) -> int:
+    with session() as cur_session:
+        updated = cur_session.execute(
+            update(TimeDomainProcessingTable)
+            .where(
+                TimeDomainProcessingTable.map_id.in_(map_ids),
+                TimeDomainProcessingTable.worker_id == worker_id,
+                TimeDomainProcessingTable.processing_status == "running",
+            )
+            .values(processing_status=status, processing_end=time.time())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        cur_session.commit()
+
+    return updated
+
+
+def complete_maps(session: sessionmaker, map_ids: list[int], worker_id: str) -> int:
+    """
+    Mark maps claimed by worker_id as 'completed'.
+
+    Parameters
+    ----------
+    session : sessionmaker
+        A SQLAlchemy sessionmaker to use for database access.
+    map_ids : list[int]
+        IDs of the maps that were processed.
+    worker_id : str
+        Identifier of the worker that claimed the maps.
+
+    Returns
+    -------
+    n_completed : int
+        Number of maps updated. Maps whose claim has since been taken
+        over by another worker are not updated.
+    """
+    return _finish_maps(session, map_ids, worker_id, "completed")
+
+
+def fail_maps(
+    session: sessionmaker,
+    map_ids: list[int],
+    worker_id: str,
+    permanent: bool = False,
+) -> int:
+    """
+    Mark maps claimed by worker_id as 'failed', so they are retried by a
+    later claim, or as 'permafail', so they are not.
+
+    Parameters
+    ----------
+    session : sessionmaker
+        A SQLAlchemy sessionmaker to use for database access.
+    map_ids : list[int]
+        IDs of the maps that failed.
+    worker_id : str
+        Identifier of the worker that claimed the maps.
+    permanent : bool, optional
+        Whether the failure is pathological and should not be retried.
+
+    Returns
+    -------
+    n_failed : int
+        Number of maps updated. Maps whose claim has since been taken
+        over by another worker are not updated.
+    """
+    return _finish_maps(
+        session, map_ids, worker_id, "permafail" if permanent else "failed"
+    )
@@ -4,7 +4,7 @@ Reset processing statuses in the TimeDomainProcessingTable.
 
 import argparse as ap
 
-from sqlalchemy import select
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.orm import sessionmaker
 
 from mapcat.database import (
@@ -23,7 +23,8 @@ Statuses can be set to 'failed', 'completed', or 'permafail'
  or removed entirely by not specifying a target status.
 
 Entries to reset can be filtered by map ID, time range (using the map's ctime),
-and/or current processing status.
+and/or current processing status. Use --dry-run to only count the entries
+that would be changed.
 """
 
 USAGE = """Examples:
@@ -44,77 +45,114 @@ USAGE = """Examples:
   Mark a specific map as 'permafail' (will not be retried by the pipeline):
 
     mapcatreset --status permafail --map-id 42
+
+  Count the entries that would be removed in a time range, without removing them:
+
+    mapcatreset --dry-run --start-time 1755000000 --end-time 1756000000
 """
 
 
-def core(session: sessionmaker, args: ap.Namespace):
+def _map_filters(map_id_column, args: ap.Namespace) -> list:
+    """
+    Conditions on map_id_column selecting the maps matching the map ID
+    and time range filters in args, with the time range as a subquery
+    on DepthOneMapTable.ctime.
+    """
+    filters = []
+
+    if args.map_id:
+        filters.append(map_id_column.in_(args.map_id))
+
+    if args.start_time is not None or args.end_time is not None:
+        in_range = select(DepthOneMapTable.map_id)
+        if args.start_time is not None:
+            in_range = in_range.where(DepthOneMapTable.ctime >= args.start_time)
+        if args.end_time is not None:
+            in_range = in_range.where(DepthOneMapTable.ctime <= args.end_time)
+        filters.append(map_id_column.in_(in_range))
+
+    return filters
+
+
+def core(session: sessionmaker, args: ap.Namespace) -> dict[str, int]:
     """
     Driver function for reset.py. Takes a session and parsed args, then
     resets TimeDomainProcessingTable entries matching the given filters.
 
+    The reset runs as set-based UPDATE and DELETE statements, so no rows
+    are loaded into memory. With args.dry_run, the matching rows are only
+    counted.
+
     Parameters
     ----------
     session : sessionmaker
         A SQLAlchemy sessionmaker to use for database access.
     args : argparse.Namespace
         Parsed args with the reset options.
+
+    Returns
+    -------
+    counts : dict[str, int]
+        Number of processing status entries and pointing residuals that
+        were (or, for a dry run, would be) updated or removed.
     """
+    processing_filters = _map_filters(TimeDomainProcessingTable.map_id, args)
+    residual_filters = _map_filters(PointingResidualTable.map_id, args)
+
+    if args.from_status is not None:
+        processing_filters.append(
+            TimeDomainProcessingTable.processing_status == args.from_status
+        )
+        residual_filters.append(
+            PointingResidualTable.map_id.in_(
+                select(TimeDomainProcessingTable.map_id).where(
+                    TimeDomainProcessingTable.processing_status == args.from_status
+                )
+            )
+        )
 
     with session() as cur_session:
-        stmt = select(TimeDomainProcessingTable)
 
-        if args.map_id:
-            stmt = stmt.where(TimeDomainProcessingTable.map_id.in_(args.map_id))
+        def count(table, filters) -> int:
+            return cur_session.execute(
+                select(func.count()).select_from(table).where(*filters)
+            ).scalar_one()
 
-        if args.start_time is not None or args.end_time is not None:
-            stmt = stmt.join(
-                DepthOneMapTable,
-                TimeDomainProcessingTable.map_id == DepthOneMapTable.map_id,
-            )
-            if args.start_time is not None:
-                stmt = stmt.where(DepthOneMapTable.ctime >= args.start_time)
-            if args.end_time is not None:
-                stmt = stmt.where(DepthOneMapTable.ctime <= args.end_time)
-
-        if args.from_status is not None:
-            stmt = stmt.where(
-                TimeDomainProcessingTable.processing_status == args.from_status
-            )
+        def execute(stmt) -> int:
+            return cur_session.execute(
+                stmt.execution_options(synchronize_session=False)
+            ).rowcount
 
-        entries = cur_session.execute(stmt).scalars().all()
+        counts = {"processing": 0, "pointing_residuals": 0}
 
-        if args.status is None:
-            for entry in entries:
-                cur_session.delete(entry)
-
-            # remove the associated pointing residuals as well
-            pr_stmt = select(PointingResidualTable)
-            if args.map_id:
-                pr_stmt = pr_stmt.where(PointingResidualTable.map_id.in_(args.map_id))
-            if args.from_status is not None:
-                pr_stmt = pr_stmt.join(
-                    TimeDomainProcessingTable,
-                    PointingResidualTable.map_id == TimeDomainProcessingTable.map_id,
-                ).where(TimeDomainProcessingTable.processing_status == args.from_status)
-            if args.start_time is not None or args.end_time is not None:
-                pr_stmt = pr_stmt.join(
-                    DepthOneMapTable,
-                    PointingResidualTable.map_id == DepthOneMapTable.map_id,
+        if args.dry_run:
+            counts["processing"] = count(TimeDomainProcessingTable, processing_filters)
+            if args.status is None:
+                counts["pointing_residuals"] = count(
+                    PointingResidualTable, residual_filters
                 )
-                if args.start_time is not None:
-                    pr_stmt = pr_stmt.where(DepthOneMapTable.ctime >= args.start_time)
-                if args.end_time is not None:
-                    pr_stmt = pr_stmt.where(DepthOneMapTable.ctime <= args.end_time)
-
-            pointing_residuals = cur_session.execute(pr_stmt).scalars().all()
-            for pr in pointing_residuals:
-                cur_session.delete(pr)
+            return counts
+
+        if args.status is None:
+            # Remove the associated pointing residuals first, as they are
+            # selected through the processing status entries.
+            counts["pointing_residuals"] = execute(
+                delete(PointingResidualTable).where(*residual_filters)
+            )
+            counts["processing"] = execute(
+                delete(TimeDomainProcessingTable).where(*processing_filters)
+            )
         else:
-            for entry in entries:
-                entry.processing_status = args.status
+            counts["processing"] = execute(
+                update(TimeDomainProcessingTable)
+                .where(*processing_filters)
+                .values(processing_status=args.status)
+            )
 
         cur_session.commit()
 
+    return counts
+
 
 def main():
     from mapcat.helper import settings
@@ -172,6 +210,24 @@ def main():
         help="Only reset entries that currently have this processing status.",
     )
 
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report how many entries would be changed.",
+    )
+
     args = parser.parse_args()
 
-    core(session=settings.session, args=args)
+    counts = core(session=settings.session, args=args)
+
+    n_processing = counts["processing"]
+    n_residuals = counts["pointing_residuals"]
+    if args.status is None:
+        change = (
+            f"remove {n_processing} processing status entries "
+            f"and {n_residuals} pointing residuals"
+        )
+    else:
+        change = f"set {n_processing} processing status entries to '{args.status}'"
+
+    print(f"Would {change}." if args.dry_run else f"Did {change}.")
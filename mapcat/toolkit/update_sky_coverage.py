@@ -1,11 +1,35 @@
+import argparse as ap
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 import numpy as np
-from pixell import enmap
+from pixell import enmap, wcsutils
+from sqlalchemy import or_, select
 
 from mapcat.database.depth_one_map import DepthOneMapTable
+from mapcat.database.sky_cells import SkyCellRangeTable
 from mapcat.database.sky_coverage import SkyCoverageTable
 from mapcat.helper import settings
+from mapcat.sky import (
+    MAX_CELL_ORDER,
+    TILE_SIZE,
+    _grid_shape,
+    _nested_cell,
+    cells_to_ranges,
+    sky_to_cell,
+)
+
+FOOTPRINT_SUBDIVISIONS = 20
+"Number of footprint cells along each side of a sky coverage tile."
+
+FOOTPRINT_RESOLUTION = TILE_SIZE / FOOTPRINT_SUBDIVISIONS
+"Size in degrees of the footprint cells."
+
+CELL_RESOLUTION = TILE_SIZE / 2**MAX_CELL_ORDER
+"Size in degrees of the sky cells at MAX_CELL_ORDER."
+
+STRIP_PIXELS = 2**24
+"Maximum number of time map pixels read into memory at once."
 
 
 def resolve_tmap(d1table: DepthOneMapTable) -> Path:
@@ -54,38 +78,40 @@ def index_to_skybox(ra_idx: int, dec_idx: int) -> np.ndarray:
     )
 
 
-def ra_to_index(ra: float) -> int:
+def ra_to_index(ra: float | np.ndarray) -> int | np.ndarray:
     """
     Convert an ra in degrees to a sky coverage tile index
 
     Parameters
     ----------
-    ra : float
-        The ra in degrees to convert
+    ra : float | np.ndarray
+        The ra in degrees to convert. Arrays are converted element-wise.
 
     Returns
     -------
-    idx : int
+    idx : int | np.ndarray
         The sky coverage tile index corresponding to the input ra
     """
-    return int(np.floor(ra / 10))
+    idx = np.floor(np.asarray(ra) / 10).astype(int)
+    return int(idx) if idx.ndim == 0 else idx
 
 
-def dec_to_index(dec: float) -> int:
+def dec_to_index(dec: float | np.ndarray) -> int | np.ndarray:
     """
     Convert a dec in degrees to a sky coverage tile index
 
     Parameters
     ----------
-    dec : float
-        The dec in degrees to convert
+    dec : float | np.ndarray
+        The dec in degrees to convert. Arrays are converted element-wise.
 
     Returns
     -------
-    idx : int
+    idx : int | np.ndarray
         The sky coverage tile index corresponding to the input dec
     """
-    return int(np.floor(dec / 10)) + 9
+    idx = np.floor(np.asarray(dec) / 10).astype(int) + 9
+    return int(idx) if idx.ndim == 0 else idx
 
 
 def _ra_to_index_pixell(ra: float) -> int:
@@ -107,63 +133,294 @@ def _ra_to_index_pixell(ra: float) -> int:
     return int(np.floor(ra / 10)) + 18
 
 
-def get_sky_coverage(tmap: enmap.ndmap, convention: str = "standard") -> list:
+def _run_starts(cells: np.ndarray) -> np.ndarray:
     """
-    Given the time map of a depth1 map, return the list
-    of sky coverage tiles that cover that map
+    Indices at which a sequence of cell indices changes value.
+    """
+    return np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+
+
+def _accumulate_hits(
+    grid: np.ndarray, tmap: enmap.ndmap, resolution: float, ra_shift: float
+) -> None:
+    """
+    Or the cells (see `sky_to_cell`) containing observed pixel centres of
+    tmap into grid, in place. tmap may be any row strip of a larger map.
+
+    For separable (CAR) geometries the map is reduced in one pass: rows
+    and columns map to runs of cells, so the hits are or-reduced over
+    those runs without computing per-pixel coordinates.
+    """
+    hits = np.asarray(tmap) != 0
+    if hits.ndim > 2:
+        hits = np.any(hits.reshape(-1, *hits.shape[-2:]), axis=0)
+
+    if not hits.any():
+        return
+
+    if not wcsutils.is_separable(tmap.wcs):  # pragma: no cover
+        dec, ra = enmap.pix2sky(tmap.shape, tmap.wcs, np.array(np.nonzero(hits)))
+        y_idx, x_idx = sky_to_cell(
+            np.rad2deg(ra) + ra_shift, np.rad2deg(dec), resolution
+        )
+        grid[y_idx, x_idx] = True
+        return
+
+    dec, ra = enmap.posaxes(tmap.shape, tmap.wcs)
+    y_idx, _ = sky_to_cell(0.0, np.rad2deg(dec), resolution)
+    _, x_idx = sky_to_cell(np.rad2deg(ra) + ra_shift, 0.0, resolution)
+
+    row_starts = _run_starts(y_idx)
+    col_starts = _run_starts(x_idx)
+    blocks = np.logical_or.reduceat(hits, row_starts, axis=0)
+    blocks = np.logical_or.reduceat(blocks, col_starts, axis=1)
+
+    np.logical_or.at(
+        grid, (y_idx[row_starts][:, None], x_idx[col_starts][None, :]), blocks
+    )
+
+
+def _check_convention(convention: str) -> float:
+    """
+    Validate the coordinate convention and return the RA shift that
+    converts from the pixell convention to the normal RA convention.
+
+    Raises
+    --------
+    ValueError
+        If the convention is not 'standard' or 'ACT'.
+    """
+    if convention not in ["standard", "ACT"]:
+        raise ValueError("Invalid convention. Must be 'standard' or 'ACT'.")
+    return 180 if convention == "ACT" else 0
+
+
+def get_hit_grid(
+    tmap: enmap.ndmap, resolution: float, convention: str = "standard"
+) -> np.ndarray:
+    """
+    Given the time map of a depth1 map, compute a full-sky boolean grid
+    of the cells (see `sky_to_cell`) that contain at least one observed
+    pixel centre.
 
     Parameters
     ----------
     tmap : enmap.enmap
         The time map of the depth-one map. Pixels that were observed have non-zero values.
+    resolution : float
+        The size of the grid cells, in degrees.
     convention : str, optional
         The coordinate convention to use. Default is "standard", corresponding to 0 < ra < 360.
         If ACT is specified, the convention is -180 < ra < 180.
 
     Returns
     -------
-    tiles : list
-        A list of sky coverage tiles that cover the map
+    grid : np.ndarray
+        Boolean array of shape (180 / resolution, 360 / resolution),
+        indexed as [dec_idx, ra_idx].
 
     Raises
     --------
     ValueError
         If the convention is not 'standard' or 'ACT'.
     """
-    if convention not in ["standard", "ACT"]:
-        raise ValueError("Invalid convention. Must be 'standard' or 'ACT'.")
-    box = tmap.box()
+    ra_shift = _check_convention(convention)
+
+    grid = np.zeros(_grid_shape(resolution), bool)
+    _accumulate_hits(grid, tmap, resolution, ra_shift)
+
+    return grid
+
+
+def read_hit_grids(
+    tmap_path: str | Path,
+    resolutions: list[float],
+    convention: str = "standard",
+    strip_pixels: int = STRIP_PIXELS,
+) -> list[np.ndarray]:
+    """
+    Compute the hit grids (see `get_hit_grid`) of a time map on disk,
+    for several resolutions at once, without loading the whole map.
+
+    Only the header is read up front; the data is then read in strips of
+    whole rows of at most strip_pixels pixels, so peak memory does not
+    depend on the size of the map.
+
+    Parameters
+    ----------
+    tmap_path : str | Path
+        The local path to the time map.
+    resolutions : list[float]
+        The sizes of the grid cells, in degrees, of each grid to compute.
+    convention : str, optional
+        The coordinate convention to use. Default is "standard", corresponding to 0 < ra < 360.
+        If ACT is specified, the convention is -180 < ra < 180.
+    strip_pixels : int, optional
+        Maximum number of pixels (over all components) read at a time,
+        by default STRIP_PIXELS.
+
+    Returns
+    -------
+    grids : list[np.ndarray]
+        One boolean grid per resolution, indexed as [dec_idx, ra_idx].
+
+    Raises
+    --------
+    ValueError
+        If the convention is not 'standard' or 'ACT'.
+    """
+    ra_shift = _check_convention(convention)
+
+    grids = [np.zeros(_grid_shape(res), bool) for res in resolutions]
+
+    tmap = enmap.read_map(str(tmap_path), delayed=True)
+    n_rows = tmap.shape[-2]
+    row_pixels = int(np.prod(tmap.shape)) // max(n_rows, 1)
+    strip_rows = max(1, strip_pixels // max(row_pixels, 1))
+
+    for start in range(0, n_rows, strip_rows):
+        strip = tmap[..., start : start + strip_rows, :]
+        for grid, res in zip(grids, resolutions):
+            _accumulate_hits(grid, strip, res, ra_shift)
+
+    return grids
+
+
+def get_sky_footprints(
+    tmap: enmap.ndmap, convention: str = "standard"
+) -> dict[tuple[int, int], bytes]:
+    """
+    Given the time map of a depth1 map, compute a compact footprint for
+    every sky coverage tile it touches. Each footprint is a packed boolean
+    mask of FOOTPRINT_SUBDIVISIONS x FOOTPRINT_SUBDIVISIONS cells, stored
+    row-major from the (dec_min, ra_min) corner of the tile.
+
+    Parameters
+    ----------
+    tmap : enmap.enmap
+        The time map of the depth-one map. Pixels that were observed have non-zero values.
+    convention : str, optional
+        The coordinate convention to use. Default is "standard", corresponding to 0 < ra < 360.
+        If ACT is specified, the convention is -180 < ra < 180.
+
+    Returns
+    -------
+    footprints : dict[tuple[int, int], bytes]
+        Mapping from (x, y) tile index to packed footprint mask.
+    """
+    grid = get_hit_grid(tmap, FOOTPRINT_RESOLUTION, convention=convention)
+    return _footprints_from_grid(grid)
+
+
+def _footprints_from_grid(grid: np.ndarray) -> dict[tuple[int, int], bytes]:
+    """
+    Split a hit grid at FOOTPRINT_RESOLUTION into packed per-tile footprints.
+    """
+    n = FOOTPRINT_SUBDIVISIONS
+    ny, nx = grid.shape[0] // n, grid.shape[1] // n
+    tiles = grid.reshape(ny, n, nx, n).transpose(0, 2, 1, 3)
+
+    return {
+        (int(x), int(y)): np.packbits(tiles[y, x]).tobytes()
+        for y, x in zip(*np.nonzero(tiles.any(axis=(2, 3))))
+    }
+
+
+def footprint_contains(
+    footprint: bytes, ra: float | np.ndarray, dec: float | np.ndarray
+) -> np.ndarray:
+    """
+    Check whether positions fall in observed cells of a tile footprint,
+    as computed by `get_sky_footprints`. The positions are assumed to lie
+    within the tile the footprint belongs to.
+
+    Parameters
+    ----------
+    footprint : bytes
+        The packed footprint mask of a sky coverage tile.
+    ra : float | np.ndarray
+        The ra in degrees to check
+    dec : float | np.ndarray
+        The dec in degrees to check
+
+    Returns
+    -------
+    contained : np.ndarray
+        Boolean array, True where the position is in an observed cell.
+    """
+    n = FOOTPRINT_SUBDIVISIONS
+    mask = np.unpackbits(np.frombuffer(footprint, dtype=np.uint8), count=n * n)
+    y_idx, x_idx = sky_to_cell(ra, dec, TILE_SIZE / n)
+    return mask[(y_idx % n) * n + (x_idx % n)].astype(bool)
+
+
+def get_sky_cell_ranges(
+    tmap: enmap.ndmap, convention: str = "standard", order: int = MAX_CELL_ORDER
+) -> np.ndarray:
+    """
+    Given the time map of a depth1 map, return the ranges of hierarchical
+    sky cells (see `mapcat.sky.sky_to_nested_cell`) that contain observed pixels.
 
-    dec_min, ra_max = np.rad2deg(box[0])
-    dec_max, ra_min = np.rad2deg(box[1])
+    Parameters
+    ----------
+    tmap : enmap.enmap
+        The time map of the depth-one map. Pixels that were observed have non-zero values.
+    convention : str, optional
+        The coordinate convention to use. Default is "standard", corresponding to 0 < ra < 360.
+        If ACT is specified, the convention is -180 < ra < 180.
+    order : int, optional
+        The order of the cells, by default MAX_CELL_ORDER.
 
-    dec_min = np.floor(dec_min / 10) * 10
-    dec_max = np.ceil(dec_max / 10) * 10
-    ra_min = np.floor(ra_min / 10) * 10
-    ra_max = np.ceil(ra_max / 10) * 10
-    if convention == "ACT":
-        ra_min += 180  # Convert from pixel standard to normal RA convention
-        ra_max += 180
+    Returns
+    -------
+    ranges : np.ndarray
+        Array of shape (n_ranges, 2) of [start, end) cell ids.
+    """
+    grid = get_hit_grid(tmap, TILE_SIZE / 2**order, convention=convention)
+    return _cell_ranges_from_grid(grid, order)
 
-    ras = np.arange(ra_min, ra_max, 10)
-    decs = np.arange(dec_min, dec_max, 10)
 
-    ra_idx = []
-    dec_idx = []
+def _cell_ranges_from_grid(grid: np.ndarray, order: int) -> np.ndarray:
+    """
+    Convert a hit grid at a resolution of TILE_SIZE / 2**order into
+    ranges of nested sky cell ids.
+    """
+    y_idx, x_idx = np.nonzero(grid)
+    return cells_to_ranges(_nested_cell(y_idx, x_idx, order))
+
+
+def get_sky_coverage(tmap: enmap.ndmap, convention: str = "standard") -> list:
+    """
+    Given the time map of a depth1 map, return the list
+    of sky coverage tiles that cover that map. A tile covers
+    the map if it contains the centre of an observed pixel.
+
+    The observed-pixel mask is computed once and reduced onto
+    the tile grid in a single pass, see `get_hit_grid`.
+
+    Parameters
+    ----------
+    tmap : enmap.enmap
+        The time map of the depth-one map. Pixels that were observed have non-zero values.
+    convention : str, optional
+        The coordinate convention to use. Default is "standard", corresponding to 0 < ra < 360.
+        If ACT is specified, the convention is -180 < ra < 180.
+
+    Returns
+    -------
+    tiles : list
+        A list of sky coverage tiles that cover the map, as (x, y)
+        tuples sorted by x and then y.
 
-    for ra in ras:
-        for dec in decs:
-            ra_id = ra_to_index(ra)
-            dec_id = dec_to_index(dec)
-            skybox = index_to_skybox(ra_id, dec_id)
-            if convention == "ACT":
-                skybox[..., 1] -= np.pi  # Convert from standard RA to pixell convention
-            submap = enmap.submap(tmap, skybox)
-            if np.any(submap):
-                ra_idx.append(ra_id)
-                dec_idx.append(dec_id)
+    Raises
+    --------
+    ValueError
+        If the convention is not 'standard' or 'ACT'.
+    """
+    grid = get_hit_grid(tmap, TILE_SIZE, convention=convention)
+    ra_idx, dec_idx = np.nonzero(grid.T)
 
-    return list(zip(ra_idx, dec_idx))
+    return list(zip(ra_idx.tolist(), dec_idx.tolist()))
 
 
 def coverage_from_depthone(
@@ -186,19 +443,129 @@ def coverage_from_depthone(
         A list of sky coverage tiles that cover the map
     """
     tmap_path = resolve_tmap(d1table)
-    tmap = enmap.read_map(str(tmap_path))
+    (grid,) = read_hit_grids(tmap_path, [FOOTPRINT_RESOLUTION], convention=convention)
+    footprints = _footprints_from_grid(grid)
+
+    return [
+        SkyCoverageTable(x=x, y=y, map_id=d1table.map_id, footprint=footprint)
+        for (x, y), footprint in sorted(footprints.items())
+    ]
 
-    coverage_tiles = get_sky_coverage(tmap, convention=convention)
+
+def coverage_from_tmap(
+    tmap: enmap.ndmap, map_id: int, convention: str = "standard"
+) -> list[SkyCoverageTable]:
+    """
+    Get the list of sky coverage tiles that cover a time map
+
+    Parameters
+    ----------
+    tmap : enmap.enmap
+        The time map of the depth-one map. Pixels that were observed have non-zero values.
+    map_id : int
+        The ID of the depth one map the time map belongs to
+    convention : str, optional
+        The coordinate convention to use. Default is "standard", corresponding to 0 < ra < 360.
+        If ACT is specified, the convention is -180 < ra < 180.
+
+    Returns
+    -------
+    tiles : list[SkyCoverageTable]
+        A list of sky coverage tiles that cover the map
+    """
+    # Every tile with an observed pixel has a footprint, so the tiles
+    # come from the same pass over the map.
+    footprints = get_sky_footprints(tmap, convention=convention)
 
     return [
-        SkyCoverageTable(x=tile[0], y=tile[1], map_id=d1table.map_id)
-        for tile in coverage_tiles
+        SkyCoverageTable(x=x, y=y, map_id=map_id, footprint=footprint)
+        for (x, y), footprint in sorted(footprints.items())
     ]
 
 
-def core(session, convention: str = "standard"):
+def cell_ranges_from_tmap(
+    tmap: enmap.ndmap, map_id: int, convention: str = "standard"
+) -> list[SkyCellRangeTable]:
+    """
+    Get the hierarchical sky cell ranges that cover a time map
+
+    Parameters
+    ----------
+    tmap : enmap.enmap
+        The time map of the depth-one map. Pixels that were observed have non-zero values.
+    map_id : int
+        The ID of the depth one map the time map belongs to
+    convention : str, optional
+        The coordinate convention to use. Default is "standard", corresponding to 0 < ra < 360.
+        If ACT is specified, the convention is -180 < ra < 180.
+
+    Returns
+    -------
+    ranges : list[SkyCellRangeTable]
+        A list of sky cell ranges that cover the map
+    """
+    return [
+        SkyCellRangeTable(map_id=map_id, cell_start=int(start), cell_end=int(end))
+        for start, end in get_sky_cell_ranges(tmap, convention=convention)
+    ]
+
+
+def _compute_coverage(
+    map_id: int,
+    tmap_path: str,
+    convention: str,
+    needs_tiles: bool,
+    needs_cells: bool,
+) -> tuple[int, dict[tuple[int, int], bytes], np.ndarray]:
+    """
+    Read a time map in strips and compute its sky coverage. Runs in worker
+    processes, so it only takes and returns plain data.
+
+    Parameters
+    ----------
+    map_id : int
+        The ID of the depth one map the time map belongs to
+    tmap_path : str
+        The local path to the time map
+    convention : str
+        The coordinate convention to use, 'standard' or 'ACT'.
+    needs_tiles : bool
+        Whether to compute the sky coverage tile footprints.
+    needs_cells : bool
+        Whether to compute the hierarchical sky cell ranges.
+
+    Returns
+    -------
+    map_id, footprints, ranges : tuple[int, dict[tuple[int, int], bytes], np.ndarray]
+        The map ID, the footprints of the covered tiles (empty if not
+        requested) and the sky cell ranges (empty if not requested).
+    """
+    resolutions = [FOOTPRINT_RESOLUTION] * needs_tiles + [CELL_RESOLUTION] * needs_cells
+    grids = read_hit_grids(tmap_path, resolutions, convention=convention)
+
+    footprints = {}
+    ranges = np.zeros((0, 2), dtype=np.int64)
+    if needs_tiles:
+        footprints = _footprints_from_grid(grids.pop(0))
+    if needs_cells:
+        ranges = _cell_ranges_from_grid(grids.pop(0), MAX_CELL_ORDER)
+
+    return map_id, footprints, ranges
+
+
+def core(
+    session,
+    convention: str = "standard",
+    workers: int = 1,
+    batch_size: int = 100,
+):
     """
     Core function for updating the sky coverage table. For each depth one map that does not have any associated sky coverage tiles, compute the sky coverage tiles and add them to the database.
+    Maps without hierarchical sky cell ranges get those computed in the same pass.
+
+    Time maps are read and reduced in a pool of worker processes, and the results
+    are committed every batch_size maps, so an interrupted backfill keeps its progress
+    and can be resumed by running it again.
 
     Parameters
     ----------
@@ -207,22 +574,100 @@ def core(session, convention: str = "standard"):
     convention : str, optional
         The coordinate convention to use. Default is "standard", corresponding to 0 < ra < 360.
         If ACT is specified, the convention is -180 < ra < 180.
+    workers : int, optional
+        Number of worker processes to read maps with. With 1 (the default),
+        everything runs in the current process.
+    batch_size : int, optional
+        Number of maps to insert coverage for between commits.
     """
+    missing_tiles = ~DepthOneMapTable.depth_one_sky_coverage.any()
+    missing_cells = ~DepthOneMapTable.depth_one_sky_cell_ranges.any()
+
     with session() as cur_session:
-        d1maps = (
-            cur_session.query(DepthOneMapTable)
-            .outerjoin(
-                SkyCoverageTable, SkyCoverageTable.map_id == DepthOneMapTable.map_id
+        d1maps = cur_session.execute(
+            select(DepthOneMapTable, missing_tiles, missing_cells)
+            .where(or_(missing_tiles, missing_cells))
+            .order_by(DepthOneMapTable.map_id)
+        ).all()
+
+        tasks = [
+            (d1map.map_id, str(resolve_tmap(d1map)), convention, tiles, cells)
+            for d1map, tiles, cells in d1maps
+        ]
+
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = (
+                future.result()
+                for future in as_completed(
+                    [executor.submit(_compute_coverage, *task) for task in tasks]
+                )
             )
-            .filter(SkyCoverageTable.map_id.is_(None))
-            .all()
-        )
-        for d1map in d1maps:
-            SkyCov = coverage_from_depthone(d1map, convention=convention)
-            cur_session.add_all(SkyCov)
+        else:
+            executor = None
+            results = (_compute_coverage(*task) for task in tasks)
+
+        try:
+            for n_done, (map_id, footprints, ranges) in enumerate(results, start=1):
+                cur_session.add_all(
+                    SkyCoverageTable(x=x, y=y, map_id=map_id, footprint=footprint)
+                    for (x, y), footprint in sorted(footprints.items())
+                )
+                cur_session.add_all(
+                    SkyCellRangeTable(
+                        map_id=map_id, cell_start=int(start), cell_end=int(end)
+                    )
+                    for start, end in ranges
+                )
+                if n_done % batch_size == 0:
+                    cur_session.commit()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
 
         cur_session.commit()
 
 
+HELP_TEXT = """Use this utility to compute the sky coverage of depth-1 maps
+that do not have any yet, by reading their time maps. Work is spread over
+a pool of worker processes and committed in batches, so an interrupted run
+can simply be restarted.
+"""
+
+
 def main():
-    core(session=settings.session)
+    parser = ap.ArgumentParser(prog="updatesky", description=HELP_TEXT)
+
+    parser.add_argument(
+        "-c",
+        "--convention",
+        type=str,
+        choices=["standard", "ACT"],
+        default="standard",
+        help="RA convention of the time maps: 'standard' (0 < ra < 360) or 'ACT'.",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes used to read maps.",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=100,
+        help="Number of maps to process between database commits.",
+    )
+
+    args = parser.parse_args()
+
+    core(
+        session=settings.session,
+        convention=args.convention,
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
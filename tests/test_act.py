@@ -206,6 +206,8 @@ def test_act(database_sessionmaker, downloaded_data_file):
         glob="*/*_map.fits",
         relative_to=downloaded_data_file,
         telescope="act",
+        batch_size=100,
+        jobs=1,
     )
 
     act.core(session=database_sessionmaker, args=args)
@@ -232,6 +234,8 @@ def test_sky_coverage(database_sessionmaker, downloaded_data_file):
         glob="*/*_map.fits",
         relative_to=downloaded_data_file,
         telescope="act",
+        batch_size=100,
+        jobs=1,
     )
     act.core(session=database_sessionmaker, args=args)
 
@@ -264,6 +268,8 @@ def test_sky_coverage_2(database_sessionmaker, downloaded_data_file):
         glob="*/*_map.fits",
         relative_to=downloaded_data_file,
         telescope="act",
+        batch_size=100,
+        jobs=1,
     )
 
     act.core(session=database_sessionmaker, args=args)
@@ -0,0 +1,247 @@
+"""
+Tests for atomic map lookups.
+"""
+
+import numpy as np
+import pytest
+from alembic import command
+from alembic.config import Config
+from astropy import units as u
+from astropy.coordinates import ICRS
+from sqlalchemy import create_engine, delete, insert, select, text
+
+from mapcat import alembic_location
+from mapcat.core import get_atomic_maps, get_atomic_maps_by_cone
+from mapcat.database import AtomicMapTable
+from mapcat.sky import sky_to_nested_cell
+from mapcat.toolkit import bulk
+
+
+@pytest.fixture
+def atomic_maps(database_sessionmaker):
+    """Eight atomic maps over two wafers, two bands and two splits."""
+    with database_sessionmaker() as session:
+        session.add_all(
+            AtomicMapTable(
+                obs_id=f"obs_{1755600000 + 600 * (i // 4)}_satp1_1111111",
+                telescope="satp1",
+                freq_channel=["f090", "f150"][i % 2],
+                wafer=["ws0", "ws1"][(i // 2) % 2],
+                ctime=1755600000 + 600 * (i // 4),
+                split_label=["full", "scan_left"][i // 4],
+                map_path=f"/PATH/TO/ATOMIC/{i}",
+                valid=i != 0,
+            )
+            for i in range(8)
+        )
+        session.commit()
+
+    yield
+
+    with database_sessionmaker() as session:
+        session.execute(
+            delete(AtomicMapTable).where(AtomicMapTable.telescope == "satp1")
+        )
+        session.commit()
+
+
+def test_get_atomic_maps(database_sessionmaker, atomic_maps):
+    with database_sessionmaker() as session:
+        assert len(get_atomic_maps(session)) == 8
+
+        rows = get_atomic_maps(session, wafer="ws0", freq_channel="f090")
+        assert [row.map_path for row in rows] == [
+            "/PATH/TO/ATOMIC/0",
+            "/PATH/TO/ATOMIC/4",
+        ]
+        assert not isinstance(rows[0], AtomicMapTable)
+
+        rows = get_atomic_maps(
+            session,
+            obs_id=["obs_1755600000_satp1_1111111"],
+            wafer=["ws0", "ws1"],
+            valid=True,
+        )
+        assert sorted(row.map_path for row in rows) == [
+            f"/PATH/TO/ATOMIC/{i}" for i in (1, 2, 3)
+        ]
+
+        rows = get_atomic_maps(
+            session,
+            split_label="scan_left",
+            start_time=1755600600,
+            stop_time=1755601200,
+            columns=["atomic_map_id", "ctime"],
+        )
+        assert len(rows) == 4
+        assert all(row.ctime == 1755600600 for row in rows)
+        assert rows[0]._fields == ("atomic_map_id", "ctime")
+
+        assert get_atomic_maps(session, stop_time=1755600000) == []
+
+        with pytest.raises(ValueError):
+            get_atomic_maps(session, columns=["not_a_column"])
+
+
+def test_atomic_map_indexes(database_sessionmaker):
+    with database_sessionmaker() as session:
+        plan = session.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT atomic_map_id FROM atomic_maps "
+                "WHERE freq_channel = 'f090' AND split_label = 'full' "
+                "AND ctime >= 0 AND ctime < 1"
+            )
+        ).all()
+
+    assert "ix_atomic_maps_freq_channel_split_label_ctime" in str(plan)
+
+
+def test_sky_cell_follows_center(database_sessionmaker):
+    with database_sessionmaker() as session:
+        atomic_map = AtomicMapTable(
+            obs_id="obs_1755600000_satp2_1111111",
+            telescope="satp2",
+            freq_channel="f090",
+            wafer="ws0",
+            ctime=1755600000,
+            split_label="full",
+        )
+        session.add(atomic_map)
+        session.commit()
+        assert atomic_map.sky_cell is None
+
+        atomic_map.ra_center = 125.0
+        atomic_map.dec_center = -45.0
+        session.commit()
+        assert atomic_map.sky_cell == int(sky_to_nested_cell(125.0, -45.0))
+
+        session.delete(atomic_map)
+        session.commit()
+
+
+def test_sky_cell_without_orm(database_sessionmaker):
+    def row(i: int, ra_center: float | None, dec_center: float | None) -> dict:
+        return {
+            "obs_id": f"obs_{1755600000 + i}_satp4_1111111",
+            "telescope": "satp4",
+            "freq_channel": "f090",
+            "wafer": "ws0",
+            "ctime": 1755600000 + i,
+            "split_label": "full",
+            "ra_center": ra_center,
+            "dec_center": dec_center,
+        }
+
+    with database_sessionmaker() as session:
+        bulk.insert_rows(
+            session, AtomicMapTable, [row(0, 125.0, -45.0), row(1, None, None)]
+        )
+        session.execute(insert(AtomicMapTable).values(**row(2, 210.3, -12.1)))
+        session.commit()
+
+        cells = session.execute(
+            select(AtomicMapTable.sky_cell)
+            .where(AtomicMapTable.telescope == "satp4")
+            .order_by(AtomicMapTable.ctime)
+        ).scalars()
+        assert list(cells) == [
+            int(sky_to_nested_cell(125.0, -45.0)),
+            None,
+            int(sky_to_nested_cell(210.3, -12.1)),
+        ]
+
+        rows, other = get_atomic_maps_by_cone(
+            ICRS([125.0, 210.3] * u.deg, [-45.0, -12.1] * u.deg), 0.1 * u.deg, session
+        )
+        assert [r.obs_id for r in rows] == ["obs_1755600000_satp4_1111111"]
+        assert [r.obs_id for r in other] == ["obs_1755600002_satp4_1111111"]
+
+        session.execute(
+            delete(AtomicMapTable).where(AtomicMapTable.telescope == "satp4")
+        )
+        session.commit()
+
+
+def test_get_atomic_maps_by_cone(database_sessionmaker):
+    rng = np.random.default_rng(1)
+    ra = np.concatenate([rng.uniform(0, 360, 300), [359.9, 0.1, 10.0, 10.0]])
+    dec = np.concatenate([rng.uniform(-89, 89, 300), [-20.0, -20.0, 89.9, 89.9]])
+    ra[-1] += 180
+
+    with database_sessionmaker() as session:
+        session.add_all(
+            AtomicMapTable(
+                obs_id=f"obs_{1755600000 + i}_satp3_1111111",
+                telescope="satp3",
+                freq_channel="f090",
+                wafer="ws0",
+                ctime=1755600000 + i,
+                split_label="full",
+                ra_center=r,
+                dec_center=d,
+            )
+            for i, (r, d) in enumerate(zip(ra, dec))
+        )
+        session.commit()
+
+        positions = ICRS(
+            np.r_[0.0, 10.0, rng.uniform(0, 360, 20)] * u.deg,
+            np.r_[-20.0, 89.9, rng.uniform(-89, 89, 20)] * u.deg,
+        )
+        for radius in [0.5 * u.deg, 3 * u.deg, 25 * u.deg]:
+            matches = get_atomic_maps_by_cone(positions, radius, session)
+            assert len(matches) == len(positions)
+
+            separation = positions[:, None].separation(
+                ICRS(ra * u.deg, dec * u.deg)[None, :]
+            )
+            for i, rows in enumerate(matches):
+                expected = np.flatnonzero(separation[i] <= radius)
+                assert sorted(row.ctime - 1755600000 for row in rows) == list(expected)
+                distances = [separation[i, row.ctime - 1755600000] for row in rows]
+                assert distances == sorted(distances)
+
+        # The pole pair is 0.2 degrees apart, across all RAs.
+        rows = get_atomic_maps_by_cone(
+            ICRS(10.0 * u.deg, 89.9 * u.deg), 0.5 * u.deg, session
+        )
+        assert len(rows) == 2
+        assert rows[0].ra_center == pytest.approx(10.0)
+
+        assert get_atomic_maps_by_cone([], 1 * u.deg, session) == []
+        with pytest.raises(ValueError):
+            get_atomic_maps_by_cone(positions, -1 * u.deg, session)
+
+        session.execute(
+            delete(AtomicMapTable).where(AtomicMapTable.telescope == "satp3")
+        )
+        session.commit()
+
+
+def test_backfill_sky_cell_migration(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'sky_cell.db'}"
+    alembic_cfg = Config(alembic_location)
+    alembic_cfg.set_main_option("sqlalchemy.url", database_url)
+    command.upgrade(alembic_cfg, "0f277718b121")
+
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        for atomic_map_id, center in [(1, "125.0, -45.0"), (2, "NULL, NULL")]:
+            connection.execute(
+                text(
+                    "INSERT INTO atomic_maps (atomic_map_id, obs_id, telescope, "
+                    "freq_channel, wafer, ctime, split_label, ra_center, "
+                    f"dec_center) VALUES ({atomic_map_id}, 'obs', 'satp1', "
+                    f"'f090', 'ws0', 0, 'full', {center})"
+                )
+            )
+
+    command.upgrade(alembic_cfg, "head")
+
+    with engine.connect() as connection:
+        cells = connection.execute(
+            text("SELECT sky_cell FROM atomic_maps ORDER BY atomic_map_id")
+        ).scalars()
+        assert list(cells) == [int(sky_to_nested_cell(125.0, -45.0)), None]
+
+    engine.dispose()
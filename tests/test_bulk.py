@@ -0,0 +1,118 @@
+"""
+Tests for the bulk loader.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, func, select
+
+from mapcat.database import DepthOneMapTable, TODDepthOneTable
+from mapcat.toolkit import bulk
+
+
+def _map_row(name: str, **extra) -> dict:
+    return {
+        "map_name": name,
+        "map_path": f"/PATH/TO/{name}",
+        "tube_slot": "OTi1",
+        "frequency": "f090",
+        "ctime": 1755787524.0,
+        "start_time": 1755687524.0,
+        "stop_time": 1755887524.0,
+        **extra,
+    }
+
+
+def _tod_row(obs_id: str) -> dict:
+    return {
+        "obs_id": obs_id,
+        "ctime": 1755787524.0,
+        "telescope": "lat",
+        "tube_slot": "i1",
+        "frequency": "f090",
+    }
+
+
+def test_load_depth_one_maps(database_sessionmaker):
+    with database_sessionmaker() as session:
+        session.add(TODDepthOneTable(**_tod_row("obs_1755700000_bulk_existing")))
+        session.commit()
+
+    maps = [_map_row(f"bulk_map_{i}", notes={"i": i}) for i in range(3)]
+    tods = [
+        [_tod_row("obs_1755700000_bulk_existing"), _tod_row("obs_1755700001_bulk")],
+        [_tod_row("obs_1755700001_bulk"), _tod_row("obs_1755700002_bulk")],
+        [],
+    ]
+    coverage = [[{"x": 12, "y": 4, "footprint": b"\x01\x02"}], [], [{"x": 1, "y": 2}]]
+
+    with database_sessionmaker() as session:
+        map_ids = bulk.load_depth_one_maps(session, maps, tods, coverage)
+        session.commit()
+
+    assert len(map_ids) == 3
+
+    with database_sessionmaker() as session:
+        loaded = [session.get(DepthOneMapTable, map_id) for map_id in map_ids]
+        assert [m.map_name for m in loaded] == [m["map_name"] for m in maps]
+        assert loaded[2].notes == {"i": 2}
+
+        assert sorted(t.obs_id for t in loaded[0].tods) == [
+            "obs_1755700000_bulk_existing",
+            "obs_1755700001_bulk",
+        ]
+        assert len(loaded[2].tods) == 0
+        assert {m.map_id for m in loaded[1].tods[0].maps} <= set(map_ids)
+
+        shared = session.execute(
+            select(TODDepthOneTable).where(
+                TODDepthOneTable.obs_id.like("obs_17557000%_bulk%")
+            )
+        ).scalars()
+        assert len(list(shared)) == 3
+
+        assert loaded[0].depth_one_sky_coverage[0].footprint == b"\x01\x02"
+        assert int(loaded[2].depth_one_sky_coverage[0].x) == 1
+
+        for dmap in loaded:
+            session.delete(dmap)
+        session.commit()
+
+
+def test_insert_rows_rejects_unknown_columns(database_sessionmaker):
+    with pytest.raises(ValueError), database_sessionmaker() as session:
+        bulk.insert_rows(session, DepthOneMapTable, [_map_row("bad", colour="red")])
+
+
+def test_copy_text():
+    assert bulk._copy_text(None) == "\\N"
+    assert bulk._copy_text(True) == "t"
+    assert bulk._copy_text(1.5) == "1.5"
+    assert bulk._copy_text("a\tb\\c\nd") == "a\\tb\\\\c\\nd"
+    assert bulk._copy_text(b"\x01\xff") == "\\\\x01ff"
+    assert bulk._copy_text({"a": 1}) == '{"a": 1}'
+
+
+def test_fill_defaults():
+    table = Table(
+        "defaults",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("a", Integer),
+        Column("b", Integer, default=7),
+        Column("c", Integer, default=lambda ctx: 2 * ctx.get_current_parameters()["a"]),
+    )
+    model = SimpleNamespace(__table__=table, __tablename__="defaults")
+
+    columns, rows = bulk._fill_defaults(model, ["a"], [{"a": 1}, {"a": 2}])
+    assert columns == ["a", "b", "c"]
+    assert rows == [{"a": 1, "b": 7, "c": 2}, {"a": 2, "b": 7, "c": 4}]
+
+    # Defaults do not override values that are given.
+    columns, rows = bulk._fill_defaults(model, ["a", "b"], [{"a": 1, "b": 0}])
+    assert rows == [{"a": 1, "b": 0, "c": 2}]
+
+    table.append_column(Column("d", Integer, default=func.random()))
+    with pytest.raises(ValueError):
+        bulk._fill_defaults(model, ["a"], [{"a": 1}])
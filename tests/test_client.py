@@ -0,0 +1,131 @@
+"""
+Tests for the asynchronous client.
+"""
+
+import asyncio
+
+import pytest
+from astropy import units as u
+from astropy.coordinates import ICRS
+
+from mapcat import client
+from mapcat.database import DepthOneMapTable, SkyCoverageTable, TODDepthOneTable
+from mapcat.helper import Settings
+
+
+def run_migration(database_path: str):
+    """Run the migration on the database."""
+    from alembic import command
+    from alembic.config import Config
+
+    from mapcat import alembic_location
+
+    alembic_cfg = Config(alembic_location)
+    alembic_cfg.set_main_option("sqlalchemy.url", f"sqlite:///{database_path}")
+    command.upgrade(alembic_cfg, "head")
+
+
+@pytest.fixture(scope="module")
+def client_settings(tmp_path_factory):
+    """Settings pointing at a migrated temporary SQLite database."""
+    database_path = tmp_path_factory.mktemp("mapcat_client") / "test_client.db"
+    run_migration(database_path)
+
+    settings = Settings(database_name=str(database_path))
+
+    with settings.session() as session:
+        maps = [
+            DepthOneMapTable(
+                map_name=f"client_map_{i}",
+                map_path=f"/PATH/TO/client_map_{i}",
+                tube_slot="OTi1",
+                frequency="f090",
+                ctime=1755787524.0 + i,
+                start_time=1755687524.0,
+                stop_time=1755887524.0,
+            )
+            for i in range(3)
+        ]
+        session.add_all(maps)
+        session.add_all(
+            [
+                SkyCoverageTable(map=maps[0], x=12, y=4),
+                SkyCoverageTable(map=maps[1], x=12, y=4),
+            ]
+        )
+        session.add(
+            TODDepthOneTable(
+                obs_id="obs_1755787524_client",
+                ctime=1755787524.0,
+                telescope="lat",
+                tube_slot="i1",
+                frequency="f090",
+                maps=maps[1:],
+            )
+        )
+        session.commit()
+
+    yield settings
+
+    settings.engine.dispose()
+    database_path.unlink()
+
+
+async def test_async_session_is_cached(client_settings):
+    assert client_settings.async_session is client_settings.async_session
+    assert client_settings.async_engine.url.drivername == "sqlite+aiosqlite"
+
+
+async def test_concurrent_queries(client_settings):
+    position = ICRS(125 * u.deg, -45 * u.deg)
+
+    async def coverage():
+        async with client_settings.async_session() as session:
+            return await client.get_maps_by_coverage(position, session)
+
+    async def obs():
+        async with client_settings.async_session() as session:
+            return await client.maps_containing_obs_ids(
+                ["obs_1755787524_client"], session
+            )
+
+    covering, covering_again, by_obs = await asyncio.gather(
+        coverage(), coverage(), obs()
+    )
+
+    assert sorted(m.map_name for m in covering) == ["client_map_0", "client_map_1"]
+    assert [m.map_name for m in covering_again] == [m.map_name for m in covering]
+    assert [m.map_name for m in by_obs["obs_1755787524_client"]] == [
+        "client_map_1",
+        "client_map_2",
+    ]
+
+    async with client_settings.async_session() as session:
+        assert await client.get_maps_by_sky_cells([position], session, order=0) == [[]]
+
+
+async def test_processing_queue(client_settings):
+    async with client_settings.async_session() as session:
+        waiting = await client.get_unprocessed_maps(session)
+        assert [m.map_name for m in waiting] == [f"client_map_{i}" for i in range(3)]
+
+        entry = await client.set_processing_status(
+            waiting[0].map_id, "running", session
+        )
+        assert entry.processing_end is None
+
+        assert len(await client.get_unprocessed_maps(session, limit=5)) == 2
+        running = await client.get_maps_by_processing_status("running", session)
+        assert [m.map_id for m in running] == [waiting[0].map_id]
+
+        entry = await client.set_processing_status(
+            waiting[0].map_id, "completed", session, finished=True
+        )
+        assert entry.processing_end >= entry.processing_start
+
+    async with client_settings.async_session() as session:
+        assert await client.get_maps_by_processing_status("running", session) == []
+        completed = await client.get_maps_by_processing_status("completed", session)
+        assert [m.map_id for m in completed] == [waiting[0].map_id]
+
+    await client_settings.async_engine.dispose()
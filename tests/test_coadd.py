@@ -0,0 +1,194 @@
+"""
+Tests for traversal of the atomic map coadd hierarchy.
+"""
+
+import pytest
+from sqlalchemy import delete, event, func, select
+
+from mapcat.core import (
+    get_atomic_maps_in_coadd,
+    get_coadds_of_atomic_map,
+    get_descendant_coadds,
+)
+from mapcat.core.coadd import _descendants
+from mapcat.database import AtomicMapCoaddTable, AtomicMapTable
+from mapcat.database.links import CoaddMapToCoaddTable
+
+
+def _coadd(name: str, interval: str) -> AtomicMapCoaddTable:
+    return AtomicMapCoaddTable(
+        coadd_name=name,
+        prefix_path=f"/PATH/TO/{name}",
+        platform="satp1",
+        interval=interval,
+        start_time=1755000000.0,
+        stop_time=1756000000.0,
+        freq_channel="f090",
+        geom_file_path="/PATH/TO/GEOM/FILE",
+        split_label="full",
+    )
+
+
+def _atomic(i: int) -> AtomicMapTable:
+    return AtomicMapTable(
+        obs_id=f"obs_{1755000000 + i}_satp1_1111111",
+        telescope="satp1_coadd",
+        freq_channel="f090",
+        wafer="ws0",
+        ctime=1755000000 + i,
+        split_label="full",
+    )
+
+
+@pytest.fixture
+def hierarchy(database_sessionmaker):
+    """
+    A yearly coadd of two weekly coadds, which share one of their three
+    daily coadds; each daily coadd has two atomic maps.
+    """
+    with database_sessionmaker() as session:
+        daily = [_coadd(f"daily_{i}", "daily") for i in range(3)]
+        for i, coadd in enumerate(daily):
+            coadd.atomic_maps = [_atomic(2 * i), _atomic(2 * i + 1)]
+        weekly = [
+            _coadd("weekly_0", "weekly"),
+            _coadd("weekly_1", "weekly"),
+        ]
+        weekly[0].child_coadds = daily[:2]
+        weekly[1].child_coadds = daily[1:]
+        yearly = _coadd("yearly", "yearly")
+        yearly.child_coadds = weekly
+
+        session.add(yearly)
+        session.commit()
+
+        coadds = {c.coadd_name: c.coadd_id for c in [*daily, *weekly, yearly]}
+        atomic_map_ids = [m.atomic_map_id for c in daily for m in c.atomic_maps]
+
+    yield coadds, atomic_map_ids
+
+    with database_sessionmaker() as session:
+        session.execute(
+            delete(AtomicMapTable).where(AtomicMapTable.telescope == "satp1_coadd")
+        )
+        session.execute(
+            delete(AtomicMapCoaddTable).where(
+                AtomicMapCoaddTable.coadd_id.in_(coadds.values())
+            )
+        )
+        session.commit()
+
+
+def test_descendant_coadds(database_sessionmaker, hierarchy):
+    coadds, _ = hierarchy
+
+    with database_sessionmaker() as session:
+        queries = []
+
+        def count(conn, cursor, statement, *args):
+            queries.append(statement)
+
+        event.listen(session.get_bind(), "before_cursor_execute", count)
+        descendants = get_descendant_coadds(coadds["yearly"], session)
+        event.remove(session.get_bind(), "before_cursor_execute", count)
+
+        assert len(queries) == 1
+        assert [c.coadd_name for c in descendants] == [
+            "weekly_0",
+            "weekly_1",
+            "daily_0",
+            "daily_1",
+            "daily_2",
+        ]
+
+        children = get_descendant_coadds(coadds["yearly"], session, max_depth=1)
+        assert [c.coadd_name for c in children] == ["weekly_0", "weekly_1"]
+        assert get_descendant_coadds(coadds["daily_0"], session) == []
+
+        with pytest.raises(ValueError):
+            get_descendant_coadds(coadds["yearly"], session, max_depth=-1)
+
+
+def test_atomic_maps_in_coadd(database_sessionmaker, hierarchy):
+    coadds, atomic_map_ids = hierarchy
+
+    with database_sessionmaker() as session:
+        rows = get_atomic_maps_in_coadd(coadds["yearly"], session)
+        assert [row.atomic_map_id for row in rows] == atomic_map_ids
+
+        rows = get_atomic_maps_in_coadd(coadds["weekly_1"], session)
+        assert [row.atomic_map_id for row in rows] == atomic_map_ids[2:]
+
+        assert get_atomic_maps_in_coadd(coadds["yearly"], session, max_depth=1) == []
+
+        rows = get_atomic_maps_in_coadd(
+            coadds["daily_0"], session, max_depth=0, columns=["obs_id"]
+        )
+        assert [row.obs_id for row in rows] == [
+            "obs_1755000000_satp1_1111111",
+            "obs_1755000001_satp1_1111111",
+        ]
+
+
+def test_coadds_of_atomic_map(database_sessionmaker, hierarchy):
+    _, atomic_map_ids = hierarchy
+
+    with database_sessionmaker() as session:
+        # An atomic map of the shared daily coadd is in both weekly coadds.
+        ancestors = get_coadds_of_atomic_map(atomic_map_ids[2], session)
+        assert [c.coadd_name for c in ancestors] == [
+            "daily_1",
+            "weekly_0",
+            "weekly_1",
+            "yearly",
+        ]
+
+        ancestors = get_coadds_of_atomic_map(atomic_map_ids[0], session, max_depth=2)
+        assert [c.coadd_name for c in ancestors] == ["daily_0", "weekly_0"]
+        assert get_coadds_of_atomic_map(atomic_map_ids[0], session, max_depth=0) == []
+
+
+def test_cycle_terminates(database_sessionmaker, hierarchy):
+    coadds, atomic_map_ids = hierarchy
+
+    with database_sessionmaker() as session:
+        session.add(
+            CoaddMapToCoaddTable(
+                parent_coadd_id=coadds["daily_0"], child_coadd_id=coadds["yearly"]
+            )
+        )
+        session.commit()
+
+        # The cycle leads back to weekly_0, which is not its own descendant.
+        descendants = get_descendant_coadds(coadds["weekly_0"], session)
+        assert sorted(c.coadd_name for c in descendants) == [
+            "daily_0",
+            "daily_1",
+            "daily_2",
+            "weekly_1",
+            "yearly",
+        ]
+
+        rows = get_atomic_maps_in_coadd(coadds["daily_0"], session)
+        assert [row.atomic_map_id for row in rows] == atomic_map_ids
+
+        ancestors = get_coadds_of_atomic_map(atomic_map_ids[0], session)
+        assert [c.coadd_name for c in ancestors] == ["daily_0", "weekly_0", "yearly"]
+
+        # Links back onto the path are not followed, so the traversal does
+        # not depend on the depth limit once it exceeds the hierarchy.
+        for max_depth in (16, 10_000):
+            descendants = get_descendant_coadds(coadds["yearly"], session, max_depth)
+            names = [c.coadd_name for c in descendants]
+            assert sorted(names) == sorted(set(coadds) - {"yearly"})
+
+            tree = _descendants(coadds["yearly"], max_depth)
+            n_rows = session.execute(select(func.count()).select_from(tree)).scalar()
+            assert n_rows == 7
+
+            ancestors = get_coadds_of_atomic_map(atomic_map_ids[0], session, max_depth)
+            assert [c.coadd_name for c in ancestors] == [
+                "daily_0",
+                "weekly_0",
+                "yearly",
+            ]
@@ -0,0 +1,356 @@
+"""
+Tests for sky coverage queries.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.coordinates import ICRS
+from pixell import enmap
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from mapcat import sky
+from mapcat.core import get_maps_by_coverage, get_maps_by_sky_cells
+from mapcat.core.core import _get_maps_by_coverage
+from mapcat.database import DepthOneMapTable, SkyCellRangeTable, SkyCoverageTable
+from mapcat.toolkit import update_sky_coverage
+
+
+def run_migration(database_path: str):
+    """Run the migration on the database."""
+    from alembic import command
+    from alembic.config import Config
+
+    alembic_cfg = Config(str(Path(__file__).parent.parent / "mapcat" / "alembic.ini"))
+    database_url = f"sqlite:///{database_path}"
+    alembic_cfg.set_main_option("sqlalchemy.url", database_url)
+    command.upgrade(alembic_cfg, "head")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database_sessionmaker(tmp_path_factory):
+    """Create a temporary SQLite database for testing."""
+    tmp_path = tmp_path_factory.mktemp("mapcat_coverage")
+    database_path = tmp_path / "test_coverage.db"
+
+    run_migration(database_path)
+
+    database_url = f"sqlite:///{database_path}"
+    engine = create_engine(database_url, echo=False, future=True)
+
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+
+    database_path.unlink()
+
+
+def _make_tmap(observed_box: list[list[float]]) -> enmap.ndmap:
+    """
+    A synthetic time map covering RA 115 to 145 and Dec -52 to -28 (in
+    degrees), observed only in the given [[dec_min, ra_min], [dec_max, ra_max]] box.
+    """
+    shape, wcs = enmap.geometry(
+        pos=np.deg2rad([[-52, 145], [-28, 115]]), res=np.deg2rad(0.1)
+    )
+    tmap = enmap.zeros(shape, wcs)
+    dec, ra = np.rad2deg(tmap.posmap())
+    (dec_min, ra_min), (dec_max, ra_max) = observed_box
+    observed = (dec > dec_min) & (dec < dec_max) & (ra > ra_min) & (ra < ra_max)
+    tmap[observed] = 1755787524.0
+    return tmap
+
+
+def _make_map(
+    session,
+    name: str,
+    tiles: list[tuple[int, int]],
+    footprints: dict[tuple[int, int], bytes] | None = None,
+) -> int:
+    dmap = DepthOneMapTable(
+        map_name=name,
+        map_path=f"/PATH/TO/{name}",
+        tube_slot="OTi1",
+        frequency="f090",
+        ctime=1755787524.0,
+        start_time=1755687524.0,
+        stop_time=1755887524.0,
+    )
+    session.add(dmap)
+    session.commit()
+    footprints = footprints or {}
+    session.add_all(
+        [
+            SkyCoverageTable(
+                map_id=dmap.map_id, x=x, y=y, footprint=footprints.get((x, y))
+            )
+            for x, y in tiles
+        ]
+    )
+    session.commit()
+    return dmap.map_id
+
+
+def test_batched_coverage(database_sessionmaker):
+    with database_sessionmaker() as session:
+        map_a = _make_map(session, "batchCoverageA", [(12, 3), (12, 4)])
+        map_b = _make_map(session, "batchCoverageB", [(12, 4), (13, 4)])
+
+    ras = np.array([125.0, 121.0, 135.0, 5.0, 128.0])
+    decs = np.array([-55.0, -45.0, -42.0, 0.0, -41.0])
+    positions = ICRS(ra=ras * u.deg, dec=decs * u.deg)
+
+    with database_sessionmaker() as session:
+        batched = get_maps_by_coverage(positions, session)
+        from_list = get_maps_by_coverage(
+            [ICRS(ra=r * u.deg, dec=d * u.deg) for r, d in zip(ras, decs)], session
+        )
+
+        assert len(batched) == len(ras)
+        for i, (ra, dec) in enumerate(zip(ras, decs)):
+            single = _get_maps_by_coverage(
+                ICRS(ra=ra * u.deg, dec=dec * u.deg), session
+            )
+            expected = sorted(m.map_id for m in single)
+            assert [m.map_id for m in batched[i]] == expected
+            assert [m.map_id for m in from_list[i]] == expected
+
+    assert [m.map_id for m in batched[0]] == [map_a]
+    assert [m.map_id for m in batched[1]] == [map_a, map_b]
+    assert [m.map_id for m in batched[2]] == [map_b]
+    assert batched[3] == []
+
+    with database_sessionmaker() as session:
+        assert get_maps_by_coverage([], session) == []
+        for map_id in (map_a, map_b):
+            session.delete(session.get(DepthOneMapTable, map_id))
+        session.commit()
+
+
+def test_hit_grid_matches_pixels():
+    tmap = _make_tmap([[-47.3, 121.2], [-33.1, 133.7]])
+
+    grid = update_sky_coverage.get_hit_grid(tmap, 0.5)
+
+    dec, ra = np.rad2deg(tmap.pix2sky(np.array(np.nonzero(tmap))))
+    expected = np.zeros_like(grid)
+    expected[update_sky_coverage.sky_to_cell(ra, dec, 0.5)] = True
+
+    assert np.array_equal(grid, expected)
+
+    # The ACT convention only shifts the RA by 180 degrees.
+    act_grid = update_sky_coverage.get_hit_grid(tmap, 0.5, convention="ACT")
+    assert np.array_equal(act_grid, np.roll(expected, 360, axis=1))
+
+
+def test_strip_read_hit_grids(tmp_path):
+    tmap = _make_tmap([[-47.3, 121.2], [-33.1, 133.7]])
+    path = tmp_path / "tmap.fits"
+    enmap.write_map(str(path), tmap)
+
+    resolutions = [0.5, update_sky_coverage.CELL_RESOLUTION]
+    # A few rows at a time, so runs of rows are split across strips.
+    grids = update_sky_coverage.read_hit_grids(
+        path, resolutions, convention="ACT", strip_pixels=7 * tmap.shape[-1]
+    )
+
+    for grid, res in zip(grids, resolutions):
+        assert np.array_equal(
+            grid, update_sky_coverage.get_hit_grid(tmap, res, convention="ACT")
+        )
+
+    with pytest.raises(ValueError):
+        update_sky_coverage.read_hit_grids(path, resolutions, convention="bad")
+
+
+def test_precise_coverage(database_sessionmaker):
+    # Both maps touch tiles (12, 4) and (13, 4), but only map A observes
+    # the south-west corner of (12, 4).
+    tmap_a = _make_tmap([[-50.0, 120.0], [-30.0, 140.0]])
+    tmap_b = _make_tmap([[-48.0, 127.0], [-30.0, 140.0]])
+
+    with database_sessionmaker() as session:
+        ids = []
+        for name, tmap in (("preciseA", tmap_a), ("preciseB", tmap_b)):
+            footprints = update_sky_coverage.get_sky_footprints(tmap)
+            ids.append(_make_map(session, name, list(footprints), footprints))
+        map_a, map_b = ids
+
+    positions = ICRS(
+        ra=np.array([121.0, 135.0, 132.0]) * u.deg,
+        dec=np.array([-49.0, -35.0, -49.0]) * u.deg,
+    )
+
+    with database_sessionmaker() as session:
+        coarse = get_maps_by_coverage(positions, session)
+        precise = get_maps_by_coverage(positions, session, precise=True)
+        single = get_maps_by_coverage(positions[0], session, precise=True)
+
+        assert [m.map_id for m in coarse[0]] == [map_a, map_b]
+        assert [m.map_id for m in precise[0]] == [map_a]
+        assert [m.map_id for m in precise[1]] == [map_a, map_b]
+        assert [m.map_id for m in precise[2]] == [map_a]
+        assert [m.map_id for m in single] == [map_a]
+
+        for map_id in ids:
+            session.delete(session.get(DepthOneMapTable, map_id))
+        session.commit()
+
+
+def test_nested_cells():
+    ras = np.array([0.0, 121.3, 359.99, 200.0])
+    decs = np.array([-90.0, -45.2, 89.99, 0.01])
+
+    # Order 0 cells are the sky coverage tiles.
+    tiles = sky.sky_to_nested_cell(ras, decs, order=0)
+    expected = update_sky_coverage.dec_to_index(decs) * 36 + (
+        update_sky_coverage.ra_to_index(ras)
+    )
+    assert np.array_equal(tiles, np.minimum(expected, 36 * 18 - 1))
+
+    # Each cell is the parent of the four cells of the next order.
+    for order in range(1, sky.MAX_CELL_ORDER + 1):
+        children = sky.sky_to_nested_cell(ras, decs, order=order)
+        parents = sky.sky_to_nested_cell(ras, decs, order=order - 1)
+        assert np.array_equal(children // 4, parents)
+
+    ranges = sky.cells_to_ranges(np.array([7, 3, 4, 5, 9, 4]))
+    assert ranges.tolist() == [[3, 6], [7, 8], [9, 10]]
+
+
+def test_sky_cell_coverage(database_sessionmaker, tmp_path, monkeypatch):
+    monkeypatch.setattr(update_sky_coverage.settings, "depth_one_parent", tmp_path)
+
+    tmap_a = _make_tmap([[-50.0, 120.0], [-30.0, 140.0]])
+    tmap_b = _make_tmap([[-48.0, 127.0], [-30.0, 140.0]])
+
+    with database_sessionmaker() as session:
+        ids = []
+        for name, tmap in (("cellsA", tmap_a), ("cellsB", tmap_b)):
+            enmap.write_map(str(tmp_path / f"{name}_time.fits"), tmap)
+            dmap = DepthOneMapTable(
+                map_name=name,
+                map_path=f"{name}_map.fits",
+                mean_time_path=f"{name}_time.fits",
+                tube_slot="OTi1",
+                frequency="f090",
+                ctime=1755787524.0,
+                start_time=1755687524.0,
+                stop_time=1755887524.0,
+            )
+            session.add(dmap)
+            session.commit()
+            ids.append(dmap.map_id)
+        map_a, map_b = ids
+
+    update_sky_coverage.core(session=database_sessionmaker)
+
+    with database_sessionmaker() as session:
+        ranges = session.query(SkyCellRangeTable).filter_by(map_id=map_a).all()
+        n_cells = sum(r.cell_end - r.cell_start for r in ranges)
+        # A 20x20 degree box is 128x128 cells at order 6, in far fewer ranges.
+        assert n_cells == 128 * 128
+        assert len(ranges) < 128
+
+        positions = ICRS(
+            ra=np.array([121.0, 135.0, 127.1, 5.0]) * u.deg,
+            dec=np.array([-49.0, -35.0, -45.0, 0.0]) * u.deg,
+        )
+
+        fine = get_maps_by_sky_cells(positions, session)
+        assert [m.map_id for m in fine[0]] == [map_a]
+        assert [m.map_id for m in fine[1]] == [map_a, map_b]
+        assert [m.map_id for m in fine[2]] == [map_a, map_b]
+        assert fine[3] == []
+
+        coarse = get_maps_by_sky_cells(positions, session, order=0)
+        assert [m.map_id for m in coarse[0]] == [map_a, map_b]
+
+        single = get_maps_by_sky_cells(positions[0], session, order=3)
+        assert [m.map_id for m in single] == [map_a]
+
+        with pytest.raises(ValueError):
+            get_maps_by_sky_cells(positions, session, order=-1)
+
+        for map_id in ids:
+            session.delete(session.get(DepthOneMapTable, map_id))
+        session.commit()
+
+
+def test_get_sky_coverage():
+    tmap = _make_tmap([[-47.3, 121.2], [-33.1, 133.7]])
+
+    assert update_sky_coverage.get_sky_coverage(tmap) == [
+        (12, 4),
+        (12, 5),
+        (13, 4),
+        (13, 5),
+    ]
+    assert update_sky_coverage.get_sky_coverage(tmap, convention="ACT") == [
+        (30, 4),
+        (30, 5),
+        (31, 4),
+        (31, 5),
+    ]
+
+    with pytest.raises(ValueError):
+        update_sky_coverage.get_sky_coverage(tmap, convention="bad")
+
+
+def test_parallel_backfill(database_sessionmaker, tmp_path, monkeypatch):
+    monkeypatch.setattr(update_sky_coverage.settings, "depth_one_parent", tmp_path)
+
+    boxes = [
+        [[-50.0, 120.0], [-30.0, 140.0]],
+        [[-48.0, 127.0], [-30.0, 140.0]],
+        [[-45.0, 118.0], [-40.0, 125.0]],
+    ]
+
+    with database_sessionmaker() as session:
+        ids = []
+        for i, box in enumerate(boxes + [None]):
+            name = f"backfill{i}"
+            if box is not None:
+                enmap.write_map(str(tmp_path / f"{name}_time.fits"), _make_tmap(box))
+            dmap = DepthOneMapTable(
+                map_name=name,
+                map_path=f"{name}_map.fits",
+                mean_time_path=f"{name}_time.fits",
+                tube_slot="OTi1",
+                frequency="f090",
+                ctime=1755787524.0,
+                start_time=1755687524.0,
+                stop_time=1755887524.0,
+            )
+            session.add(dmap)
+            session.commit()
+            ids.append(dmap.map_id)
+
+    # The last map has no time map on disk; the maps before it are
+    # committed before the failure.
+    with pytest.raises(FileNotFoundError):
+        update_sky_coverage.core(session=database_sessionmaker, batch_size=1)
+
+    with database_sessionmaker() as session:
+        for map_id in ids[:3]:
+            assert session.query(SkyCoverageTable).filter_by(map_id=map_id).count()
+        session.delete(session.get(DepthOneMapTable, ids[3]))
+        session.query(SkyCoverageTable).filter_by(map_id=ids[0]).delete()
+        session.query(SkyCellRangeTable).filter_by(map_id=ids[1]).delete()
+        session.commit()
+
+    update_sky_coverage.core(session=database_sessionmaker, workers=2, batch_size=2)
+
+    with database_sessionmaker() as session:
+        for map_id, box in zip(ids, boxes):
+            tiles = session.query(SkyCoverageTable).filter_by(map_id=map_id).all()
+            ranges = session.query(SkyCellRangeTable).filter_by(map_id=map_id).all()
+            expected = update_sky_coverage.get_sky_coverage(_make_tmap(box))
+            assert sorted((int(t.x), int(t.y)) for t in tiles) == expected
+            assert all(t.footprint is not None for t in tiles)
+            assert len(ranges) > 0
+
+        for map_id in ids[:3]:
+            session.delete(session.get(DepthOneMapTable, map_id))
+        session.commit()
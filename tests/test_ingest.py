@@ -0,0 +1,280 @@
+"""
+Tests for ACT depth-1 map ingest on a synthetic directory tree.
+"""
+
+import argparse as ap
+from pathlib import Path
+
+import h5py
+import numpy as np
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from mapcat import alembic_location
+from mapcat.database import DepthOneMapTable, TODDepthOneTable
+from mapcat.toolkit import act
+
+
+def make_act_tree(
+    root: Path, n_maps: int, start: int = 0, shared_obs: str | None = None
+) -> list[str]:
+    """
+    Write n_maps fake ACT depth-1 maps below root: empty FITS files and
+    _info.hdf files in the ACT format, optionally all containing the
+    shared_obs observation. Returns the map names.
+    """
+    names = []
+    for i in range(start, start + n_maps):
+        ctime = 1505603190 + 1000 * i
+        subdir = root / str(ctime)[:5]
+        subdir.mkdir(parents=True, exist_ok=True)
+        base = subdir / f"depth1_{ctime}_pa5_f090"
+
+        for suffix in ["map", "ivar", "time"]:
+            Path(f"{base}_{suffix}.fits").touch()
+
+        with h5py.File(f"{base}_info.hdf", "w") as f:
+            f["array"] = np.bytes_("pa5_f090")
+            ids = [f"{ctime + j}.{ctime + j + 600}.ar5:f090" for j in range(2)]
+            if shared_obs is not None:
+                ids.append(shared_obs)
+            f["ids"] = np.array([obs_id.encode() for obs_id in ids])
+            f["period"] = np.array([ctime - 300.0, ctime + 300.0])
+            f["t"] = float(ctime)
+            f["box"] = np.zeros((2, 2))
+
+        names.append(str(base.relative_to(root)))
+
+    return names
+
+
+def test_streaming_ingest(database_sessionmaker, tmp_path):
+    names = make_act_tree(tmp_path, 5)
+    args = ap.Namespace(
+        glob="*/*_map.fits", relative_to=tmp_path, telescope="act", batch_size=2, jobs=1
+    )
+
+    act.core(session=database_sessionmaker, args=args)
+
+    with database_sessionmaker() as session:
+        maps = (
+            session.execute(
+                select(DepthOneMapTable).where(DepthOneMapTable.map_name.in_(names))
+            )
+            .scalars()
+            .all()
+        )
+        assert sorted(m.map_name for m in maps) == sorted(names)
+        assert all(len(m.tods) == 2 for m in maps)
+        assert all(m.mean_time_path is not None for m in maps)
+
+    # Maps that are already ingested are skipped without reading their
+    # info files, so a second run only picks up the new maps.
+    for name in names:
+        (tmp_path / f"{name}_info.hdf").write_bytes(b"not an hdf5 file")
+    new_names = make_act_tree(tmp_path, 2, start=5)
+
+    act.core(session=database_sessionmaker, args=args)
+
+    with database_sessionmaker() as session:
+        maps = (
+            session.execute(
+                select(DepthOneMapTable).where(
+                    DepthOneMapTable.map_name.in_(names + new_names)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        assert len(maps) == 7
+
+        for dmap in maps:
+            session.delete(dmap)
+        session.commit()
+
+
+def test_parallel_ingest(database_sessionmaker, tmp_path, monkeypatch):
+    names = make_act_tree(tmp_path, 6)
+
+    # Small chunks, so that the window of chunks read ahead is refilled.
+    monkeypatch.setattr(act, "READ_CHUNK_SIZE", 1)
+
+    serial = act.glob("*/*_map.fits", tmp_path, "act")
+    parallel = list(act.iter_glob("*/*_map.fits", tmp_path, "act", jobs=2))
+
+    assert [m.map_name for m in parallel] == [m.map_name for m in serial]
+    assert [m.start_time for m in parallel] == [m.start_time for m in serial]
+
+    args = ap.Namespace(
+        glob="*/*_map.fits",
+        relative_to=tmp_path,
+        telescope="act",
+        batch_size=100,
+        jobs=2,
+    )
+    act.core(session=database_sessionmaker, args=args)
+
+    with database_sessionmaker() as session:
+        maps = (
+            session.execute(
+                select(DepthOneMapTable).where(DepthOneMapTable.map_name.in_(names))
+            )
+            .scalars()
+            .all()
+        )
+        assert len(maps) == 6
+        assert all(len(m.tods) == 2 for m in maps)
+
+        for dmap in maps:
+            session.delete(dmap)
+        session.commit()
+
+
+def test_ingest_skips_unreadable_maps(database_sessionmaker, tmp_path, capsys):
+    names = make_act_tree(tmp_path, 4, start=30)
+
+    # One truncated info file and one with a missing dataset.
+    (tmp_path / f"{names[1]}_info.hdf").write_bytes(b"not an hdf5 file")
+    with h5py.File(tmp_path / f"{names[2]}_info.hdf", "a") as f:
+        del f["t"]
+
+    for jobs in (1, 2):
+        errors = []
+        maps = list(
+            act.iter_glob("*/*_map.fits", tmp_path, "act", jobs=jobs, errors=errors)
+        )
+        assert sorted(m.map_name for m in maps) == [names[0], names[3]]
+        assert sorted(base for base, _ in errors) == [
+            str(tmp_path / names[1]),
+            str(tmp_path / names[2]),
+        ]
+
+    args = ap.Namespace(
+        glob="*/*_map.fits",
+        relative_to=tmp_path,
+        telescope="act",
+        batch_size=100,
+        jobs=1,
+    )
+    errors = act.core(session=database_sessionmaker, args=args)
+    assert len(errors) == 2
+    assert "Skipped 2 maps" in capsys.readouterr().out
+
+    # A rerun skips the ingested maps and reports the same unreadable ones.
+    assert act.core(session=database_sessionmaker, args=args) == errors
+
+    with database_sessionmaker() as session:
+        maps = (
+            session.execute(
+                select(DepthOneMapTable).where(DepthOneMapTable.map_name.in_(names))
+            )
+            .scalars()
+            .all()
+        )
+        assert sorted(m.map_name for m in maps) == [names[0], names[3]]
+
+        for dmap in maps:
+            session.delete(dmap)
+        session.commit()
+
+
+def test_tods_shared_between_maps(database_sessionmaker, tmp_path):
+    shared_obs = "1505000000.1505000600.ar5:f090"
+    names = make_act_tree(tmp_path, 3, start=20, shared_obs=shared_obs)
+    args = ap.Namespace(
+        glob="*/*_map.fits", relative_to=tmp_path, telescope="act", batch_size=2, jobs=1
+    )
+
+    act.core(session=database_sessionmaker, args=args)
+    # Maps ingested later reuse the TOD that is already in the database.
+    names += make_act_tree(tmp_path, 1, start=23, shared_obs=shared_obs)
+    act.core(session=database_sessionmaker, args=args)
+
+    with database_sessionmaker() as session:
+        tods = (
+            session.execute(
+                select(TODDepthOneTable).where(TODDepthOneTable.obs_id == shared_obs)
+            )
+            .scalars()
+            .all()
+        )
+        assert len(tods) == 1
+        assert sorted(m.map_name for m in tods[0].maps) == sorted(names)
+
+        for dmap in tods[0].maps:
+            assert len(dmap.tods) == 3
+            session.delete(dmap)
+        session.commit()
+
+
+def test_merge_duplicate_tods_migration(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'duplicates.db'}"
+    alembic_cfg = Config(alembic_location)
+    alembic_cfg.set_main_option("sqlalchemy.url", database_url)
+    command.upgrade(alembic_cfg, "4c151948f163")
+
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        for map_id in (1, 2):
+            connection.execute(
+                text(
+                    "INSERT INTO depth_one_maps (map_id, map_name, map_path, "
+                    "tube_slot, frequency, ctime, start_time, stop_time) "
+                    f"VALUES ({map_id}, 'map{map_id}', 'map{map_id}', "
+                    "'pa5', 'f090', 0, 0, 0)"
+                )
+            )
+        # TODs 1 to 3 are the same observation, TOD 4 is on another tube,
+        # and TODs 5 and 6 are the same observation with no tube.
+        for tod_id, tube_slot in [
+            (1, "'pa5'"),
+            (2, "'pa5'"),
+            (3, "'pa5'"),
+            (4, "'pa6'"),
+            (5, "NULL"),
+            (6, "NULL"),
+        ]:
+            connection.execute(
+                text(
+                    "INSERT INTO tod_depth_one (tod_id, obs_id, ctime, telescope, "
+                    f"tube_slot, frequency) VALUES ({tod_id}, 'obs', 0, 'act', "
+                    f"{tube_slot}, 'f090')"
+                )
+            )
+        for tod_id, map_id in [(1, 1), (2, 1), (3, 2), (4, 2), (5, 1), (6, 2)]:
+            connection.execute(
+                text(
+                    "INSERT INTO link_tod_to_depth_one_map (tod_id, map_id) "
+                    f"VALUES ({tod_id}, {map_id})"
+                )
+            )
+
+    command.upgrade(alembic_cfg, "head")
+
+    with sessionmaker(bind=engine)() as session:
+        tods = session.execute(select(TODDepthOneTable)).scalars().all()
+        assert sorted(tod.tod_id for tod in tods) == [1, 4, 5]
+        assert sorted(m.map_id for m in session.get(TODDepthOneTable, 1).maps) == [
+            1,
+            2,
+        ]
+        assert [m.map_id for m in session.get(TODDepthOneTable, 4).maps] == [2]
+        assert sorted(m.map_id for m in session.get(TODDepthOneTable, 5).maps) == [
+            1,
+            2,
+        ]
+
+    # A missing tube_slot does not let a duplicate TOD in.
+    with pytest.raises(IntegrityError), engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO tod_depth_one (obs_id, ctime, telescope, tube_slot, "
+                "frequency) VALUES ('obs', 0, 'act', NULL, 'f090')"
+            )
+        )
+
+    engine.dispose()
@@ -248,7 +248,7 @@ def test_add_remove_child_tables(database_sessionmaker):
         )
 
         tod = TODDepthOneTable(
-            obs_id="obs_1753486724_lati6_111",
+            obs_id="obs_1753486725_lati6_111",
             pwv=0.7,
             ctime=1755787524.0,
             start_time=1755687524.0,
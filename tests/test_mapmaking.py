@@ -1,3 +1,5 @@
+import pytest
+
 from mapcat.database import DepthOneMapTable, TODDepthOneTable
 from mapcat.toolkit.mapmaking import build_obslists
 
@@ -45,7 +47,7 @@ def test_build_obslists(database_sessionmaker):
 
     # Make some TODs
     obs_ids = [
-        "obs_1753486724_lati6_111",
+        "obs_1753486624_lati6_111",
         "obs_1753586724_lati6_111",
         "obs_1753686724_lati6_111",
         "obs_1753786724_lati6_111",
@@ -166,3 +168,88 @@ def test_build_obslists(database_sessionmaker):
     assert obs_list[0][obs_ids[1]][1].map_id == map_id2
     assert obs_list[0][obs_ids[2]][0].map_id == map_id2
     assert obs_ids[3] in obs_list[1]
+
+
+def test_build_obslists_chunked(database_sessionmaker, monkeypatch):
+    from mapcat.toolkit import mapmaking
+
+    obs_ids = [
+        "obs_1754486624_lati3_111",
+        "obs_1754586724_lati3_111",
+        "obs_1754686724_lati3_111",
+        "obs_1754786724_lati3_111",
+    ]
+
+    with database_sessionmaker() as session:
+        dmaps = [
+            DepthOneMapTable(
+                map_name=f"myChunkedDepthOne{i}",
+                map_path=f"/PATH/TO/CHUNKED/DEPTH/ONE{i}",
+                tube_slot="OTi3",
+                frequency="f090",
+                ctime=1755788524.0 + i,
+                start_time=1755787524.0,
+                stop_time=1755897524.0,
+            )
+            for i in range(2)
+        ]
+        tods = [
+            TODDepthOneTable(
+                obs_id=obs_id,
+                pwv=0.7,
+                ctime=1755787524.0,
+                start_time=1755687524.0,
+                stop_time=1755887524.0,
+                nsamples=28562,
+                telescope="lat",
+                telescope_flavor="lat",
+                tube_slot="i3",
+                tube_flavor="mf",
+                frequency="150",
+                scan_type="ops",
+                subtype="cmb",
+                wafer_count=3,
+                duration=100000,
+                az_center=180.0,
+                az_throw=90.0,
+                el_center=50.0,
+                el_throw=0.0,
+                roll_center=0.0,
+                roll_throw=0.0,
+                wafer_slots_list="ws0,ws1,ws2",
+                stream_ids_list="ufm_mv25,ufm_mv26,ufm_mv11",
+                maps=maps,
+            )
+            for obs_id, maps in zip(
+                obs_ids, [[dmaps[0]], dmaps, [dmaps[1]], []], strict=True
+            )
+        ]
+        session.add_all(dmaps + tods)
+        session.commit()
+
+        map_ids = [m.map_id for m in dmaps]
+        tod_ids = [t.tod_id for t in tods]
+
+    with database_sessionmaker() as session:
+        expected = build_obslists(obs_ids=obs_ids, session=session)
+
+    # One obs_id per query gives the same answer.
+    monkeypatch.setattr(mapmaking, "OBS_ID_CHUNK_SIZE", 1)
+    with database_sessionmaker() as session:
+        map_dict, missing = build_obslists(obs_ids=obs_ids, session=session)
+
+    assert missing == expected[1] == [obs_ids[3]]
+    assert {obs_id: [m.map_id for m in maps] for obs_id, maps in map_dict.items()} == {
+        obs_id: [m.map_id for m in maps] for obs_id, maps in expected[0].items()
+    }
+    assert [m.map_id for m in map_dict[obs_ids[1]]] == map_ids
+
+    with pytest.raises(ValueError), database_sessionmaker() as session:
+        build_obslists(obs_ids=["obs_0000000000_unknown"], session=session)
+
+    with database_sessionmaker() as session:
+        for tod_id in tod_ids:
+            session.delete(session.get(TODDepthOneTable, tod_id))
+        for map_id in map_ids:
+            session.delete(session.get(DepthOneMapTable, map_id))
+        session.commit()
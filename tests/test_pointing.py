@@ -3,13 +3,29 @@ Tests for the pointing residual models.
 """
 
 import numpy as np
+import pytest
 from astropy import units as u
 from astropy.coordinates import SkyCoord
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import StatementError
 from sqlmodel import select
 
+from mapcat.core import (
+    correct_positions,
+    fit_time_dependent_model,
+    get_pointing_models,
+)
 from mapcat.database import DepthOneMapTable, PointingResidualTable
+from mapcat.database.json import (
+    JSONEncodedPydantic,
+    LazyPydanticModel,
+    json_decode_mode,
+)
+from mapcat.pointing.base import PointingModelStats
 from mapcat.pointing.const import ConstantPointingModel
 from mapcat.pointing.poly import PolynomialPointingModel
+from mapcat.pointing.time_dependent import TimeDependentPointingModel
 
 
 def test_add_retrieve_pointing(database_sessionmaker):
@@ -99,3 +115,415 @@ def test_make_polynomial_pointing_model():
             predicted_pos.dec.to_value(u.arcmin), decs.to_value(u.arcmin), atol=0.1
         )
     )
+
+
+def test_polynomial_predict_arrays():
+    rng = np.random.default_rng(3)
+    ras = rng.uniform(0, 10, 50) * u.deg
+    decs = rng.uniform(-5, 5, 50) * u.deg
+    measured = SkyCoord(ra=ras + 0.01 * ras, dec=decs + 1 * u.arcmin)
+
+    model = PolynomialPointingModel(poly_order=2)
+    model.build_model(
+        measured_positions=measured, expected_positions=SkyCoord(ras, decs)
+    )
+
+    ra, dec = model.predict_arrays(
+        measured.ra.to_value(u.deg), measured.dec.to_value(u.deg)
+    )
+    predicted = model.predict(measured)
+    assert np.allclose(ra, predicted.ra.to_value(u.deg))
+    assert np.allclose(dec, predicted.dec.to_value(u.deg))
+    assert np.allclose(ra, ras.to_value(u.deg), atol=1e-6)
+
+    # Scalars keep their shape.
+    ra, dec = model.predict_arrays(5.0, 0.0)
+    assert np.shape(ra) == () and np.shape(dec) == ()
+
+    # Cached coefficients follow a rebuilt model.
+    racoeffs, _ = model.extract_coefficients()
+    assert model.extract_coefficients()[0] is racoeffs
+    model.build_model(
+        measured_positions=SkyCoord(ras, decs), expected_positions=measured
+    )
+    assert model.extract_coefficients()[0] is not racoeffs
+    assert np.isclose(model.extract_coefficients()[1][0], -1 / 60)
+
+    constant = ConstantPointingModel(ra_offset=0.5 * u.deg, dec_offset=0.5 * u.deg)
+    ra, dec = constant.predict_arrays(np.array([0.25, 10.0]), np.array([1.0, 2.0]))
+    assert np.allclose(ra, [359.75, 9.5])
+    assert np.allclose(dec, [0.5, 1.5])
+
+
+def test_correct_positions(database_sessionmaker):
+    with database_sessionmaker() as session:
+        maps = [
+            DepthOneMapTable(
+                map_name=f"BatchPointingMap{i}",
+                map_path=f"DoesntExist/BatchMap{i}",
+                tube_slot="i1",
+                frequency="f090",
+                ctime=1755787524.0,
+                start_time=1755687524.0,
+                stop_time=1755887524.0,
+            )
+            for i in range(3)
+        ]
+        session.add_all(maps)
+        session.commit()
+        map_ids = [m.map_id for m in maps]
+
+        poly = PolynomialPointingModel(poly_order=1)
+        ras = np.linspace(0, 10, 20) * u.deg
+        decs = np.linspace(-5, 5, 20) * u.deg
+        poly.build_model(
+            measured_positions=SkyCoord(ra=ras + 0.1 * u.deg, dec=decs),
+            expected_positions=SkyCoord(ra=ras, dec=decs),
+        )
+
+        # The latest residual of the first map supersedes the earlier one.
+        session.add_all(
+            [
+                PointingResidualTable(
+                    map_id=map_ids[0],
+                    residual_model=ConstantPointingModel(
+                        ra_offset=1 * u.deg, dec_offset=1 * u.deg
+                    ),
+                ),
+                PointingResidualTable(
+                    map_id=map_ids[0],
+                    residual_model=ConstantPointingModel(
+                        ra_offset=0.5 * u.deg, dec_offset=-0.5 * u.deg
+                    ),
+                ),
+                PointingResidualTable(map_id=map_ids[1], residual_model=poly),
+            ]
+        )
+        session.commit()
+
+        source_maps = np.array([map_ids[1], map_ids[0], map_ids[2], map_ids[0]])
+        ra = np.array([5.1, 10.0, 20.0, 0.25])
+        dec = np.array([0.0, 1.0, 2.0, 3.0])
+
+        new_ra, new_dec = correct_positions(source_maps, ra, dec, session)
+        assert np.allclose(new_ra, [5.0, 9.5, 20.0, 359.75])
+        assert np.allclose(new_dec, [0.0, 1.5, 2.0, 3.5])
+        assert ra[1] == pytest.approx(10.0)
+
+        with pytest.raises(ValueError):
+            correct_positions(source_maps, ra, dec, session, strict=True)
+        with pytest.raises(ValueError):
+            correct_positions(source_maps[:2], ra, dec, session)
+
+        for m in maps:
+            session.delete(m)
+        session.commit()
+
+
+@pytest.mark.parametrize("robust", ["sigma_clip", "huber"])
+def test_robust_polynomial_fit(robust):
+    rng = np.random.default_rng(5)
+    ras = rng.uniform(0, 10, 100) * u.deg
+    decs = rng.uniform(-5, 5, 100) * u.deg
+    true_ra_offset = 1 * u.arcmin + 0.05 * u.arcmin / u.deg * ras
+    ra_offsets = true_ra_offset + rng.normal(0, 1, 100) * u.arcsec
+    dec_offsets = -0.5 * u.arcmin + rng.normal(0, 1, 100) * u.arcsec
+
+    # A tenth of the sources are badly misidentified.
+    ra_offsets[:10] += 1 * u.deg
+    dec_offsets[:10] -= 0.5 * u.deg
+
+    expected = SkyCoord(ra=ras, dec=decs)
+    measured = SkyCoord(ra=ras + ra_offsets, dec=decs + dec_offsets)
+
+    plain = PolynomialPointingModel(poly_order=1)
+    plain.build_model(measured_positions=measured, expected_positions=expected)
+    model = PolynomialPointingModel(poly_order=1)
+    model.build_model(
+        measured_positions=measured, expected_positions=expected, robust=robust
+    )
+
+    # Compare the corrections with the noiseless offsets of the clean sources.
+    clean = measured[10:]
+    ra, dec = model.predict_arrays(clean.ra.to_value(u.deg), clean.dec.to_value(u.deg))
+    ra_correction = (clean.ra.to_value(u.deg) - ra) * 3600
+    dec_correction = (clean.dec.to_value(u.deg) - dec) * 3600
+    assert np.allclose(ra_correction, true_ra_offset[10:].to_value(u.arcsec), atol=0.5)
+    assert np.allclose(dec_correction, -30, atol=0.5)
+
+    ra, _ = plain.predict_arrays(clean.ra.to_value(u.deg), clean.dec.to_value(u.deg))
+    ra_correction = (clean.ra.to_value(u.deg) - ra) * 3600
+    assert not np.allclose(
+        ra_correction, true_ra_offset[10:].to_value(u.arcsec), atol=0.5
+    )
+
+    n_sources = model.calculate_statistics(measured).n_sources
+    if robust == "sigma_clip":
+        assert 85 <= n_sources <= 90
+    else:
+        assert n_sources < 90
+    assert plain.calculate_statistics(measured).n_sources == 100
+
+    with pytest.raises(ValueError):
+        model.build_model(
+            measured_positions=measured, expected_positions=expected, robust="l1"
+        )
+
+
+def test_time_dependent_pointing_model():
+    ctimes = np.linspace(1755000000, 1756000000, 40)
+    t = (ctimes - 1755000000) / 1e6
+    ra_offsets = (1 + 0.5 * t - 0.3 * t**2) * u.arcmin
+    dec_offsets = (-0.2 + 0.1 * t) * u.arcmin
+
+    model = TimeDependentPointingModel(poly_order=2)
+    model.build_model(ctimes, ra_offsets, dec_offsets)
+
+    ra_offset, dec_offset = model.offsets(ctimes)
+    assert np.allclose(ra_offset, ra_offsets.to_value(u.deg))
+    assert np.allclose(dec_offset, dec_offsets.to_value(u.deg))
+
+    # Offsets are held constant outside the fitted time range.
+    assert np.allclose(model.offsets(1700000000.0), model.offsets(ctimes[0]))
+
+    # One time per position, or a model fixed to the time of a map.
+    ra, dec = model.predict_arrays(np.full(40, 10.0), np.zeros(40), ctime=ctimes)
+    assert np.allclose(ra, 10.0 - ra_offsets.to_value(u.deg))
+    assert np.allclose(dec, -dec_offsets.to_value(u.deg))
+
+    pos = model.at(ctimes[5]).predict(SkyCoord(ra=10 * u.deg, dec=0 * u.deg))
+    assert np.isclose(pos.ra.to_value(u.deg), ra[5])
+
+    with pytest.raises(ValueError):
+        model.predict(SkyCoord(ra=10 * u.deg, dec=0 * u.deg))
+
+
+def test_fit_time_dependent_model(database_sessionmaker):
+    ctimes = 1757000000.0 + 86400.0 * np.arange(10)
+    with database_sessionmaker() as session:
+        maps = [
+            DepthOneMapTable(
+                map_name=f"TimeDependentMap{i}",
+                map_path=f"DoesntExist/TimeDependentMap{i}",
+                tube_slot="i6",
+                frequency="f220",
+                ctime=ctime,
+                start_time=ctime - 1000,
+                stop_time=ctime + 1000,
+            )
+            for i, ctime in enumerate(ctimes)
+        ]
+        session.add_all(maps)
+        session.commit()
+
+        session.add_all(
+            PointingResidualTable(
+                map_id=m.map_id,
+                residual_model=ConstantPointingModel(
+                    ra_offset=0 * u.deg, dec_offset=0 * u.deg
+                ),
+                residual_stats=PointingModelStats(
+                    mean_ra_offset=-(10 + i) * u.arcsec,
+                    mean_dec_offset=5 * u.arcsec,
+                    stddev_ra_offset=2 * u.arcsec,
+                    stddev_dec_offset=2 * u.arcsec,
+                    n_sources=20,
+                ),
+            )
+            for i, m in enumerate(maps)
+        )
+        session.commit()
+
+        model = fit_time_dependent_model(
+            session, poly_order=1, tube_slot="i6", frequency="f220"
+        )
+        ra_offset, dec_offset = model.offsets(ctimes[[0, 9]])
+        assert np.allclose(ra_offset * 3600, [10, 19])
+        assert np.allclose(dec_offset * 3600, [-5, -5])
+
+        # The fitted model can be stored like any other residual model.
+        session.add(PointingResidualTable(map_id=maps[0].map_id, residual_model=model))
+        session.commit()
+
+    with database_sessionmaker() as session:
+        models = get_pointing_models([maps[0].map_id], session)
+        assert isinstance(models[maps[0].map_id], TimeDependentPointingModel)
+
+        with pytest.raises(ValueError):
+            fit_time_dependent_model(session, poly_order=1, tube_slot="c9")
+
+        for m in maps:
+            session.delete(session.get(DepthOneMapTable, m.map_id))
+        session.commit()
+
+
+def test_fit_time_dependent_model_from_statistics(database_sessionmaker):
+    # Stats computed by per-map fits, so the fit must get their sign right.
+    rng = np.random.default_rng(7)
+    ctimes = 1758000000.0 + 86400.0 * np.arange(6)
+    ra_offsets = (20.0 + 2.0 * np.arange(6)) * u.arcsec
+    dec_offsets = -8.0 * np.ones(6) * u.arcsec
+
+    ra_true = rng.uniform(10, 20, 50)
+    dec_true = rng.uniform(-5, 5, 50)
+    expected = SkyCoord(ra=ra_true * u.deg, dec=dec_true * u.deg)
+
+    with database_sessionmaker() as session:
+        maps = [
+            DepthOneMapTable(
+                map_name=f"StatisticsMap{i}",
+                map_path=f"DoesntExist/StatisticsMap{i}",
+                tube_slot="i5",
+                frequency="f150",
+                ctime=ctime,
+                start_time=ctime - 1000,
+                stop_time=ctime + 1000,
+            )
+            for i, ctime in enumerate(ctimes)
+        ]
+        session.add_all(maps)
+        session.commit()
+
+        for m, ra_offset, dec_offset in zip(maps, ra_offsets, dec_offsets):
+            noise = rng.normal(0, 1, (2, 50)) * u.arcsec
+            measured = SkyCoord(
+                ra=expected.ra + ra_offset + noise[0],
+                dec=expected.dec + dec_offset + noise[1],
+            )
+            per_map = PolynomialPointingModel(poly_order=0)
+            per_map.build_model(
+                measured_positions=measured, expected_positions=expected
+            )
+            session.add(
+                PointingResidualTable(
+                    map_id=m.map_id,
+                    residual_model=per_map,
+                    residual_stats=per_map.calculate_statistics(measured),
+                )
+            )
+        session.commit()
+
+        model = fit_time_dependent_model(session, poly_order=1, tube_slot="i5")
+        for mode in ("lazy", "raw"):
+            with json_decode_mode(mode):
+                refit = fit_time_dependent_model(session, poly_order=1, tube_slot="i5")
+            assert refit.ra_coefficients == model.ra_coefficients
+
+        ra_offset, dec_offset = model.offsets(ctimes)
+        assert np.allclose(ra_offset * 3600, ra_offsets.to_value(u.arcsec), atol=0.5)
+        assert np.allclose(dec_offset * 3600, dec_offsets.to_value(u.arcsec), atol=0.5)
+
+        # Stored without a ctime, the model corrects each map at its own
+        # ctime, bringing measured positions back to the true ones.
+        assert model.ctime is None
+        session.add_all(
+            PointingResidualTable(map_id=m.map_id, residual_model=model) for m in maps
+        )
+        session.commit()
+
+        map_ids = np.repeat([maps[1].map_id, maps[4].map_id], 50)
+        ra_measured = np.tile(ra_true, 2) + np.repeat(
+            ra_offsets[[1, 4]].to_value(u.deg), 50
+        )
+        dec_measured = np.tile(dec_true, 2) + np.repeat(
+            dec_offsets[[1, 4]].to_value(u.deg), 50
+        )
+
+        # The helpers validate the models whatever the decode mode.
+        for mode in ("validate", "lazy", "raw"):
+            with json_decode_mode(mode):
+                ra, dec = correct_positions(map_ids, ra_measured, dec_measured, session)
+            assert np.allclose(ra, np.tile(ra_true, 2), atol=0.5 / 3600)
+            assert np.allclose(dec, np.tile(dec_true, 2), atol=0.5 / 3600)
+
+        for m in maps:
+            session.delete(session.get(DepthOneMapTable, m.map_id))
+        session.commit()
+
+
+def test_json_decode_modes(database_sessionmaker):
+    model = ConstantPointingModel(ra_offset=1 * u.arcsec, dec_offset=2 * u.arcsec)
+
+    with database_sessionmaker() as session:
+        sample_map = DepthOneMapTable(
+            map_name="DecodeModeTestMap",
+            map_path="DoesntExist/DecodeModeMap",
+            tube_slot="i1",
+            frequency="f090",
+            ctime=1755787524.0,
+            start_time=1755687524.0,
+            stop_time=1755887524.0,
+        )
+        session.add(sample_map)
+        session.commit()
+        session.refresh(sample_map)
+        map_id = sample_map.map_id
+
+        session.add(
+            PointingResidualTable(
+                map_id=map_id,
+                residual_model=model,
+                residual_stats=PointingModelStats(n_sources=7),
+            )
+        )
+        session.commit()
+
+    stmt = select(
+        PointingResidualTable.residual_model, PointingResidualTable.residual_stats
+    ).where(PointingResidualTable.map_id == map_id)
+
+    with database_sessionmaker() as session:
+        with json_decode_mode("raw"):
+            raw_model, raw_stats = session.execute(stmt).one()
+        assert isinstance(raw_model, dict)
+        assert raw_model["model_type"] == "constant"
+        assert raw_stats["n_sources"] == 7
+
+        with json_decode_mode("lazy"):
+            lazy_model, lazy_stats = session.execute(stmt).one()
+        assert isinstance(lazy_model, LazyPydanticModel)
+        assert lazy_model._model is None
+        assert lazy_stats.n_sources == 7
+        assert lazy_model.ra_offset.to_value(u.arcsec) == pytest.approx(1)
+        assert isinstance(lazy_model.model, ConstantPointingModel)
+        assert lazy_model == model
+
+        # Outside of the block, the column decodes to validated models again.
+        validated_model, _ = session.execute(stmt).one()
+        assert isinstance(validated_model, ConstantPointingModel)
+
+        # Raw dictionaries are validated before they are written, while
+        # unvalidated proxies loaded from the column are written as they are.
+        session.add(
+            PointingResidualTable(
+                map_id=map_id,
+                residual_model=raw_model,
+                residual_stats=LazyPydanticModel(raw_stats, lazy_stats._adapter),
+            )
+        )
+        session.commit()
+
+        models = session.execute(stmt).all()
+        assert len(models) == 2
+        assert all(m == model for m, _ in models)
+        assert all(s.n_sources == 7 for _, s in models)
+
+        invalid = dict(raw_model, model_type="polynomial_typo")
+        session.add(PointingResidualTable(map_id=map_id, residual_model=invalid))
+        with pytest.raises(StatementError, match="validation error"):
+            session.commit()
+        session.rollback()
+        assert len(session.execute(stmt).all()) == 2
+
+        with pytest.raises(ValueError), json_decode_mode("eager"):
+            pass
+
+        session.delete(session.get(DepthOneMapTable, map_id))
+        session.commit()
+
+
+def test_json_column_is_jsonb_on_postgresql():
+    column_type = JSONEncodedPydantic(PointingModelStats)
+
+    assert isinstance(column_type.load_dialect_impl(postgresql.dialect()), JSONB)
+    assert not isinstance(column_type.load_dialect_impl(sqlite.dialect()), JSONB)
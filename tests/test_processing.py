@@ -0,0 +1,140 @@
+"""
+Tests for the processing work queue (mapcat/toolkit/processing.py).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from mapcat.database import DepthOneMapTable, TimeDomainProcessingTable
+from mapcat.toolkit.processing import claim_next_maps, complete_maps, fail_maps
+
+
+def run_migration(database_path: str):
+    """Run the migration on the database."""
+    from alembic import command
+    from alembic.config import Config
+
+    from mapcat import alembic_location
+
+    alembic_cfg = Config(alembic_location)
+    alembic_cfg.set_main_option("sqlalchemy.url", f"sqlite:///{database_path}")
+    command.upgrade(alembic_cfg, "head")
+
+
+@pytest.fixture
+def database_sessionmaker(tmp_path):
+    """A temporary SQLite database with ten unprocessed maps."""
+    database_path = tmp_path / "test_processing.db"
+    run_migration(database_path)
+
+    engine = create_engine(f"sqlite:///{database_path}", future=True)
+    session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    with session() as s:
+        s.add_all(
+            DepthOneMapTable(
+                map_name=f"queue_map_{i}",
+                map_path=f"/path/queue_map_{i}_map.fits",
+                tube_slot="OTi1",
+                frequency="f090",
+                ctime=1755000000.0 + i,
+                start_time=1755000000.0 + i,
+                stop_time=1755000000.0 + i,
+            )
+            for i in range(10)
+        )
+        s.commit()
+
+    yield session
+
+    engine.dispose()
+
+
+def _statuses(session) -> dict[int, tuple[str, str]]:
+    with session() as s:
+        return {
+            entry.map_id: (entry.processing_status, entry.worker_id)
+            for entry in s.execute(select(TimeDomainProcessingTable)).scalars()
+        }
+
+
+def test_claim_complete_fail(database_sessionmaker):
+    claimed = claim_next_maps(database_sessionmaker, 3, "worker-a")
+    map_ids = [m.map_id for m in claimed]
+    assert [m.map_name for m in claimed] == [f"queue_map_{i}" for i in range(3)]
+
+    assert _statuses(database_sessionmaker) == dict.fromkeys(
+        map_ids, ("running", "worker-a")
+    )
+
+    # Only the worker holding the claim can finish it.
+    assert complete_maps(database_sessionmaker, map_ids[:1], "worker-b") == 0
+    assert complete_maps(database_sessionmaker, map_ids[:1], "worker-a") == 1
+    assert fail_maps(database_sessionmaker, map_ids[1:2], "worker-a") == 1
+    assert fail_maps(database_sessionmaker, map_ids[2:], "worker-a", permanent=True)
+
+    # New maps come first, then the failed one; completed and permafail
+    # maps are never handed out again.
+    claimed = claim_next_maps(database_sessionmaker, 10, "worker-b")
+    assert [m.map_id for m in claimed][-1] == map_ids[1]
+    assert len(claimed) == 8
+
+    statuses = _statuses(database_sessionmaker)
+    assert statuses[map_ids[0]] == ("completed", "worker-a")
+    assert statuses[map_ids[1]] == ("running", "worker-b")
+    assert statuses[map_ids[2]] == ("permafail", "worker-a")
+
+    assert claim_next_maps(database_sessionmaker, 10, "worker-c") == []
+
+
+def test_stale_claims(database_sessionmaker):
+    claimed = claim_next_maps(database_sessionmaker, 10, "worker-a")
+    assert len(claimed) == 10
+
+    assert claim_next_maps(database_sessionmaker, 2, "worker-b") == []
+
+    reclaimed = claim_next_maps(database_sessionmaker, 2, "worker-b", stale_after=-1)
+    assert [m.map_id for m in reclaimed] == [m.map_id for m in claimed[:2]]
+
+    # The original worker lost its claim.
+    assert complete_maps(database_sessionmaker, [claimed[0].map_id], "worker-a") == 0
+
+
+def test_latest_status_decides_retry(database_sessionmaker):
+    map_ids = [m.map_id for m in claim_next_maps(database_sessionmaker, 10, "a")]
+    fail_maps(database_sessionmaker, map_ids[:3], "a")
+
+    # Map 0 failed and was then completed; map 1 has failed twice.
+    with database_sessionmaker() as s:
+        s.add_all(
+            [
+                TimeDomainProcessingTable(
+                    map_id=map_ids[0], processing_status="completed", worker_id="b"
+                ),
+                TimeDomainProcessingTable(
+                    map_id=map_ids[1], processing_status="failed", worker_id="b"
+                ),
+            ]
+        )
+        s.commit()
+
+    claimed = claim_next_maps(database_sessionmaker, 2, "worker-c")
+    assert [m.map_id for m in claimed] == map_ids[1:3]
+
+    assert claim_next_maps(database_sessionmaker, 10, "worker-d") == []
+
+
+def test_concurrent_claims(database_sessionmaker):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(
+            executor.map(
+                lambda worker: claim_next_maps(database_sessionmaker, 3, worker),
+                [f"worker-{i}" for i in range(4)],
+            )
+        )
+
+    map_ids = [m.map_id for claimed in results for m in claimed]
+    assert len(map_ids) == len(set(map_ids)) == 10
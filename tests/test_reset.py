@@ -5,10 +5,16 @@ Tests for the mapcatreset CLI (mapcat/toolkit/reset.py).
 import argparse
 
 import pytest
+from astropy import units as u
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from mapcat.database import DepthOneMapTable, TimeDomainProcessingTable
+from mapcat.database import (
+    DepthOneMapTable,
+    PointingResidualTable,
+    TimeDomainProcessingTable,
+)
+from mapcat.pointing.const import ConstantPointingModel
 from mapcat.toolkit.reset import VALID_STATUSES, core
 
 
@@ -97,6 +103,7 @@ def test_reset_all_to_failed(database_sessionmaker):
         start_time=None,
         end_time=None,
         from_status=None,
+        dry_run=False,
     )
     core(session=database_sessionmaker, args=args)
 
@@ -119,6 +126,7 @@ def test_reset_by_map_id(database_sessionmaker):
         start_time=None,
         end_time=None,
         from_status=None,
+        dry_run=False,
     )
     core(session=database_sessionmaker, args=args)
 
@@ -144,6 +152,7 @@ def test_reset_by_time_range(database_sessionmaker):
         start_time=1753000000.0,
         end_time=1755000000.0,
         from_status=None,
+        dry_run=False,
     )
     core(session=database_sessionmaker, args=args)
 
@@ -169,6 +178,7 @@ def test_reset_by_from_status(database_sessionmaker):
         start_time=None,
         end_time=None,
         from_status="running",
+        dry_run=False,
     )
     core(session=database_sessionmaker, args=args)
 
@@ -191,6 +201,7 @@ def test_remove_entries_no_status(database_sessionmaker):
         start_time=None,
         end_time=None,
         from_status=None,
+        dry_run=False,
     )
     core(session=database_sessionmaker, args=args)
 
@@ -209,6 +220,7 @@ def test_permafail_status(database_sessionmaker):
         start_time=None,
         end_time=None,
         from_status=None,
+        dry_run=False,
     )
     core(session=database_sessionmaker, args=args)
 
@@ -232,6 +244,7 @@ def test_combined_filters(database_sessionmaker):
         start_time=None,
         end_time=None,
         from_status="running",
+        dry_run=False,
     )
     core(session=database_sessionmaker, args=args)
 
@@ -240,3 +253,61 @@ def test_combined_filters(database_sessionmaker):
 
     assert proc_a.processing_status == "failed"
     assert proc_b.processing_status == "running"
+
+
+def _make_residual(session, map_id):
+    """Helper to insert a PointingResidualTable row and return its id."""
+    with session() as s:
+        residual = PointingResidualTable(
+            map_id=map_id,
+            residual_model=ConstantPointingModel(
+                ra_offset=0.1 * u.deg, dec_offset=0.1 * u.deg
+            ),
+        )
+        s.add(residual)
+        s.commit()
+        s.refresh(residual)
+        return residual.pointing_residual_id
+
+
+def test_dry_run_and_counts(database_sessionmaker):
+    """A dry run only counts; the real run reports the same counts."""
+    map_ids = [
+        _make_map(database_sessionmaker, f"reset_dry_{i}", 1757000000.0 + i)
+        for i in range(3)
+    ]
+    proc_ids = [
+        _make_proc(database_sessionmaker, map_id, status)
+        for map_id, status in zip(map_ids, ["bad", "bad", "fine"])
+    ]
+    residual_ids = [_make_residual(database_sessionmaker, m) for m in map_ids]
+
+    args = argparse.Namespace(
+        status=None,
+        map_id=None,
+        start_time=1757000000.0,
+        end_time=1757000010.0,
+        from_status="bad",
+        dry_run=True,
+    )
+    assert core(session=database_sessionmaker, args=args) == {
+        "processing": 2,
+        "pointing_residuals": 2,
+    }
+    assert all(_get_proc(database_sessionmaker, p) is not None for p in proc_ids)
+
+    args.dry_run = False
+    assert core(session=database_sessionmaker, args=args) == {
+        "processing": 2,
+        "pointing_residuals": 2,
+    }
+
+    assert _get_proc(database_sessionmaker, proc_ids[0]) is None
+    assert _get_proc(database_sessionmaker, proc_ids[1]) is None
+    assert _get_proc(database_sessionmaker, proc_ids[2]) is not None
+
+    with database_sessionmaker() as s:
+        remaining = [
+            r for r in residual_ids if s.get(PointingResidualTable, r) is not None
+        ]
+    assert remaining == [residual_ids[2]]
@@ -0,0 +1,113 @@
+"""
+Tests for the engine settings in mapcat.helper.
+"""
+
+import pytest
+from sqlalchemy import NullPool, text
+from sqlalchemy.exc import OperationalError
+
+from mapcat.helper import Settings
+
+
+def test_postgresql_engine_kwargs():
+    settings = Settings(
+        database_type="postgresql",
+        database_name="user:password@localhost:5432/mapcat",
+        pool_size=2,
+        max_overflow=3,
+        pool_recycle=600,
+        pool_pre_ping=True,
+        statement_timeout=1.5,
+    )
+
+    kwargs = settings._engine_kwargs()
+    assert kwargs["pool_size"] == 2
+    assert kwargs["max_overflow"] == 3
+    assert kwargs["pool_recycle"] == 600
+    assert kwargs["pool_pre_ping"]
+    assert kwargs["connect_args"] == {"options": "-c statement_timeout=1500"}
+
+    kwargs = settings._engine_kwargs(asynchronous=True)
+    assert kwargs["connect_args"] == {"server_settings": {"statement_timeout": "1500"}}
+
+
+def test_null_pool_engine_kwargs():
+    settings = Settings(
+        database_type="postgresql",
+        database_name="user:password@localhost:5432/mapcat",
+        null_pool=True,
+    )
+
+    kwargs = settings._engine_kwargs(asynchronous=True)
+    assert kwargs["poolclass"] is NullPool
+    assert "pool_size" not in kwargs
+    assert kwargs["connect_args"] == {"statement_cache_size": 0}
+
+
+def test_settings_from_environment(monkeypatch):
+    monkeypatch.setenv("MAPCAT_POOL_SIZE", "7")
+    monkeypatch.setenv("MAPCAT_NULL_POOL", "true")
+
+    settings = Settings()
+    assert settings.pool_size == 7
+    assert settings.null_pool
+
+
+def test_dispose_engines(tmp_path):
+    settings = Settings(database_name=str(tmp_path / "dispose.db"), pool_pre_ping=True)
+    engine = settings.engine
+    session = settings.session
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    pool = engine.pool
+
+    settings.dispose_engines()
+
+    assert settings.engine is engine
+    assert settings.session is session
+    assert engine.pool is not pool
+    with session() as cur_session:
+        assert cur_session.execute(text("SELECT 1")).scalar_one() == 1
+
+    engine.dispose()
+
+
+def test_sqlite_profile(tmp_path):
+    settings = Settings(database_name=str(tmp_path / "profile.db"))
+
+    with settings.engine.connect() as connection:
+        expected = {
+            "journal_mode": "wal",
+            "synchronous": 1,
+            "busy_timeout": 30_000,
+            "cache_size": -64 * 1024,
+        }
+        for name, value in expected.items():
+            assert connection.exec_driver_sql(f"PRAGMA {name}").scalar() == value
+
+        connection.execute(text("CREATE TABLE maps (name TEXT)"))
+        connection.execute(text("INSERT INTO maps VALUES ('a')"))
+        connection.commit()
+
+    settings.engine.dispose()
+
+    read_only = Settings(database_name=str(tmp_path / "profile.db"), read_only=True)
+    assert "immutable=1" in read_only.sync_database_url
+
+    with read_only.engine.connect() as connection:
+        assert connection.execute(text("SELECT name FROM maps")).scalar() == "a"
+        with pytest.raises(OperationalError):
+            connection.execute(text("INSERT INTO maps VALUES ('b')"))
+
+    read_only.engine.dispose()
+
+
+async def test_async_sqlite_profile(tmp_path):
+    settings = Settings(database_name=str(tmp_path / "async_profile.db"))
+
+    async with settings.async_engine.connect() as connection:
+        result = await connection.exec_driver_sql("PRAGMA journal_mode")
+        assert result.scalar() == "wal"
+
+    await settings.async_engine.dispose()